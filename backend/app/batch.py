@@ -0,0 +1,166 @@
+import asyncio
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Optional
+from .cache import KeywordCache, MemoryBackend
+from .errors import to_http_error
+from .ledger import CostLedger
+from .llm import BatchItemFailed, CopywritingLLM
+from .logger import logger
+from .pipeline import resolve_keywords, run_generation, usage_metadata
+from .schemas import CopyRequest
+from .shared_state import maybe_await
+from .validation import validate_copy_output
+
+
+def _item_error(index: int, e: Exception) -> Dict[str, Any]:
+    error = to_http_error(e)
+    return {"type": "item", "index": index, "status": error.status_code, "detail": error.detail}
+
+
+def _shared_keyword_cache(keyword_cache: Optional[KeywordCache], size: int) -> KeywordCache:
+    # items with the same audience/product share one keyword call even when caching is off
+    return keyword_cache or KeywordCache(MemoryBackend(max_entries=size))
+
+
+async def run_batch(
+    items: List[CopyRequest],
+    llm: CopywritingLLM,
+    keyword_cache: Optional[KeywordCache],
+    concurrency: int,
+    ledger: Optional[CostLedger] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """Yield one event per item as it completes, then a summary.
+
+    A failing item produces an error event with the status /generate would
+    have returned; it never fails the rest of the batch.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    cache = _shared_keyword_cache(keyword_cache, len(items))
+    started = time.perf_counter()
+
+    async def run_item(index: int, item: CopyRequest) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                result = await run_generation(item, llm, cache, ledger=ledger)
+                return {"type": "item", "index": index, "status": 200, "result": result}
+            except Exception as e:
+                return _item_error(index, e)
+
+    tasks = [asyncio.ensure_future(run_item(i, item)) for i, item in enumerate(items)]
+    succeeded = 0
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            event = await next_done
+            succeeded += event["status"] == 200
+            yield event
+    finally:
+        # the client went away mid-batch
+        for task in tasks:
+            task.cancel()
+
+    elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+    logger.info(f"✓ Batch of {len(items)} finished: {succeeded} ok, {len(items) - succeeded} failed in {elapsed_ms}ms")
+    yield {"type": "done", "succeeded": succeeded, "failed": len(items) - succeeded, "elapsed_ms": elapsed_ms}
+
+
+class BatchJobStore:
+    """Record of submitted provider batches, needed to validate their results.
+
+    In-process by default; pass a SharedBackend when several workers serve
+    the API, so a job can be polled from any of them.
+    """
+    def __init__(self, backend=None, max_jobs: int = 1000, ttl: float = 29 * 86400.0):
+        self.backend = backend if backend is not None else MemoryBackend(max_entries=max_jobs)
+        # provider results stay downloadable for 29 days
+        self.ttl = ttl
+
+    async def add(self, job: Dict[str, Any]) -> None:
+        # stored as JSON so every backend, and every worker, can read it back
+        stored = {**job, "items": [item.model_dump() for item in job["items"]]}
+        await maybe_await(self.backend.set(job["job_id"], stored, time.time() + self.ttl))
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        entry = await maybe_await(self.backend.get(job_id))
+        if entry is None or entry[1] <= time.time():
+            return None
+        job = entry[0]
+        return {**job, "items": [CopyRequest(**item) for item in job["items"]]}
+
+
+async def submit_batch_job(
+    items: List[CopyRequest],
+    llm: CopywritingLLM,
+    keyword_cache: Optional[KeywordCache],
+    concurrency: int,
+    jobs: BatchJobStore
+) -> Dict[str, Any]:
+    """Resolve keywords locally, then hand all copy generation to the provider's batch API"""
+    semaphore = asyncio.Semaphore(concurrency)
+    cache = _shared_keyword_cache(keyword_cache, len(items))
+
+    async def keywords_for(item: CopyRequest) -> List[str]:
+        async with semaphore:
+            return await resolve_keywords(item, llm, cache)
+
+    keywords = await asyncio.gather(*[keywords_for(item) for item in items])
+    batch_id = await llm.submit_copy_batch({
+        str(i): (item, item_keywords) for i, (item, item_keywords) in enumerate(zip(items, keywords))
+    })
+
+    job = {
+        "job_id": uuid.uuid4().hex,
+        "batch_id": batch_id,
+        "items": items,
+        "keywords": keywords,
+        "created_at": time.time()
+    }
+    await jobs.add(job)
+    logger.info(f"Submitted batch job {job['job_id']} ({len(items)} items) as {batch_id}")
+    return {"job_id": job["job_id"], "status": "in_progress", "count": len(items)}
+
+
+async def collect_batch_job(
+    job: Dict[str, Any],
+    llm: CopywritingLLM,
+    jobs: Optional[BatchJobStore] = None,
+    ledger: Optional[CostLedger] = None
+) -> Dict[str, Any]:
+    """Job status, plus validated per-item results once the provider batch has ended.
+
+    The first collection after the batch ends appends each item's usage to
+    the cost ledger, as request "<job_id>:<index>"; the job is then marked
+    billed in `jobs` so later polls do not count it again.
+    """
+    results = await llm.fetch_copy_batch(job["batch_id"])
+    if results is None:
+        return {"job_id": job["job_id"], "status": "in_progress", "count": len(job["items"])}
+
+    bill = ledger is not None and not job.get("billed")
+    items = []
+    for i, (item, keywords) in enumerate(zip(job["items"], job["keywords"])):
+        try:
+            result = results.get(str(i))
+            if result is None:
+                raise BatchItemFailed("No result returned for this item")
+            if isinstance(result, Exception):
+                raise result
+            usage = [result.usage] if result.usage else []
+            if bill:
+                ledger.record(f"{job['job_id']}:{i}", item.content_type, usage)
+            report = validate_copy_output(
+                result.text, require_cta=item.cta, content_type=item.content_type, keywords=keywords
+            )
+            items.append({"type": "item", "index": i, "status": 200, "result": {
+                "content": result.text,
+                "keywords": keywords,
+                "tone_used": item.tone_of_voice or "default",
+                "content_type": item.content_type,
+                "metadata": {"status": "ok", **usage_metadata(usage), "validation": report.summary()}
+            }})
+        except Exception as e:
+            items.append(_item_error(i, e))
+
+    if bill and jobs is not None:
+        await jobs.add({**job, "billed": True})
+    return {"job_id": job["job_id"], "status": "ended", "count": len(items), "items": items}
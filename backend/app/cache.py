@@ -0,0 +1,302 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from .config import Settings
+from .shared_state import SharedBackend, maybe_await
+from .singleflight import SingleFlight
+
+
+def normalize_text(text: str) -> str:
+    """Case- and whitespace-insensitive form used for cache keys"""
+    return " ".join(text.lower().split())
+
+
+def hash_key(*parts: Any) -> str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def backend_size(backend) -> Optional[int]:
+    """Entries in a backend; None for a shared one, whose size would need a scan of the store"""
+    return None if isinstance(backend, SharedBackend) else len(backend)
+
+
+class MemoryBackend:
+    """In-process LRU store of (value, expires_at) pairs, optionally bounded by serialized size too"""
+    def __init__(self, max_entries: int = 1024, max_bytes: Optional[int] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._data: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        entry = self._data.get(key)
+        if entry is not None:
+            self._data.move_to_end(key)
+        return entry
+
+    def set(self, key: str, value: Any, expires_at: float) -> None:
+        self.delete(key)
+        if self.max_bytes is not None:
+            size = len(json.dumps(value, default=str).encode("utf-8"))
+            if size > self.max_bytes:
+                return  # would evict everything else and still not fit
+            self._sizes[key] = size
+            self.bytes += size
+        self._data[key] = (value, expires_at)
+        while len(self._data) > self.max_entries or (self.max_bytes is not None and self.bytes > self.max_bytes):
+            self.delete(next(iter(self._data)))
+
+    def delete(self, key: str) -> None:
+        self._data.pop(key, None)
+        self.bytes -= self._sizes.pop(key, 0)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteBackend:
+    """LRU store in a local SQLite file so entries survive restarts. Values must be JSON-serialisable.
+
+    Queries run in a worker thread, like SQLiteStore's, so disk I/O never
+    stalls the event loop. Reads only note their access time in memory; the
+    notes are written in one batch before the next eviction check or on close.
+    """
+    def __init__(self, path: str, max_entries: int = 1024, table: str = "cache"):
+        self.max_entries = max_entries
+        self.table = table
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()  # one connection, used from to_thread workers one at a time
+        self._touched: Dict[str, float] = {}
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")  # a lost cache entry is only a miss
+        self.conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+
+    def _get(self, key: str) -> Optional[Tuple[Any, float]]:
+        row = self.conn.execute(f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self._touched[key] = time.time()
+        return json.loads(row[0]), row[1]
+
+    def _flush_touched(self) -> None:
+        if self._touched:
+            self.conn.executemany(
+                f"UPDATE {self.table} SET last_access = ? WHERE key = ?",
+                [(at, key) for key, at in self._touched.items()]
+            )
+            self._touched.clear()
+
+    def _set(self, key: str, value: Any, expires_at: float) -> None:
+        self._touched.pop(key, None)
+        self.conn.execute(
+            f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(value), expires_at, time.time())
+        )
+        overflow = self._count() - self.max_entries
+        if overflow > 0:
+            self._flush_touched()
+            self.conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN "
+                f"(SELECT key FROM {self.table} ORDER BY last_access ASC LIMIT ?)",
+                (overflow,)
+            )
+
+    def _delete(self, key: str) -> None:
+        self._touched.pop(key, None)
+        self.conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def _count(self) -> int:
+        return self.conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def _close(self) -> None:
+        self._flush_touched()
+        self.conn.close()
+
+    def _locked(self, fn: Callable[..., Any], *args: Any) -> Any:
+        with self._lock:
+            return fn(*args)
+
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        return await asyncio.to_thread(self._locked, fn, *args)
+
+    async def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        return await self._run(self._get, key)
+
+    async def set(self, key: str, value: Any, expires_at: float) -> None:
+        await self._run(self._set, key, value, expires_at)
+
+    async def delete(self, key: str) -> None:
+        await self._run(self._delete, key)
+
+    def __len__(self) -> int:
+        # for stats only
+        return self._locked(self._count)
+
+    def close(self) -> None:
+        self._locked(self._close)
+
+
+class KeywordCache:
+    """TTL/LRU cache for generated keywords keyed on normalized (audience, product_info, model).
+
+    Concurrent misses for the same key share a single upstream call.
+    """
+    def __init__(self, backend, ttl: float = 86400.0):
+        self.backend = backend
+        self.ttl = ttl
+        self.flights = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(audience: str, product_info: str, model: str) -> str:
+        return hash_key("keywords", normalize_text(audience), normalize_text(product_info), model)
+
+    async def get(self, key: str) -> Optional[List[str]]:
+        entry = await maybe_await(self.backend.get(key))
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= time.time():
+            await maybe_await(self.backend.delete(key))
+            return None
+        return list(value)
+
+    async def set(self, key: str, keywords: List[str]) -> None:
+        await maybe_await(self.backend.set(key, list(keywords), time.time() + self.ttl))
+
+    async def get_or_generate(
+        self,
+        audience: str,
+        product_info: str,
+        model: str,
+        generate: Callable[[], Awaitable[List[str]]]
+    ) -> List[str]:
+        key = self.key(audience, product_info, model)
+        cached = await self.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+
+        async def fill() -> List[str]:
+            keywords = await generate()
+            await self.set(key, keywords)
+            return keywords
+
+        return list(await self.flights.do(key, fill))
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "size": backend_size(self.backend),
+            "coalesced": self.flights.coalesced,
+        }
+
+    def close(self) -> None:
+        self.backend.close()
+
+
+class ResponseCache:
+    """Cache of full /generate response bodies for identical requests.
+
+    The key covers the canonical request, the resolved keywords, the model and
+    the prompt version, so changing any of them never serves stale copy.
+    """
+    def __init__(self, backend, ttl: float = 600.0):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(request: Dict[str, Any], keywords: Optional[List[str]], model: str, prompt_version: str) -> str:
+        return hash_key("response", prompt_version, model, request, keywords)
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = await maybe_await(self.backend.get(key))
+        if entry is None or entry[1] <= time.time():
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(json.dumps(entry[0]))  # callers may mutate the body
+
+    async def set(self, key: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        """Store a body; returns the entry with its ETag and timestamps"""
+        entry = {
+            "body": json.loads(json.dumps(body)),
+            "etag": f'"{hash_key(body)[:32]}"',
+            "stored_at": time.time()
+        }
+        await maybe_await(self.backend.set(key, entry, entry["stored_at"] + self.ttl))
+        return entry
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "size": backend_size(self.backend),
+            "bytes": getattr(self.backend, "bytes", None),
+        }
+
+    def close(self) -> None:
+        self.backend.close()
+
+
+def build_keyword_cache(settings: Settings, store=None) -> Optional[KeywordCache]:
+    """Build the configured keyword cache, or None when caching is disabled.
+
+    "shared" keeps entries in the app's shared store, so every worker sees them.
+    """
+    backend_name = settings.KEYWORD_CACHE_BACKEND.lower()
+    if backend_name == "none":
+        return None
+    if backend_name == "shared":
+        backend = _shared_backend(store, "keywords:", "KEYWORD_CACHE_BACKEND")
+    elif backend_name == "sqlite":
+        backend = SQLiteBackend(settings.KEYWORD_CACHE_PATH, settings.KEYWORD_CACHE_MAX_ENTRIES, table="keywords")
+    elif backend_name == "memory":
+        backend = MemoryBackend(settings.KEYWORD_CACHE_MAX_ENTRIES)
+    else:
+        raise ValueError(f"Unknown KEYWORD_CACHE_BACKEND: {settings.KEYWORD_CACHE_BACKEND}")
+    return KeywordCache(backend, ttl=settings.KEYWORD_CACHE_TTL)
+
+
+def build_response_cache(settings: Settings, store=None) -> Optional[ResponseCache]:
+    """Build the opt-in response cache, or None when it is disabled"""
+    if not settings.RESPONSE_CACHE_ENABLED:
+        return None
+    backend_name = settings.RESPONSE_CACHE_BACKEND.lower()
+    if backend_name == "shared":
+        backend = _shared_backend(store, "responses:", "RESPONSE_CACHE_BACKEND")
+    elif backend_name == "memory":
+        backend = MemoryBackend(
+            max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES, max_bytes=settings.RESPONSE_CACHE_MAX_BYTES
+        )
+    else:
+        raise ValueError(f"Unknown RESPONSE_CACHE_BACKEND: {settings.RESPONSE_CACHE_BACKEND}")
+    return ResponseCache(backend, ttl=settings.RESPONSE_CACHE_TTL)
+
+
+def _shared_backend(store, prefix: str, setting: str) -> SharedBackend:
+    if store is None:
+        raise ValueError(f"{setting}=shared needs SHARED_STATE_BACKEND to be set")
+    return SharedBackend(store, prefix)
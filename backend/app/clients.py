@@ -0,0 +1,98 @@
+import asyncio
+from typing import TYPE_CHECKING, Callable, Optional
+from .config import Settings, get_settings
+from .logger import logger
+from .provider import sdk
+
+if TYPE_CHECKING:
+    import httpx
+    from anthropic import AsyncAnthropic
+
+
+def build_http_client(
+    settings: Settings,
+    on_response: Optional[Callable[["httpx.Headers"], None]] = None
+) -> "httpx.AsyncClient":
+    """The keep-alive connection pool upstream calls go through"""
+    import httpx
+
+    event_hooks = {}
+    if on_response:
+        async def observe(response: httpx.Response) -> None:
+            on_response(response.headers)
+        event_hooks["response"] = [observe]
+
+    return sdk().DefaultAsyncHttpxClient(
+        event_hooks=event_hooks,
+        limits=httpx.Limits(
+            max_connections=settings.ANTHROPIC_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.ANTHROPIC_MAX_KEEPALIVE,
+            keepalive_expiry=settings.ANTHROPIC_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(settings.COPY_TIMEOUT, connect=settings.ANTHROPIC_CONNECT_TIMEOUT),
+    )
+
+
+def build_anthropic_client(
+    settings: Settings,
+    on_response: Optional[Callable[["httpx.Headers"], None]] = None,
+    http_client: Optional["httpx.AsyncClient"] = None
+) -> "AsyncAnthropic":
+    """Build an Anthropic client backed by a keep-alive connection pool"""
+    return sdk().AsyncAnthropic(
+        api_key=settings.ANTHROPIC_API_KEY,
+        base_url=settings.ANTHROPIC_BASE_URL,
+        max_retries=settings.ANTHROPIC_MAX_RETRIES,
+        http_client=http_client or build_http_client(settings, on_response),
+    )
+
+
+class ClientRegistry:
+    """App-scoped upstream clients, created in lifespan and shared by every request"""
+    def __init__(
+        self,
+        settings: Optional[Settings] = None,
+        on_response: Optional[Callable[["httpx.Headers"], None]] = None
+    ):
+        self.settings = settings or get_settings()
+        # sees the headers of every upstream response, e.g. for rate-limit tracking
+        self.on_response = on_response
+        self._anthropic: Optional["AsyncAnthropic"] = None
+        self._http: Optional["httpx.AsyncClient"] = None
+
+    @property
+    def anthropic(self) -> "AsyncAnthropic":
+        # built on first use so fake-LLM deployments never open a pool (or import the SDK)
+        if self._anthropic is None:
+            self._http = build_http_client(self.settings, self.on_response)
+            self._anthropic = build_anthropic_client(self.settings, http_client=self._http)
+        return self._anthropic
+
+    async def prewarm(self, connections: int = 1) -> int:
+        """Open pooled upstream connections before the first request needs them.
+
+        Each connection is a HEAD on the API host: it pays for DNS, TCP and TLS
+        without calling the API. Returns how many opened; failures are only
+        logged, since the first real call connects by itself anyway.
+        """
+        import httpx
+
+        url = str(self.anthropic.base_url)
+
+        async def connect() -> bool:
+            try:
+                await self._http.head(url)
+                return True
+            except httpx.HTTPError as e:
+                logger.warning(f"Pre-warm connection to {url} failed: {e!r}")
+                return False
+
+        opened = sum(await asyncio.gather(*[connect() for _ in range(connections)]))
+        logger.info(f"✓ Pre-warmed {opened}/{connections} upstream connections")
+        return opened
+
+    async def aclose(self) -> None:
+        if self._anthropic is not None:
+            await self._anthropic.close()
+            self._anthropic = None
+            self._http = None
@@ -0,0 +1,98 @@
+from dataclasses import asdict
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+from .cache import hash_key, normalize_text
+from .metrics import registry
+from .shared_state import SharedFlight
+from .singleflight import SingleFlight
+from .usage import UsageRecord, add_usage, collect_usage
+
+coalesced_calls = registry.counter(
+    "coalesced_calls_total",
+    "LLM calls by whether they started upstream work (leader) or joined an identical in-flight one "
+    "in this worker (follower) or another (remote)",
+    ("call", "role")
+)
+
+
+class _SharedResult:
+    """What a shared call produced, plus the usage it cost; billed to the first caller to take it"""
+    def __init__(self, value: Any, usage: List[UsageRecord], remote: bool = False):
+        self.value = value
+        self.usage = usage
+        self.remote = remote  # paid for by another worker, so nobody here is billed
+        self.claimed = False
+
+
+class CoalescingLLM:
+    """Collapses concurrent identical calls of a CopywritingLLM onto one upstream call.
+
+    Keys cover every input that shapes the prompt plus the model and prompt
+    version, so only calls that would send the same request are merged.
+    Usage is billed once: the first caller to receive the result records the
+    real usage, the others a zero-token `shared` record. A caller that
+    disconnects only detaches (see SingleFlight). Streams are not coalesced,
+    since each client needs its own.
+
+    With `shared`, calls are also merged across worker processes; a result
+    another process paid for is billed as shared to every local caller.
+    """
+    def __init__(self, llm, flights: SingleFlight, shared: Optional[SharedFlight] = None):
+        self.llm = llm
+        self.flights = flights
+        self.shared = shared
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.llm, name)
+
+    def _request_key(self, call: str, request, *parts: Any) -> str:
+        return hash_key(
+            call, self.llm.model, self.llm.prompt_version, request.model_dump(exclude={"force_refresh"}), *parts
+        )
+
+    async def _do(self, call: str, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        async def run() -> _SharedResult:
+            with collect_usage() as usage:
+                value = await fn()
+            return _SharedResult(value, usage)
+
+        async def run_shared() -> _SharedResult:
+            async def publish():
+                local = await run()
+                return {"value": local.value, "usage": [asdict(r) for r in local.usage]}
+
+            payload, remote = await self.shared.do(key, publish)
+            return _SharedResult(payload["value"], [UsageRecord(**r) for r in payload["usage"]], remote=remote)
+
+        shared: _SharedResult = await self.flights.do(key, run_shared if self.shared else run)
+        if shared.claimed or shared.remote:
+            coalesced_calls.inc(call=call, role="follower" if shared.claimed else "remote")
+            add_usage([UsageRecord(call=r.call, model=r.model, shared=True) for r in shared.usage])
+        else:
+            coalesced_calls.inc(call=call, role="leader")
+            add_usage(shared.usage)
+        shared.claimed = True
+        return shared.value
+
+    async def generate_keywords(self, audience: str, product_info: str) -> List[str]:
+        key = hash_key("keywords", normalize_text(audience), normalize_text(product_info), self.llm.keyword_model)
+        keywords = await self._do("keywords", key, lambda: self.llm.generate_keywords(audience, product_info))
+        return list(keywords)
+
+    async def generate_copy(self, request, keywords: List[str]) -> str:
+        key = self._request_key("copy", request, keywords)
+        return await self._do("copy", key, lambda: self.llm.generate_copy(request, keywords))
+
+    async def generate_variant(self, request, keywords: List[str], index: int, total: int) -> str:
+        key = self._request_key("variant", request, keywords, index, total)
+        return await self._do("variant", key, lambda: self.llm.generate_variant(request, keywords, index, total))
+
+    async def generate_keywords_and_copy(self, request) -> Tuple[List[str], str]:
+        key = self._request_key("keywords_and_copy", request)
+        keywords, text = await self._do(
+            "keywords_and_copy", key, lambda: self.llm.generate_keywords_and_copy(request)
+        )
+        return list(keywords), text
+
+    async def repair_copy(self, request, keywords: List[str], draft: str, instruction: str) -> str:
+        key = self._request_key("repair", request, keywords, draft, instruction)
+        return await self._do("repair", key, lambda: self.llm.repair_copy(request, keywords, draft, instruction))
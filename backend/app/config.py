@@ -1,5 +1,6 @@
+from functools import lru_cache
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import List
+from typing import Dict, List, Optional
 
 class Settings(BaseSettings):
     APP_NAME: str = "dkcopy"
@@ -9,6 +10,118 @@ class Settings(BaseSettings):
     ANTHROPIC_API_KEY: str = ""
     ANTHROPIC_MODEL: str = "claude-sonnet-4-5-20250929"  # Latest Sonnet
     USE_FAKE_LLM: bool = False  # Set to True for testing without API calls
+    ANTHROPIC_BASE_URL: Optional[str] = None  # Override to point at a local stub
+    
+    # Model routing - per call kind and content-type length class ("keywords",
+    # "copy:short", "copy:medium", "copy:long"); unlisted routes use ANTHROPIC_MODEL.
+    # Opt-in: empty by default, e.g. MODEL_ROUTES='{"keywords": "claude-haiku-4-5-20251001"}'
+    MODEL_ROUTING_ENABLED: bool = True
+    MODEL_ROUTES: Dict[str, str] = {}
+    # repair model per route when copy fails validation; defaults to ANTHROPIC_MODEL, "" disables
+    MODEL_FALLBACKS: Dict[str, str] = {}
+    
+    # Upstream connection pool - one shared client per process
+    ANTHROPIC_MAX_CONNECTIONS: int = 100
+    ANTHROPIC_MAX_KEEPALIVE: int = 20
+    ANTHROPIC_KEEPALIVE_EXPIRY: float = 30.0  # seconds
+    ANTHROPIC_CONNECT_TIMEOUT: float = 5.0
+    ANTHROPIC_MAX_RETRIES: int = 0  # retries are owned by the upstream scheduler
+    
+    # Mark the system prompt/constraints/style guide and brand sample for provider-side prompt caching;
+    # only prefixes over the routed model's minimum are marked (1024 tokens on Sonnet, which the system
+    # block alone passes; 4096 on Haiku 4.5 and Opus 4.5, which no prefix reaches)
+    PROMPT_CACHING_ENABLED: bool = True
+    
+    # Content-type table (length guidance, limits, CTA policy); None uses app/content_types.json
+    CONTENT_TYPES_PATH: Optional[str] = None
+    
+    # Copy validation - flagged as warnings in metadata.validation, never fatal
+    BANNED_PHRASES: List[str] = [
+        "guaranteed results", "risk-free", "world-class", "best in the world",
+        "game-changer", "game-changing", "no-brainer"
+    ]
+    KEYWORD_MAX_MENTIONS: int = 2
+    KEYWORD_MAX_DENSITY: float = 0.05  # share of words a repeated keyword may take up
+    
+    # Repair loop - fix copy that fails validation instead of returning a 400 (0 attempts disables)
+    REPAIR_MAX_ATTEMPTS: int = 2
+    REPAIR_LATENCY_BUDGET: float = 30.0  # seconds; no repair starts after this
+    
+    # Per-call timeouts (seconds)
+    KEYWORDS_TIMEOUT: float = 30.0
+    COPY_TIMEOUT: float = 120.0
+    
+    # Upstream scheduler - queueing, retries and load shedding in front of the LLM
+    SCHEDULER_ENABLED: bool = True
+    SCHEDULER_MAX_CONCURRENCY: int = 16
+    SCHEDULER_MAX_RETRIES: int = 3
+    SCHEDULER_BACKOFF_BASE: float = 0.5  # seconds
+    SCHEDULER_BACKOFF_MAX: float = 20.0
+    SCHEDULER_MAX_QUEUE_WAIT: float = 30.0  # shed with a 503 beyond this estimated wait
+    SCHEDULER_MIN_TOKENS_REMAINING: int = 2000  # pause dispatch below this upstream token budget
+    
+    # Client disconnects - /generate checks this often and cancels abandoned generations
+    DISCONNECT_POLL_INTERVAL: float = 0.25  # seconds
+    
+    # Request coalescing - concurrent identical LLM calls share one upstream call
+    COALESCING_ENABLED: bool = True
+    
+    # Keyword source - "llm", or "local" (extracted from the request, LLM only below the confidence floor)
+    KEYWORD_SOURCE: str = "llm"
+    KEYWORD_LOCAL_MIN_CONFIDENCE: float = 0.6
+    
+    # Keyword cache - "memory", "sqlite" (survives restarts), "shared" (all workers) or "none"
+    KEYWORD_CACHE_BACKEND: str = "memory"
+    KEYWORD_CACHE_PATH: str = "keyword_cache.sqlite3"
+    KEYWORD_CACHE_TTL: float = 86400.0  # seconds
+    KEYWORD_CACHE_MAX_ENTRIES: int = 1024
+    
+    # Response cache for identical requests (opt-in)
+    RESPONSE_CACHE_ENABLED: bool = False
+    RESPONSE_CACHE_BACKEND: str = "memory"  # or "shared" (needs SHARED_STATE_BACKEND)
+    RESPONSE_CACHE_TTL: float = 600.0  # seconds, also sent as Cache-Control max-age
+    RESPONSE_CACHE_MAX_BYTES: int = 16 * 1024 * 1024
+    RESPONSE_CACHE_MAX_ENTRIES: int = 10_000
+    
+    # Serving - worker processes for `python -m app.serve` and gunicorn.conf.py
+    HOST: str = "0.0.0.0"
+    PORT: int = 8000
+    WEB_CONCURRENCY: int = 1
+    WORKER_TIMEOUT: int = 180  # seconds; above COPY_TIMEOUT so gunicorn never kills a live generation
+    
+    # Shared state across workers - "none" (per process), "sqlite" (one host) or "redis".
+    # Backs the "shared" cache backends, cross-worker coalescing and upstream rate limits.
+    SHARED_STATE_BACKEND: str = "none"
+    SHARED_STATE_PATH: str = "shared_state.sqlite3"
+    SHARED_STATE_URL: str = "redis://localhost:6379/0"
+    SHARED_FLIGHT_LEASE: float = 10.0  # seconds; a crashed leader delays its followers by at most this
+    UPSTREAM_REQUESTS_PER_MINUTE: int = 0  # shared request budget across workers, 0 = unlimited
+    
+    # Near-duplicate cache - reuse results of reworded requests (MinHash/LSH over audience and
+    # product_info, opt-in, per worker); similarity is the lower of the two fields' estimates
+    NEAR_DUPLICATE_ENABLED: bool = False
+    NEAR_DUPLICATE_SEED_THRESHOLD: float = 0.6  # reuse that request's keywords instead of a keyword call
+    NEAR_DUPLICATE_RETURN_THRESHOLD: float = 0.85  # serve its response when all other fields match; above 1 never
+    NEAR_DUPLICATE_MAX_ENTRIES: int = 5000
+    NEAR_DUPLICATE_MAX_BYTES: int = 16 * 1024 * 1024  # approximate; stored response bodies dominate
+    NEAR_DUPLICATE_TTL: float = 86400.0  # seconds
+    NEAR_DUPLICATE_PATH: Optional[str] = None  # JSON snapshot loaded at startup, saved periodically and at shutdown
+    NEAR_DUPLICATE_SAVE_INTERVAL: float = 300.0  # seconds between saves when the index changed; 0 saves only at shutdown
+    
+    # Cost ledger - append-only SQLite record of upstream usage
+    LEDGER_ENABLED: bool = True
+    LEDGER_PATH: str = "cost_ledger.sqlite3"
+    
+    # Batch generation
+    BATCH_CONCURRENCY: int = 8  # items in flight per /generate/batch call
+    
+    # Cold start - open upstream connections in lifespan, before the first request arrives
+    PREWARM_ENABLED: bool = False
+    PREWARM_CONNECTIONS: int = 4
+    PREWARM_TIMEOUT: float = 5.0  # seconds; startup never waits longer than this
+    
+    # Observability - Prometheus text format on /metrics, X-Request-ID on every response
+    METRICS_ENABLED: bool = True
     
     # API Settings - Fixed CORS origins
     CORS_ORIGINS: List[str] = [
@@ -19,4 +132,7 @@ class Settings(BaseSettings):
     
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
 
-settings = Settings()
\ No newline at end of file
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """The process-wide settings, read from the environment and .env on first use"""
+    return Settings()
@@ -0,0 +1,89 @@
+import hashlib
+import json
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+from .config import get_settings
+
+DEFAULT_REGISTRY_PATH = Path(__file__).with_name("content_types.json")
+
+
+@dataclass(frozen=True)
+class ContentTypeRule:
+    """Length bounds and CTA policy for one family of content types"""
+    name: str
+    guidance: str
+    min_words: Optional[int] = None
+    max_words: Optional[int] = None
+    max_chars: Optional[int] = None  # replaces MAX_COPY_LENGTH, so long-form types can go past it
+    cta: str = "request"  # "request": follow CopyRequest.cta, "skip": never check for a CTA
+
+    @property
+    def skips_cta(self) -> bool:
+        return self.cta == "skip"
+
+
+def _phrase_pattern(phrase: str) -> str:
+    # whole words only, so "ad" no longer matches "header"; allow plurals and hyphens ("long-form")
+    words = [re.escape(word) for word in phrase.lower().split()]
+    return r"\b" + r"[\s\-]+".join(words) + r"s?\b"
+
+
+def _alternative_pattern(alternative: Union[str, List[str]]) -> str:
+    """A phrase, or a list of phrases that must all appear (in any order)"""
+    phrases = [alternative] if isinstance(alternative, str) else alternative
+    return "".join(f"(?=.*?{_phrase_pattern(p)})" for p in phrases)
+
+
+class ContentTypeRegistry:
+    """Classifies free-text content types against an ordered rule table.
+
+    All rules are compiled into one regex: each rule is an alternative made of
+    lookaheads anchored at the start, so the first rule (in table order) with a
+    matching phrase wins, regardless of where in the string the phrase occurs.
+    Results are memoized per distinct content_type string.
+    """
+    def __init__(self, rules: List[ContentTypeRule], matches: List[List[Any]], default: ContentTypeRule):
+        self.rules = rules
+        self.default = default
+        alternatives = [
+            "(?:" + "|".join(_alternative_pattern(a) for a in rule_matches) + f")(?P<r{i}>)"
+            for i, rule_matches in enumerate(matches)
+        ]
+        self._matcher = re.compile("^(?:" + "|".join(alternatives) + ")", re.IGNORECASE | re.DOTALL)
+        self.classify = lru_cache(maxsize=1024)(self._classify)
+        self.fingerprint = hashlib.sha256(
+            json.dumps([repr(r) for r in rules] + [matches, repr(default)]).encode("utf-8")
+        ).hexdigest()[:12]
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ContentTypeRegistry":
+        rules, matches = [], []
+        for entry in data["rules"]:
+            entry = dict(entry)
+            matches.append(entry.pop("match"))
+            rules.append(ContentTypeRule(**entry))
+        return cls(rules, matches, ContentTypeRule(**data["default"]))
+
+    @classmethod
+    def from_file(cls, path: Union[str, Path]) -> "ContentTypeRegistry":
+        with open(path, encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+    def _classify(self, content_type: str) -> ContentTypeRule:
+        match = self._matcher.match(content_type)
+        if match is None:
+            return self.default
+        return self.rules[int(match.lastgroup[1:])]
+
+
+@lru_cache(maxsize=1)
+def get_registry() -> ContentTypeRegistry:
+    """The process-wide registry, loaded from CONTENT_TYPES_PATH (or the bundled table) on first use"""
+    return ContentTypeRegistry.from_file(get_settings().CONTENT_TYPES_PATH or DEFAULT_REGISTRY_PATH)
+
+
+def classify_content_type(content_type: str) -> ContentTypeRule:
+    return get_registry().classify(content_type)
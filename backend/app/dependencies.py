@@ -0,0 +1,57 @@
+from typing import Optional
+from fastapi import Request
+from .batch import BatchJobStore
+from .cache import KeywordCache, ResponseCache
+from .clients import ClientRegistry
+from .coalescing import CoalescingLLM
+from .ledger import CostLedger
+from .near_duplicates import NearDuplicateIndex
+from .llm import CopywritingLLM, get_llm
+from .scheduler import ScheduledLLM
+
+
+def get_clients(request: Request) -> ClientRegistry:
+    """The registry created by the app lifespan"""
+    return request.app.state.clients
+
+
+def client_id(request: Request) -> str:
+    """Identity used for fair queueing: an explicit X-Client-ID, else the caller's address"""
+    if request.headers.get("x-client-id"):
+        return request.headers["x-client-id"]
+    return request.client.host if request.client else "anonymous"
+
+
+def provide_llm(request: Request) -> CopywritingLLM:
+    """Per-request LLM wrapper around the shared, pooled client, queued through the scheduler.
+
+    Coalescing sits in front of the scheduler, so duplicate calls never take a queue slot.
+    """
+    llm = get_llm(get_clients(request), request.app.state.router)
+    scheduler = request.app.state.scheduler
+    if scheduler:
+        llm = ScheduledLLM(llm, scheduler, client_id(request))
+    flights = request.app.state.flights
+    if flights:
+        llm = CoalescingLLM(llm, flights, request.app.state.shared_flight)
+    return llm
+
+
+def provide_keyword_cache(request: Request) -> Optional[KeywordCache]:
+    return request.app.state.keyword_cache
+
+
+def provide_response_cache(request: Request) -> Optional[ResponseCache]:
+    return request.app.state.response_cache
+
+
+def provide_near_duplicates(request: Request) -> Optional[NearDuplicateIndex]:
+    return request.app.state.near_duplicates
+
+
+def provide_batch_jobs(request: Request) -> BatchJobStore:
+    return request.app.state.batch_jobs
+
+
+def provide_ledger(request: Request) -> Optional[CostLedger]:
+    return request.app.state.ledger
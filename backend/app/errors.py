@@ -0,0 +1,57 @@
+from fastapi import HTTPException
+from .llm import BatchItemFailed
+from .scheduler import SchedulerOverloaded
+from .metrics import errors
+from .provider import is_sdk_error
+from .logger import logger
+
+
+def to_http_error(e: Exception) -> HTTPException:
+    """Map pipeline failures onto the HTTP errors the frontend understands, counting each in errors_total"""
+    if isinstance(e, HTTPException):
+        return e
+    error = _map_error(e)
+    errors.inc(status=str(error.status_code), error=type(e).__name__)
+    return error
+
+
+def _map_error(e: Exception) -> HTTPException:
+    if isinstance(e, ValueError):
+        logger.error(f"Validation failed: {str(e)}")
+        return HTTPException(status_code=400, detail=str(e))
+
+    if is_sdk_error(e, "RateLimitError"):
+        logger.error("Hit Anthropic rate limit!")
+        return HTTPException(
+            status_code=429,
+            detail="Claude API rate limit reached. Wait a moment and try again."
+        )
+
+    if is_sdk_error(e, "APITimeoutError"):
+        logger.error("Claude API timeout")
+        return HTTPException(
+            status_code=504,
+            detail="Request timed out. Try again."
+        )
+
+    if isinstance(e, SchedulerOverloaded):
+        logger.error(f"Shedding load: {str(e)}")
+        return HTTPException(
+            status_code=503,
+            detail="Service is busy. Try again shortly.",
+            headers={"Retry-After": str(max(1, int(e.estimated_wait)))}
+        )
+
+    if isinstance(e, BatchItemFailed):
+        logger.error(f"Batch item failed: {str(e)}")
+        return HTTPException(status_code=502, detail=str(e))
+
+    if is_sdk_error(e, "APIError"):
+        logger.error(f"Claude API error: {str(e)}")
+        return HTTPException(
+            status_code=502,
+            detail=f"Claude API error: {str(e)}"
+        )
+
+    logger.error(f"Unexpected error: {str(e)}", exc_info=True)
+    return HTTPException(status_code=500, detail=f"Error: {str(e)}")
@@ -0,0 +1,97 @@
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+# function words, plus marketing filler that is never worth targeting on its own
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being below between
+both but by can could did do does doing down during each either every few for from further had has have having
+he her here hers herself him himself his how i if in into is it its itself just let me more most my myself no
+nor not now of off on once only or other our ours ourselves out over own same she should so some such than that
+the their theirs them themselves then there these they this those through to too under until up very via was we
+were what when where which while who whom why will with within without would you your yours yourself yourselves
+etc per like one ones lot lots thing things way ways much many us
+best better great new good easy easily simple simply help helps helping make makes making get gets getting use
+uses using used need needs want wants really highly truly amazing awesome perfect fast quick quickly powerful
+designed built lets allows enables provides offers features based
+""".split())
+
+_FRAGMENT_BREAKS = re.compile(r"[.,;:!?()\[\]{}\"/|\n–—]+|\s-\s")
+_TOKEN = re.compile(r"[a-z0-9][a-z0-9+#&'\-]*")
+
+MAX_PHRASE_WORDS = 3
+AUDIENCE_WEIGHT = 0.6  # audience phrases matter, but the product is what the copy sells
+TARGET_CANDIDATES = 4  # distinct candidate phrases needed for full confidence
+
+
+@dataclass(frozen=True)
+class KeywordExtraction:
+    keywords: Tuple[str, ...]
+    confidence: float  # 0-1; low when the inputs offer too few distinct phrases to choose from
+
+
+def _stem(word: str) -> str:
+    # crude plural folding, enough to stop "proposal" and "proposals" both being picked
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def _candidates(text: str) -> List[Tuple[str, ...]]:
+    """Runs of content words between stopwords and punctuation, split to at most MAX_PHRASE_WORDS"""
+    phrases = []
+    for fragment in _FRAGMENT_BREAKS.split(text.lower()):
+        run: List[str] = []
+        for token in _TOKEN.findall(fragment) + [""]:
+            token = token.strip("'-")
+            if token and token not in STOPWORDS and not token.isdigit() and len(token) > 1:
+                run.append(token)
+                continue
+            for start in range(0, len(run), MAX_PHRASE_WORDS):
+                phrases.append(tuple(run[start:start + MAX_PHRASE_WORDS]))
+            run = []
+    return phrases
+
+
+@lru_cache(maxsize=1024)
+def extract_keywords(audience: str, product_info: str, max_keywords: int = 8) -> KeywordExtraction:
+    """RAKE-style keyword extraction from the request fields, without any model call.
+
+    Candidate phrases are runs of content words. Each word scores
+    degree/frequency (words that sit in longer phrases score higher), a
+    phrase scores the sum of its words, weighted by which field it came from
+    and boosted when it recurs. Phrases whose words are already covered by a
+    better phrase are dropped.
+    """
+    weighted: Dict[Tuple[str, ...], float] = {}
+    occurrences: Dict[Tuple[str, ...], int] = {}
+    frequency: Dict[str, int] = {}
+    degree: Dict[str, int] = {}
+    for text, weight in ((product_info, 1.0), (audience, AUDIENCE_WEIGHT)):
+        for phrase in _candidates(text):
+            weighted[phrase] = max(weighted.get(phrase, 0.0), weight)
+            occurrences[phrase] = occurrences.get(phrase, 0) + 1
+            for word in phrase:
+                frequency[word] = frequency.get(word, 0) + 1
+                degree[word] = degree.get(word, 0) + len(phrase)
+
+    scored = sorted(
+        weighted,
+        key=lambda p: -(sum(degree[w] / frequency[w] for w in p) * weighted[p] * (1 + 0.5 * (occurrences[p] - 1)))
+    )
+
+    keywords, covered = [], set()
+    for phrase in scored:
+        stems = {_stem(w) for w in phrase}
+        if stems <= covered:
+            continue
+        covered |= stems
+        keywords.append(" ".join(phrase))
+        if len(keywords) == max_keywords:
+            break
+
+    confidence = min(1.0, len(keywords) / TARGET_CANDIDATES)
+    return KeywordExtraction(tuple(keywords), round(confidence, 2))
@@ -0,0 +1,124 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from .config import Settings
+from .logger import logger
+from .usage import UsageRecord
+
+
+class CostLedger:
+    """Append-only SQLite ledger of upstream usage and cost.
+
+    record() only enqueues; a background task writes batches on a worker
+    thread, so the request path never waits on disk. When the queue is full
+    entries are dropped and counted rather than blocking.
+    """
+    def __init__(self, path: str, max_queue: int = 10_000):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS ledger ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, ts REAL NOT NULL, day TEXT NOT NULL, "
+            "request_id TEXT NOT NULL, content_type TEXT NOT NULL, call TEXT NOT NULL, model TEXT NOT NULL, "
+            "input_tokens INTEGER NOT NULL, output_tokens INTEGER NOT NULL, "
+            "cache_creation_input_tokens INTEGER NOT NULL, cache_read_input_tokens INTEGER NOT NULL, "
+            "cost REAL NOT NULL)"
+        )
+        self._lock = threading.Lock()  # one connection shared by worker threads
+        self._queue: "asyncio.Queue[Optional[tuple]]" = asyncio.Queue(maxsize=max_queue)
+        self._writer: Optional[asyncio.Task] = None
+        self.written = 0
+        self.dropped = 0
+
+    def start(self) -> None:
+        self._writer = asyncio.ensure_future(self._write_loop())
+
+    def record(self, request_id: str, content_type: str, records: List[UsageRecord]) -> None:
+        now = time.time()
+        day = datetime.fromtimestamp(now, timezone.utc).strftime("%Y-%m-%d")
+        for r in records:
+            if r.shared:
+                continue  # billed to the request that made the call
+            row = (
+                now, day, request_id, content_type, r.call, r.model, r.input_tokens, r.output_tokens,
+                r.cache_creation_input_tokens, r.cache_read_input_tokens, r.cost
+            )
+            try:
+                self._queue.put_nowait(row)
+            except asyncio.QueueFull:
+                self.dropped += 1
+
+    async def _write_loop(self) -> None:
+        while True:
+            rows = [await self._queue.get()]
+            while not self._queue.empty() and len(rows) < 500:
+                rows.append(self._queue.get_nowait())
+            stop = None in rows
+            rows = [row for row in rows if row is not None]
+            if rows:
+                try:
+                    await asyncio.to_thread(self._insert, rows)
+                    self.written += len(rows)
+                except sqlite3.Error as e:
+                    logger.error(f"Cost ledger write failed: {str(e)}")
+            if stop:
+                return
+
+    def _insert(self, rows: List[tuple]) -> None:
+        with self._lock:
+            self.conn.executemany(
+                "INSERT INTO ledger (ts, day, request_id, content_type, call, model, input_tokens, output_tokens, "
+                "cache_creation_input_tokens, cache_read_input_tokens, cost) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    async def aclose(self) -> None:
+        """Flush pending entries and close the database"""
+        if self._writer is not None:
+            await self._queue.put(None)
+            await self._writer
+            self._writer = None
+        self.conn.close()
+
+    def _query(self, sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        with self._lock:
+            cursor = self.conn.execute(sql, params)
+            columns = [c[0] for c in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    _TOTALS = (
+        "COUNT(DISTINCT request_id) AS requests, SUM(input_tokens) AS input_tokens, "
+        "SUM(output_tokens) AS output_tokens, SUM(cache_creation_input_tokens) AS cache_creation_input_tokens, "
+        "SUM(cache_read_input_tokens) AS cache_read_input_tokens, ROUND(SUM(cost), 6) AS cost"
+    )
+
+    async def for_request(self, request_id: str) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(
+            self._query,
+            "SELECT ts, call, model, input_tokens, output_tokens, cache_creation_input_tokens, "
+            "cache_read_input_tokens, cost FROM ledger WHERE request_id = ? ORDER BY id",
+            (request_id,)
+        )
+
+    async def by_day(self) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(
+            self._query, f"SELECT day, {self._TOTALS} FROM ledger GROUP BY day ORDER BY day DESC"
+        )
+
+    async def by_content_type(self) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(
+            self._query, f"SELECT content_type, {self._TOTALS} FROM ledger GROUP BY content_type ORDER BY cost DESC"
+        )
+
+    def stats(self) -> Dict[str, int]:
+        return {"written": self.written, "pending": self._queue.qsize(), "dropped": self.dropped}
+
+
+def build_ledger(settings: Settings) -> Optional[CostLedger]:
+    if not settings.LEDGER_ENABLED:
+        return None
+    return CostLedger(settings.LEDGER_PATH)
@@ -1,21 +1,232 @@
+import asyncio
 import json
-from typing import List
-from anthropic import AsyncAnthropic
-from anthropic.types import TextBlock
-from .config import settings
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Optional, Tuple, Union
+from .clients import ClientRegistry
+from .config import get_settings
+from .content_types import classify_content_type, get_registry
+from .metrics import span, upstream_call
+from .provider import sdk
+from .routing import ModelRouter, build_router, route_for
 from .schemas import CopyRequest
+from .usage import UsageRecord, record_usage
+from .utils import estimate_tokens
+
+if TYPE_CHECKING:
+    from anthropic import AsyncAnthropic
+
+SYSTEM_PROMPT = """You are an expert direct-response copywriter.
+- Always follow constraints exactly.
+- Write in clear, persuasive language.
+- Avoid fluff, filler, and unverifiable claims.
+- Return ONLY the copy itself, no meta commentary.
+- Write naturally as if speaking to a person, NOT optimizing for search engines.
+- Do NOT create multiple keyword variations (e.g., don't say "fitness program," "workout routine," and "exercise plan" in the same copy).
+- Use specific product/service terms once or twice, then refer to "it," "this," "the product," or "the service" thereafter."""
+
+
+# fixed constraints shared by every copy request; kept in the system block so they are part of the cached prefix
+CONSTRAINTS = """Constraints for all copy:
+- Connect features to outcomes
+- UK English spelling
+- No meta commentary or headings
+- Don't invent product details"""
+
+# house style shared by every copy request; with the system prompt and constraints it makes a prefix long enough
+# for the provider to cache (1024 tokens on Sonnet), so repeat requests pay the cache-read rate for it
+STYLE_GUIDE = """House style guide.
+
+Voice
+- Write to one reader, in the second person. "You" and "your" beat "customers" and "users".
+- Prefer short, concrete sentences. Vary rhythm: follow a long sentence with a short one.
+- Use active verbs. "Cut your month-end close to a day" beats "Month-end close times can be reduced".
+- Be confident without hype. No superlatives you cannot back up ("best", "revolutionary", "world-class", "game-changing").
+- Sound like a knowledgeable person, not a brochure. Contractions are fine.
+- Match the requested tone of voice and style controls when they are given; they override these defaults.
+
+Structure
+- Open with the reader's problem or the outcome they want, not with the product name.
+- Give one main idea per piece. Support it with two or three specific benefits, each tied to a feature.
+- Turn features into outcomes: say what the reader can now do, stop doing, or stop worrying about.
+- Use numbers, time frames and concrete examples only when they appear in the product details provided.
+- Close on the next step. When a call-to-action is requested, make it a single, specific action with a verb
+  ("Start your free trial", "Book a demo", "Download the guide"), placed at the end.
+- When no call-to-action is requested, end on the benefit instead, with no instruction to the reader.
+
+Audience
+- Write for the audience named in the request. Use the words they use for their own work and problems.
+- Name a situation they recognise ("the Sunday-night invoice pile") rather than a generic pain ("admin is hard").
+- Assume a busy, sceptical reader who skims: the first sentence must earn the second.
+- Do not flatter or talk down to the reader, and do not address them by job title in every sentence.
+
+Headlines and openings
+- Lead with the outcome or the tension, in as few words as possible.
+- Prefer a specific promise the product details support over a clever pun.
+- Avoid questions the reader can answer "no" to, and avoid opening with "Are you tired of" or "Introducing".
+- Do not repeat the headline's wording in the first sentence of the body.
+
+Length and format
+- Respect the length guidance for the content type exactly; it is checked after generation.
+- Very short formats (headlines, subject lines, tweets): one idea, no filler words, no hashtags unless asked.
+- Short formats (ads, social posts, email intros): a hook, one or two benefit sentences, then the close.
+- Medium formats (landing pages, product descriptions): short paragraphs of two to four sentences.
+- Long formats (articles, long-form pieces): an introduction that states the reader's problem, body sections
+  that each make one point, and a conclusion. Write paragraphs, not bullet lists, unless a list is clearer.
+- Plain text only: no markdown headings, no bold, no emoji, no surrounding quotation marks, no labels such as
+  "Headline:" or "Copy:".
+
+Keywords
+- Keywords are for discoverability, not for repetition. Use each one at most twice.
+- Place a keyword where it reads naturally, ideally early, and never in a list of synonyms.
+- If a keyword cannot be used naturally, leave it out rather than forcing it.
+
+Spelling and language
+- UK English throughout: colour, organise, optimise, centre, catalogue, programme (for schedules),
+  licence (noun), travelled, cancelled, fulfil, enrolment, analyse.
+- Use "per cent" in running text and the pound sign for prices unless the product details use another currency.
+- Avoid jargon the audience would not use themselves, and explain any technical term the first time it appears.
+
+Accuracy
+- Only state facts given in the product details. Do not invent prices, statistics, awards, customers,
+  testimonials, guarantees, integrations or features.
+- Do not promise results ("double your sales"), and do not compare with named competitors.
+- Avoid unverifiable claims and regulated wording (medical, financial or legal promises).
+
+Examples of the difference
+- Weak: "Our innovative platform leverages cutting-edge AI to revolutionise your workflow."
+  Strong: "Draft a client proposal in ten minutes, then spend the afternoon on the work itself."
+- Weak: "Fitness program, workout routine and exercise plan for busy people."
+  Strong: "A 20-minute workout you can fit in before the school run."
+- Weak: "Click here to learn more about our amazing features today!!!"
+  Strong: "See how it works in a two-minute demo."
+"""
+
+SINGLE_SHOT_INSTRUCTIONS = """Also choose 5-10 relevant lowercase SEO keywords for this audience and product, and weave them in naturally (maximum 1-2 mentions each).
+Return ONLY a JSON object of the form {"keywords": ["keyword1", "keyword2"], "copy": "the copy"}. No markdown, no code blocks, no explanations."""
+
+VARIANT_INSTRUCTIONS = """This is variant {number} of {total}. Take a distinctly different angle, hook and opening from the other variants."""
+
+# marks the end of a prefix for provider-side prompt caching
+CACHE_BREAKPOINT = {"type": "ephemeral"}
+# the provider does not cache a prefix shorter than this many tokens, by model id prefix (longest match wins);
+# a breakpoint on a shorter one only adds noise
+MIN_CACHEABLE_TOKENS = {
+    "claude-opus-4-5": 4096,
+    "claude-haiku-4-5": 4096,
+    "claude-3-5-haiku": 2048,
+    "claude-3-haiku": 2048,
+}
+DEFAULT_MIN_CACHEABLE_TOKENS = 1024  # Sonnet 4.5, Sonnet 4, Opus 4.1, Opus 4
+
+# bump whenever prompt wording changes, so cached responses are not reused across prompts
+PROMPT_VERSION = "3"
+
+DEFAULT_KEYWORDS = ["marketing", "productivity", "automation"]
+
+
+def min_cacheable_tokens(model: str) -> int:
+    """Shortest prefix, in tokens, the provider will cache for a model"""
+    matches = [prefix for prefix in MIN_CACHEABLE_TOKENS if model.startswith(prefix)]
+    return MIN_CACHEABLE_TOKENS[max(matches, key=len)] if matches else DEFAULT_MIN_CACHEABLE_TOKENS
+
+
+class BatchItemFailed(Exception):
+    """A request inside a provider message batch errored, expired or was cancelled"""
+
+
+class SingleShotUnparsed(Exception):
+    """A single-shot reply did not follow the keywords/copy JSON format"""
+
+
+@dataclass
+class BatchItemResult:
+    """Copy from one succeeded batch request, with the usage it was billed for"""
+    text: str
+    usage: Optional[UsageRecord] = None
+
+
+def _extract_text(message) -> str:
+    """Return the first text block of a Claude response"""
+    for block in message.content:
+        # batch results carry beta block types, so match on the block type
+        if getattr(block, "type", None) == "text" and hasattr(block, 'text'):
+            return block.text
+    return ""
+
+
+def _strip_code_fence(text: str) -> str:
+    """Clean up any markdown code block formatting"""
+    text = text.strip()
+    if text.startswith("```"):
+        lines = text.split("\n")
+        lines = lines[1:]
+        if lines and lines[-1].strip() == "```":
+            lines = lines[:-1]
+        text = "\n".join(lines).strip()
+    return text
+
+
+def _parse_keywords(text: str) -> List[str]:
+    """Parse a JSON (or comma separated) keyword list into unique lowercase keywords"""
+    try:
+        keywords = json.loads(text)
+        if not isinstance(keywords, list):
+            raise ValueError("not a list")
+        keywords = [str(k).strip().lower() for k in keywords if str(k).strip()]
+    except:
+        keywords = [k.strip().lower() for k in text.replace("\n", ",").split(",") if k.strip()]
+        keywords = [k.strip('"\'[]') for k in keywords]
+    
+    seen = set()
+    result = []
+    for k in keywords:
+        k = k.strip('"\'[]')
+        if k and k not in seen:
+            seen.add(k)
+            result.append(k)
+    
+    return result[:10] or list(DEFAULT_KEYWORDS)
+
 
 class CopywritingLLM:
-    def __init__(self):
-        self.client = AsyncAnthropic(api_key=settings.ANTHROPIC_API_KEY)
+    def __init__(self, client: Optional["AsyncAnthropic"] = None, router: Optional[ModelRouter] = None):
+        # callers should pass the shared pooled client; building one here is a fallback
+        settings = get_settings()
+        self.client = client or sdk().AsyncAnthropic(api_key=settings.ANTHROPIC_API_KEY)
         self.model = settings.ANTHROPIC_MODEL
+        # likewise the shared router, which carries the per-route stats
+        self.router = router or build_router(settings)
+    
+    @property
+    def prompt_version(self) -> str:
+        # length guidance comes from the content-type table, so it is part of the prompt;
+        # the routing table decides which model answers, so it is too
+        version = f"{PROMPT_VERSION}:{get_registry().fingerprint}"
+        return f"{version}:{self.router.fingerprint}" if self.router else version
+    
+    @property
+    def keyword_model(self) -> str:
+        return self.router.model_for("keywords") if self.router else self.model
+    
+    async def _create(self, call: str, route: str, model: str, params: dict, timeout: float):
+        """One messages.create call on `model`, accounted to `route` in the router stats"""
+        started = time.perf_counter()
+        try:
+            with upstream_call(call, model):
+                message = await self.client.messages.create(**{**params, "model": model}, timeout=timeout)
+        except Exception:
+            self.router.observe(route, model, time.perf_counter() - started, failed=True)
+            raise
+        record = record_usage(call, model, message.usage)
+        self.router.observe(route, model, time.perf_counter() - started, record.cost if record else 0.0)
+        return message
     
     async def generate_keywords(self, audience: str, product_info: str) -> List[str]:
         """Generate SEO keywords using Claude"""
-        message = await self.client.messages.create(
-            model=self.model,
-            max_tokens=1024,
-            messages=[{
+        params = {
+            "max_tokens": 1024,
+            "messages": [{
                 "role": "user",
                 "content": f"""Generate 5-10 relevant SEO keywords for this copywriting project.
 
@@ -26,72 +237,145 @@ Return ONLY a JSON array of lowercase keyword strings. No markdown, no code bloc
 
 Example format: ["keyword1", "keyword2", "keyword3"]"""
             }]
-        )
-        
-        # extract text from the response content
-        text = ""
-        for block in message.content:
-            if isinstance(block, TextBlock) and hasattr(block, 'text'):
-                text = block.text
-                break
-        
-        # clean up any markdown code block formatting
-        text = text.strip()
-        if text.startswith("```"):
-            lines = text.split("\n")
-            lines = lines[1:]
-            if lines and lines[-1].strip() == "```":
-                lines = lines[:-1]
-            text = "\n".join(lines).strip()
-        
-        try:
-            keywords = json.loads(text)
-            if not isinstance(keywords, list):
-                raise ValueError("not a list")
-            keywords = [str(k).strip().lower() for k in keywords if str(k).strip()]
-        except:
-            keywords = [k.strip().lower() for k in text.replace("\n", ",").split(",") if k.strip()]
-            keywords = [k.strip('"\'[]') for k in keywords]
-        
-        seen = set()
-        result = []
-        for k in keywords:
-            k = k.strip('"\'[]')
-            if k and k not in seen:
-                seen.add(k)
-                result.append(k)
-        
-        return result[:10] or ["marketing", "productivity", "automation"]
+        }
+        message = await self._create("keywords", "keywords", self.keyword_model, params, get_settings().KEYWORDS_TIMEOUT)
+        return _parse_keywords(_strip_code_fence(_extract_text(message)))
     
     async def generate_copy(self, request: CopyRequest, keywords: List[str]) -> str:
         """Generate marketing copy using Claude"""
-        message = await self.client.messages.create(
-            model=self.model,
-            max_tokens=4096,
-            system="""You are an expert direct-response copywriter.
-- Always follow constraints exactly.
-- Write in clear, persuasive language.
-- Avoid fluff, filler, and unverifiable claims.
-- Return ONLY the copy itself, no meta commentary.
-- Write naturally as if speaking to a person, NOT optimizing for search engines.
-- Do NOT create multiple keyword variations (e.g., don't say "fitness program," "workout routine," and "exercise plan" in the same copy).
-- Use specific product/service terms once or twice, then refer to "it," "this," "the product," or "the service" thereafter.""",
-            messages=[{
+        route = route_for("copy", request.content_type)
+        params = self._copy_params(request, keywords)
+        message = await self._create("copy", route, params["model"], params, get_settings().COPY_TIMEOUT)
+        return _extract_text(message)
+    
+    async def generate_variant(self, request: CopyRequest, keywords: List[str], index: int, total: int) -> str:
+        """One of several alternative versions of the copy; all of them share the stable prompt prefix"""
+        route = route_for("copy", request.content_type)
+        params = self._copy_params(request, keywords, VARIANT_INSTRUCTIONS.format(number=index + 1, total=total))
+        message = await self._create("variant", route, params["model"], params, get_settings().COPY_TIMEOUT)
+        return _extract_text(message)
+    
+    async def generate_keywords_and_copy(self, request: CopyRequest) -> Tuple[List[str], str]:
+        """Choose keywords and write the copy in a single Claude call"""
+        route = route_for("copy", request.content_type)
+        params = self._copy_params(request, [], SINGLE_SHOT_INSTRUCTIONS)
+        message = await self._create("keywords_and_copy", route, params["model"], params, get_settings().COPY_TIMEOUT)
+        text = _strip_code_fence(_extract_text(message))
+        try:
+            data = json.loads(text)
+            keywords = _parse_keywords(json.dumps(data.get("keywords", [])))
+            copy = str(data["copy"]).strip()
+        except (ValueError, KeyError, AttributeError, TypeError) as e:
+            # the raw reply may be JSON fragments rather than copy, so it is never served
+            raise SingleShotUnparsed(f"unparseable single-shot reply: {e!r}") from e
+        return keywords, copy
+    
+    async def repair_copy(self, request: CopyRequest, keywords: List[str], draft: str, instruction: str) -> str:
+        """Revise a draft that failed validation, continuing the original conversation.
+
+        Routes with a fallback escalate the repair to the fallback model.
+        """
+        route = route_for("copy", request.content_type)
+        params = self._copy_params(request, keywords)
+        # same system/brand prefix as the original call, so a cached prefix is read rather than resent
+        params["messages"] += [
+            {"role": "assistant", "content": draft},
+            {"role": "user", "content": instruction}
+        ]
+        model = self.router.fallback_for(route) or params["model"]
+        message = await self._create("repair", route, model, params, get_settings().COPY_TIMEOUT)
+        return _extract_text(message)
+    
+    async def stream_copy(self, request: CopyRequest, keywords: List[str]) -> AsyncIterator[str]:
+        """Stream marketing copy as Claude emits it; closing the generator aborts the upstream stream"""
+        route = route_for("copy", request.content_type)
+        params = self._copy_params(request, keywords)
+        started = time.perf_counter()
+        with upstream_call("stream", params["model"]):
+            async with self.client.messages.stream(**params, timeout=get_settings().COPY_TIMEOUT) as stream:
+                record = None
+                try:
+                    async for text in stream.text_stream:
+                        yield text
+                finally:
+                    # an aborted stream still bills what was sent so far
+                    try:
+                        record = record_usage("copy", params["model"], stream.current_message_snapshot.usage)
+                    except AssertionError:
+                        pass  # failed before the first event arrived
+                    self.router.observe(route, params["model"], time.perf_counter() - started, record.cost if record else 0.0)
+    
+    async def submit_copy_batch(self, jobs: Dict[str, Tuple[CopyRequest, List[str]]]) -> str:
+        """Queue copy requests on the provider's message-batch API; returns the batch id"""
+        batch = await self.client.beta.messages.batches.create(requests=[
+            {"custom_id": custom_id, "params": self._copy_params(request, keywords)}
+            for custom_id, (request, keywords) in jobs.items()
+        ])
+        return batch.id
+    
+    async def fetch_copy_batch(self, batch_id: str) -> Optional[Dict[str, Union[BatchItemResult, BatchItemFailed]]]:
+        """Copy and usage per custom_id once the batch has ended, or None while it is still processing"""
+        batch = await self.client.beta.messages.batches.retrieve(batch_id)
+        if batch.processing_status != "ended":
+            return None
+        
+        results = {}
+        async for entry in await self.client.beta.messages.batches.results(batch_id):
+            if entry.result.type == "succeeded":
+                message = entry.result.message
+                usage = record_usage("batch_copy", message.model, message.usage, batch=True)
+                results[entry.custom_id] = BatchItemResult(_extract_text(message), usage)
+            else:
+                results[entry.custom_id] = BatchItemFailed(f"Batch request {entry.result.type}")
+        return results
+    
+    def _copy_params(self, request: CopyRequest, keywords: List[str], instructions: Optional[str] = None) -> dict:
+        """Messages API params, ordered from most to least stable for prompt caching.
+
+        system prompt + constraints + style guide (shared by every request),
+        then the brand voice sample (shared by one customer's requests), then
+        the fields that change per request. A stable prefix ends in a cache
+        breakpoint only when it is long enough for the routed model to cache:
+        the system block alone is on Sonnet, while Haiku 4.5 and Opus 4.5 need
+        4096 tokens, which no prefix reaches. The model is the one routed for
+        the request's content type.
+        """
+        with span("prompt", request.content_type):
+            return self._assemble_params(request, keywords, instructions)
+
+    def _assemble_params(self, request: CopyRequest, keywords: List[str], instructions: Optional[str]) -> dict:
+        system = {"type": "text", "text": f"{SYSTEM_PROMPT}\n\n{CONSTRAINTS}\n\n{STYLE_GUIDE}"}
+        content = []
+        if request.brand_sample:
+            content.append({"type": "text", "text": f"Brand voice sample (reference, do not copy):\n{request.brand_sample}"})
+        prompt = self._build_prompt(request, keywords)
+        if instructions:
+            prompt = f"{prompt}\n\n{instructions}"
+        content.append({"type": "text", "text": prompt})
+
+        model = self.router.model_for(route_for("copy", request.content_type))
+        if get_settings().PROMPT_CACHING_ENABLED:
+            minimum = min_cacheable_tokens(model)
+            prefix = estimate_tokens(system["text"])
+            if prefix >= minimum:
+                system["cache_control"] = CACHE_BREAKPOINT
+            if request.brand_sample:
+                prefix += estimate_tokens(content[0]["text"])
+                if prefix >= minimum:
+                    content[0]["cache_control"] = CACHE_BREAKPOINT
+
+        return {
+            "model": model,
+            "max_tokens": 4096,
+            "system": [system],
+            "messages": [{
                 "role": "user",
-                "content": self._build_prompt(request, keywords)
+                "content": content
             }]
-        )
-        
-        # extract text from the response content
-        text = ""
-        for block in message.content:
-            if isinstance(block, TextBlock) and hasattr(block, 'text'):
-                text = block.text
-                break
-        
-        return text
+        }
     
     def _build_prompt(self, req: CopyRequest, keywords: List[str]) -> str:
+        """The per-request part of the prompt; stable parts live in _copy_params"""
         parts = [
             f"Content type: {req.content_type}",
             f"Audience: {req.audience}",
@@ -102,18 +386,12 @@ Example format: ["keyword1", "keyword2", "keyword3"]"""
             parts.append(f"Tone of voice: {req.tone_of_voice}")
         if req.style:
             parts.append(f"Style controls: {req.style}")
-        if req.brand_sample:
-            parts.append(f"Brand voice sample (reference, do not copy):\n{req.brand_sample}")
 
         if keywords:
             parts.append(f"Keywords to weave in naturally: {', '.join(keywords)}")
             parts.append("IMPORTANT: Use ONLY these keywords (maximum 1-2 mentions each). Do not generate keyword variations or synonyms.")
         
-        parts.append("\nConstraints:")
-        parts.append("- Connect features to outcomes")
-        parts.append("- UK English spelling")
-        parts.append("- No meta commentary or headings")
-        parts.append("- Don't invent product details")
+        parts.append("\nConstraints for this piece:")
 
         # adding length guidance based on content type
         length_guidance = self._get_length_guidance(req.content_type)
@@ -125,71 +403,85 @@ Example format: ["keyword1", "keyword2", "keyword3"]"""
         
         return "\n".join(parts)
     
-
     def _get_length_guidance(self, content_type: str) -> str:
         """Return appropriate length guidance based on content type"""
-        content_lower = content_type.lower()
+        return classify_content_type(content_type).guidance
 
-        if "subject line" in content_lower or "headline" in content_lower:
-            return "Keep extremely brief: 5-10 words maximum"
-    
-        if "tweet" in content_lower:
-            return "Keep very brief: 280 characters maximum"
-        
-        if "social media" in content_lower or "social post" in content_lower:
-            return "Keep concise: 50-150 words"
-        
-        if "google" in content_lower and "ad" in content_lower:  
-            return "Keep brief and punchy: 50-100 words"
-        
-        if "facebook" in content_lower and "ad" in content_lower:
-            return "Keep engaging: 100-150 words"
-        
-        if "ad" in content_lower:
-            return "Keep concise: 75-100 words"
-        
-        if "email intro" in content_lower:
-            return "Keep brief: 75-150 words maximum"
-        
-        if "blog intro" in content_lower:  
-            return "Keep concise: 100-200 words - hook the reader and transition to main content"
-        
-        if "product description" in content_lower:
-            return "Aim for 200-350 words"
-        
-        if "landing page" in content_lower and "hero" in content_lower:
-            return "Aim for 250 maximum"
-        
-        if "landing page" in content_lower:
-            return "aim for 250 - 400 words"        
-        
-        if "blog" in content_lower or "article" in content_lower:  
-            return "Aim for 800-1200 words for a complete article"
-        
-        if "sales page" in content_lower or "long form" in content_lower:
-            return "Aim for 600-1000 words"
-        
-        return "Be concise and impactful"
+
+FAKE_HEADLINES = ["Win Back Your Time", "Proposals In Minutes", "Less Admin, More Clients", "Write Less, Win More"]
 
 
 class FakeCopywritingLLM(CopywritingLLM):
     """For testing without API calls"""
-    def __init__(self, mode: str = "compliant"):
+    _batches: Dict[str, Dict[str, BatchItemResult]] = {}  # "submitted" batches complete immediately
+    
+    def __init__(
+        self,
+        mode: str = "compliant",
+        chunk_delay: float = 0.0,
+        keyword_delay: float = 0.0,
+        copy_delay: float = 0.0
+    ):
         self.mode = mode
+        self.model = "fake"
+        self.router = None
+        self.chunk_delay = chunk_delay
+        # simulated upstream latency per call
+        self.keyword_delay = keyword_delay
+        self.copy_delay = copy_delay
     
     async def generate_keywords(self, audience: str, product_info: str) -> List[str]:
+        if self.keyword_delay:
+            await asyncio.sleep(self.keyword_delay)
         return ["ai tool", "copywriting", "automation", "marketing", "productivity"]
     
+    async def generate_keywords_and_copy(self, request: CopyRequest) -> Tuple[List[str], str]:
+        keywords = ["ai tool", "copywriting", "automation", "marketing", "productivity"]
+        return keywords, await self.generate_copy(request, keywords)
+    
     async def generate_copy(self, request: CopyRequest, keywords: List[str]) -> str:
+        if self.copy_delay:
+            await asyncio.sleep(self.copy_delay)
+        return self._draft()
+    
+    async def generate_variant(self, request: CopyRequest, keywords: List[str], index: int, total: int) -> str:
+        text = await self.generate_copy(request, keywords)
+        return text.replace("Win Back Your Time", FAKE_HEADLINES[index % len(FAKE_HEADLINES)])
+    
+    async def repair_copy(self, request: CopyRequest, keywords: List[str], draft: str, instruction: str) -> str:
+        # a stubborn model: repairs repeat the mode's failure
+        if self.copy_delay:
+            await asyncio.sleep(self.copy_delay)
+        return self._draft()
+    
+    def _draft(self) -> str:
         if self.mode == "too_long":
             return " ".join(["Long body"] * 800)
         if self.mode == "missing_cta":
             return "Great copy without a CTA."
         return "Headline: Win Back Your Time\n\nBody: Freelancers love this tool.\n\nCTA: Start your free trial."
+    
+    async def submit_copy_batch(self, jobs: Dict[str, Tuple[CopyRequest, List[str]]]) -> str:
+        batch_id = f"fakebatch_{len(FakeCopywritingLLM._batches)}"
+        FakeCopywritingLLM._batches[batch_id] = {
+            custom_id: BatchItemResult(await self.generate_copy(request, keywords))
+            for custom_id, (request, keywords) in jobs.items()
+        }
+        return batch_id
+    
+    async def fetch_copy_batch(self, batch_id: str) -> Optional[Dict[str, Union[BatchItemResult, BatchItemFailed]]]:
+        return FakeCopywritingLLM._batches.get(batch_id)
+    
+    async def stream_copy(self, request: CopyRequest, keywords: List[str]) -> AsyncIterator[str]:
+        text = await self.generate_copy(request, keywords)
+        for i, word in enumerate(text.split(" ")):
+            if self.chunk_delay:
+                await asyncio.sleep(self.chunk_delay)
+            yield word if i == 0 else " " + word
 
 
-def get_llm() -> CopywritingLLM:
+def get_llm(clients: Optional[ClientRegistry] = None, router: Optional[ModelRouter] = None) -> CopywritingLLM:
     """Factory function for getting the right LLM instance"""
-    if settings.USE_FAKE_LLM:
+    if get_settings().USE_FAKE_LLM:
         return FakeCopywritingLLM()
-    return CopywritingLLM()
\ No newline at end of file
+    return CopywritingLLM(clients.anthropic if clients else None, router)
\ No newline at end of file
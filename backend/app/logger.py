@@ -1,19 +1,32 @@
 import logging
 import sys
+from contextvars import ContextVar
+
+# set per HTTP request by RequestContextMiddleware; "-" outside of a request
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamps each record with the ID of the request it was logged for"""
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
 
 def setup_logger():
     """Simple logging for debugging"""
     logger = logging.getLogger("dkcopy")
     logger.setLevel(logging.INFO)
-    
+
     handler = logging.StreamHandler(sys.stdout)
     formatter = logging.Formatter(
-        '%(asctime)s - %(levelname)s - %(message)s',
+        '%(asctime)s - %(levelname)s - [%(request_id)s] %(message)s',
         datefmt='%H:%M:%S'
     )
     handler.setFormatter(formatter)
+    handler.addFilter(RequestIdFilter())
     logger.addHandler(handler)
-    
+
     return logger
 
-logger = setup_logger()
\ No newline at end of file
+logger = setup_logger()
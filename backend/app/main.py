@@ -1,34 +1,140 @@
-from fastapi import FastAPI
+import asyncio
+import os
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from starlette.types import ASGIApp
 from contextlib import asynccontextmanager
-from .config import settings
+from .config import get_settings
+from .clients import ClientRegistry
+from .cache import build_keyword_cache, build_response_cache
+from .batch import BatchJobStore
+from .scheduler import build_scheduler
+from .singleflight import SingleFlight
+from .shared_state import SharedBackend, SharedFlight, SharedRateLimits, build_shared_store
+from .routing import build_router
+from .ledger import build_ledger
+from .near_duplicates import build_near_duplicate_index
+from .content_types import get_registry
+from .validation import get_engine
 from .routes import router
+from .metrics import registry
+from .middleware import RequestContextMiddleware
 from .logger import logger
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
+    settings = get_settings()
+    app.title = settings.APP_NAME
     logger.info(f"🚀 {settings.APP_NAME} started")
     logger.info(f"Environment: {settings.APP_ENV}")
     logger.info(f"Using fake LLM: {settings.USE_FAKE_LLM}")
+    logger.info(f"Loaded {len(get_registry().rules)} content-type rules")
+    if settings.WEB_CONCURRENCY > 1:
+        # metrics are per worker; the label keeps each worker's series apart
+        registry.const_labels["worker"] = str(os.getpid())
+    app.state.router = build_router(settings)
+    store = app.state.shared_store = build_shared_store(settings)
+    if store is not None:
+        logger.info(f"Sharing caches and rate limits across workers via {settings.SHARED_STATE_BACKEND}")
+    app.state.scheduler = build_scheduler(
+        settings,
+        shared=SharedRateLimits(store, settings.UPSTREAM_REQUESTS_PER_MINUTE) if store is not None else None
+    )
+    app.state.flights = SingleFlight() if settings.COALESCING_ENABLED else None
+    app.state.shared_flight = (
+        SharedFlight(store, lease=settings.SHARED_FLIGHT_LEASE) if store is not None and app.state.flights else None
+    )
+    app.state.clients = ClientRegistry(
+        settings,
+        on_response=app.state.scheduler.observe_headers if app.state.scheduler else None
+    )
+    app.state.keyword_cache = build_keyword_cache(settings, store)
+    app.state.response_cache = build_response_cache(settings, store)
+    app.state.near_duplicates = build_near_duplicate_index(settings)
+    if app.state.near_duplicates is not None:
+        app.state.near_duplicates.start()
+    # jobs must be visible to whichever worker the poll lands on
+    app.state.batch_jobs = BatchJobStore(SharedBackend(store, "batch_jobs:") if store is not None else None)
+    app.state.ledger = build_ledger(settings)
+    if app.state.ledger:
+        app.state.ledger.start()
+    if settings.PREWARM_ENABLED:
+        await prewarm(app)
     yield
-    # Shutdown (if needed)
+    # Shutdown
     logger.info("Shutting down...")
+    await app.state.clients.aclose()
+    if app.state.keyword_cache:
+        app.state.keyword_cache.close()
+    if app.state.near_duplicates is not None:
+        await app.state.near_duplicates.aclose()
+    if app.state.ledger:
+        await app.state.ledger.aclose()
+    if store is not None:
+        await store.aclose()
+
+async def prewarm(app: FastAPI) -> None:
+    """Pay first-request costs during startup: the validation engine, the SDK import and upstream connections"""
+    get_engine()
+    settings = get_settings()
+    if settings.USE_FAKE_LLM:
+        return
+    try:
+        await asyncio.wait_for(app.state.clients.prewarm(settings.PREWARM_CONNECTIONS), settings.PREWARM_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning(f"Pre-warm gave up after {settings.PREWARM_TIMEOUT}s; starting with a cold pool")
+
+class SettingsCORSMiddleware(CORSMiddleware):
+    """CORS with the configured origins, read when the middleware stack is built on the first request"""
+    def __init__(self, app: ASGIApp):
+        super().__init__(
+            app,
+            allow_origins=get_settings().CORS_ORIGINS,
+            allow_credentials=True,
+            allow_methods=["*"],
+            allow_headers=["*"],
+            expose_headers=["X-Request-ID"],
+        )
 
 def create_app() -> FastAPI:
-    app = FastAPI(title=settings.APP_NAME, lifespan=lifespan)
+    # reads no settings: importing this module must not touch the environment or .env,
+    # so everything configurable is read in lifespan or per request
+    app = FastAPI(lifespan=lifespan)
     
-    app.add_middleware(
-        CORSMiddleware,
-        allow_origins=settings.CORS_ORIGINS,
-        allow_credentials=True,
-        allow_methods=["*"],
-        allow_headers=["*"],
-    )
+    app.add_middleware(SettingsCORSMiddleware)
+    # outermost, so the request ID is set before anything logs and timing covers the whole request
+    app.add_middleware(RequestContextMiddleware)
     
     @app.get("/health", tags=["meta"])
     async def health():
-        return {"status": "ok", "env": settings.APP_ENV}
+        return {"status": "ok", "env": get_settings().APP_ENV}
+    
+    @app.get("/stats", tags=["meta"])
+    async def stats(request: Request):
+        keyword_cache = request.app.state.keyword_cache
+        response_cache = request.app.state.response_cache
+        scheduler = request.app.state.scheduler
+        ledger = request.app.state.ledger
+        flights = request.app.state.flights
+        near_duplicates = request.app.state.near_duplicates
+        return {
+            "worker": os.getpid(),  # everything below is this worker's view, except the ledger
+            "ledger": ledger.stats() if ledger else None,
+            "routing": request.app.state.router.stats(),
+            "scheduler": scheduler.stats() if scheduler else None,
+            "coalescing": flights.stats() if flights else None,
+            "keyword_cache": keyword_cache.stats() if keyword_cache else None,
+            "response_cache": response_cache.stats() if response_cache else None,
+            "near_duplicates": near_duplicates.stats() if near_duplicates is not None else None
+        }
+    
+    @app.get("/metrics", tags=["meta"], response_class=PlainTextResponse)
+    async def metrics():
+        if not get_settings().METRICS_ENABLED:
+            raise HTTPException(status_code=404, detail="Not Found")
+        return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
     
     app.include_router(router)
     return app
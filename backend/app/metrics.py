@@ -0,0 +1,197 @@
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+from .content_types import classify_content_type
+
+# seconds; covers cache hits and local work up to slow long-form generations
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Labels, *extra: str) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(e for e in extra if e)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labels
+
+    def _key(self, labels: Dict[str, str]) -> Labels:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self, const: str = "") -> Iterator[str]:
+        """Sample lines; `const` is a preformatted label pair added to every sample"""
+        raise NotImplementedError
+
+    def render(self, const: str = "") -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples(const))
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, help, labels)
+        # an unlabelled metric exists from the start, so it reads 0 rather than missing
+        self.values: Dict[Labels, float] = {} if labels else {(): 0}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels: str) -> float:
+        return self.values.get(self._key(labels), 0)
+
+    def samples(self, const: str = "") -> Iterator[str]:
+        for key, value in sorted(self.values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key, const)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        self.values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    """Cumulative-bucket histogram; observations cost one bisect and three additions"""
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [count per bucket (last is +Inf)..., sum]
+        self.series: Dict[Labels, List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def count(self, **labels: str) -> int:
+        series = self.series.get(self._key(labels))
+        return int(sum(series[:-1])) if series else 0
+
+    def samples(self, const: str = "") -> Iterator[str]:
+        for key, series in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, const, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key, const)} {_format_value(series[-1])}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key, const)} {cumulative}"
+
+
+class MetricsRegistry:
+    """In-process metrics, rendered in the Prometheus text exposition format.
+
+    Each worker process has its own registry and a scrape sees only the
+    worker that answered it; with several workers, set `const_labels` (e.g.
+    the pid) so series from different workers stay apart and can be summed.
+    """
+    def __init__(self, namespace: str = "dkcopy"):
+        self.namespace = namespace
+        self.metrics: Dict[str, Metric] = {}
+        self.const_labels: Dict[str, str] = {}
+
+    def _register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(f"{self.namespace}_{name}", help, labels))
+
+    def gauge(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge(f"{self.namespace}_{name}", help, labels))
+
+    def histogram(self, name: str, help: str, labels: Tuple[str, ...] = (), **kwargs) -> Histogram:
+        return self._register(Histogram(f"{self.namespace}_{name}", help, labels, **kwargs))
+
+    def render(self) -> str:
+        const = ",".join(f'{name}="{_escape(value)}"' for name, value in self.const_labels.items())
+        return "\n".join(metric.render(const) for metric in self.metrics.values()) + "\n"
+
+
+registry = MetricsRegistry()
+
+http_requests = registry.histogram(
+    "http_request_duration_seconds", "Time to the end of the response, by route and status",
+    ("method", "route", "status")
+)
+http_in_flight = registry.gauge("http_requests_in_flight", "Requests being handled")
+stage_duration = registry.histogram(
+    "stage_duration_seconds", "Time spent in each generation pipeline stage, by content type",
+    ("stage", "content_type")
+)
+upstream_duration = registry.histogram(
+    "upstream_duration_seconds", "Anthropic API call latency, by call, model and outcome",
+    ("call", "model", "outcome")
+)
+upstream_in_flight = registry.gauge("upstream_requests_in_flight", "Anthropic API calls in progress, by model", ("model",))
+errors = registry.counter("errors_total", "Failures mapped to HTTP errors, by status and error class", ("status", "error"))
+cancelled_generations = registry.counter(
+    "cancelled_generations_total", "Generations abandoned mid-flight, e.g. on client disconnect", ("content_type",)
+)
+cancelled_tokens_saved = registry.counter(
+    "cancelled_tokens_saved_total", "Estimated output tokens not generated thanks to cancellation", ("content_type",)
+)
+
+
+def content_type_label(content_type: str) -> str:
+    """The content-type rule name, so free-text content types cannot explode label cardinality"""
+    return classify_content_type(content_type).name
+
+
+@contextmanager
+def span(stage: str, content_type: str = "") -> Iterator[None]:
+    """Time a pipeline stage into stage_duration_seconds, whether or not it succeeds"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_duration.observe(
+            time.perf_counter() - started, stage=stage, content_type=content_type_label(content_type)
+        )
+
+
+@contextmanager
+def upstream_call(call: str, model: Optional[str]) -> Iterator[None]:
+    """Track one Anthropic API call in the upstream gauges and latency histogram"""
+    model = model or "unknown"
+    upstream_in_flight.inc(model=model)
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        upstream_in_flight.dec(model=model)
+        upstream_duration.observe(time.perf_counter() - started, call=call, model=model, outcome=outcome)
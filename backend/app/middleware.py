@@ -0,0 +1,63 @@
+import re
+import time
+import uuid
+from .logger import request_id_var
+from .metrics import http_in_flight, http_requests
+
+REQUEST_ID_HEADER = "x-request-id"
+# accept a caller's ID only if it is safe to echo into headers and logs
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._\-]{1,64}$")
+
+
+def _incoming_request_id(scope) -> str:
+    for name, value in scope["headers"]:
+        if name == REQUEST_ID_HEADER.encode():
+            request_id = value.decode("latin-1")
+            if _VALID_REQUEST_ID.match(request_id):
+                return request_id
+    return uuid.uuid4().hex
+
+
+class RequestContextMiddleware:
+    """Gives every HTTP request an ID and records it in the HTTP metrics.
+
+    The ID is the caller's X-Request-ID when valid, else a new one. It is
+    set for the logger, echoed in the X-Request-ID response header and, for
+    generation endpoints, used as the ledger's request_id. Written as plain
+    ASGI so streamed responses are timed to their last byte.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        request_id = _incoming_request_id(scope)
+        token = request_id_var.set(request_id)
+        started = time.perf_counter()
+        status = 500
+        http_in_flight.inc()
+
+        async def send_with_request_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (REQUEST_ID_HEADER.encode(), request_id.encode())
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            http_in_flight.dec()
+            # set by routing; 404s never get one
+            route = scope.get("route")
+            http_requests.observe(
+                time.perf_counter() - started,
+                method=scope["method"],
+                route=route.path if route else "unmatched",
+                status=str(status)
+            )
+            request_id_var.reset(token)
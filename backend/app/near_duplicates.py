@@ -0,0 +1,406 @@
+"""Near-duplicate lookup over previous generations.
+
+Requests are compared on audience and product_info, the free-text fields
+users reword. Each field gets a MinHash signature of its character
+trigrams, and an LSH index over bands drawn from both signatures finds
+candidates without scanning. A candidate's similarity is the lower of the
+two fields' estimated Jaccard similarities, so a new audience for the same
+product is not a near duplicate. Above the seed threshold the previous
+keywords replace the keyword call; above the return threshold, with every
+other request field identical, the previous response is served outright.
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from array import array
+from collections import Counter, OrderedDict, deque
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+from .cache import normalize_text
+from .config import Settings
+from .logger import logger
+from .metrics import registry
+
+NGRAM = 3
+_MASK64 = (1 << 64) - 1
+MAX_CANDIDATES = 64  # verified per lookup, those sharing the most bands first; bounds lookup time
+FORMAT_VERSION = 1  # bump when signatures change, so old snapshots are ignored
+_PUNCTUATION = re.compile(r"[^\w\s]")
+
+lookup_duration = registry.histogram(
+    "near_duplicate_lookup_seconds", "Near-duplicate index lookups, by outcome (returned, seeded, miss)",
+    ("outcome",), buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+)
+
+
+def shingles(text: str, n: int = NGRAM) -> Set[str]:
+    """Character n-grams of the normalized text, padded so word edges count"""
+    text = f" {normalize_text(_PUNCTUATION.sub(' ', text))} "
+    return {text[i:i + n] for i in range(max(1, len(text) - n + 1))}
+
+
+def _hash64(shingle: str) -> int:
+    # stable across processes, unlike hash(), so persisted signatures stay comparable
+    return int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class MinHasher:
+    """MinHash over character n-grams; permutation i maps a 64-bit shingle hash x to (a_i * x + b_i) mod 2**64"""
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = random.Random(seed)
+        self.permutations = [(rng.getrandbits(64) | 1, rng.getrandbits(64)) for _ in range(num_perm)]
+        self.signature = lru_cache(maxsize=1024)(self._signature)
+
+    def _signature(self, text: str) -> array:
+        hashes = [_hash64(s) for s in shingles(text)]
+        return array("Q", [min([(a * x + b) & _MASK64 for x in hashes]) for a, b in self.permutations])
+
+
+def similarity(a: array, b: array) -> float:
+    """Estimated Jaccard similarity: the share of permutations whose minimum agrees"""
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+@dataclass
+class _Entry:
+    audience: array
+    product: array
+    context: str  # hash of every other request field; must match for the response to be reused
+    exact: Tuple[str, str, str]  # (context, normalized audience, normalized product_info)
+    keywords: List[str]
+    body: Optional[Dict[str, Any]]
+    stored_at: float
+    size: int = 0  # approximate bytes held, counted against max_bytes
+
+
+@dataclass
+class NearMatch:
+    similarity: float
+    keywords: List[str]
+    body: Optional[Dict[str, Any]]  # set only when the previous response may be served as is
+    exact: bool  # the same normalized request, not just a similar one
+    age: int
+    lookup_ms: float
+
+
+class NearDuplicateIndex:
+    """Bounded LRU of previous generations, searchable by near-duplicate audience and product_info.
+
+    Memory is bounded by max_entries and by max_bytes. Each entry holds two
+    packed signatures and one bucket slot per band, plus its keywords and,
+    when returning is enabled, the response body. Sizes are approximate
+    (serialized JSON plus the signatures), in the same way as MemoryBackend.
+    A body too big for the budget is dropped, and the entry keeps only its
+    keywords. With `path`, the index is loaded at startup, written every
+    `save_interval` seconds once start() is called if it changed, and
+    written again on aclose().
+    """
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_entries: int = 5000,
+        max_bytes: Optional[int] = 16 * 1024 * 1024,
+        ttl: float = 86400.0,
+        save_interval: float = 300.0,
+        seed_threshold: float = 0.6,
+        return_threshold: float = 0.85,
+        num_perm: int = 64,
+        bands: int = 32
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.ttl = ttl
+        self.save_interval = save_interval
+        self.seed_threshold = seed_threshold
+        self.return_threshold = return_threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands  # per field, so a band spans 2 * rows values
+        self.hasher = MinHasher(num_perm)
+
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._buckets: Dict[int, List[int]] = {}
+        self._exact: Dict[Tuple[str, str, str], int] = {}
+        self._next_id = 0
+        self._dirty = False  # changed since the last save
+        self._saver: Optional[asyncio.Task] = None
+        self._write_lock = threading.Lock()  # a cancelled periodic save may still be writing
+        self._lock = threading.Lock()
+
+        self.lookups = 0
+        self.returned = 0
+        self.seeded = 0
+        self.recent_lookups: Deque[float] = deque(maxlen=500)
+        if path:
+            self.load()
+            self._dirty = False
+
+    @property
+    def returns_enabled(self) -> bool:
+        return self.return_threshold <= 1.0
+
+    def _band_keys(self, audience: array, product: array) -> List[int]:
+        r = self.rows
+        return [hash((i, *audience[i * r:(i + 1) * r], *product[i * r:(i + 1) * r])) for i in range(self.bands)]
+
+    def lookup(self, audience: str, product_info: str, context: str) -> Optional[NearMatch]:
+        """The most reusable previous generation at or above the seed threshold, if any"""
+        started = time.perf_counter()
+        exact = (context, normalize_text(audience), normalize_text(product_info))
+        audience_sig = self.hasher.signature(audience)
+        product_sig = self.hasher.signature(product_info)
+        with self._lock:  # lookups and adds run on worker threads
+            candidates = Counter()
+            for key in self._band_keys(audience_sig, product_sig):
+                candidates.update(self._buckets.get(key, ()))
+
+            now = time.time()
+            best, best_rank = None, None
+            for entry_id, _ in candidates.most_common(MAX_CANDIDATES):
+                entry = self._entries[entry_id]
+                if entry.stored_at + self.ttl <= now:
+                    self._remove(entry_id)
+                    continue
+                score = similarity(audience_sig, entry.audience)
+                if score < self.seed_threshold:
+                    continue
+                score = min(score, similarity(product_sig, entry.product))
+                if score < self.seed_threshold:
+                    continue
+                returnable = entry.body is not None and entry.context == context and score >= self.return_threshold
+                rank = (returnable, score)
+                if best_rank is None or rank > best_rank:
+                    best, best_rank = entry_id, rank
+
+            match = None
+            if best is not None:
+                self._entries.move_to_end(best)
+                entry = self._entries[best]
+                returnable, score = best_rank
+                match = NearMatch(
+                    similarity=round(score, 3),
+                    keywords=list(entry.keywords),
+                    body=json.loads(json.dumps(entry.body)) if returnable else None,  # callers mutate the body
+                    exact=entry.exact == exact,
+                    age=int(now - entry.stored_at),
+                    lookup_ms=0.0
+                )
+
+            elapsed = time.perf_counter() - started
+            outcome = "miss" if match is None else "returned" if match.body is not None else "seeded"
+            self.lookups += 1
+            self.returned += outcome == "returned"
+            self.seeded += outcome == "seeded"
+            self.recent_lookups.append(elapsed)
+            lookup_duration.observe(elapsed, outcome=outcome)
+        if match:
+            match.lookup_ms = round(elapsed * 1000, 3)
+        return match
+
+    def add(
+        self,
+        audience: str,
+        product_info: str,
+        context: str,
+        keywords: List[str],
+        body: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """Index a finished generation, replacing an earlier one for the same normalized request"""
+        entry = _Entry(
+            audience=self.hasher.signature(audience),
+            product=self.hasher.signature(product_info),
+            context=context,
+            exact=(context, normalize_text(audience), normalize_text(product_info)),
+            keywords=list(keywords),
+            body=json.loads(json.dumps(body)) if body is not None and self.returns_enabled else None,
+            stored_at=time.time()
+        )
+        with self._lock:
+            self._insert(entry)
+
+    async def alookup(self, audience: str, product_info: str, context: str) -> Optional[NearMatch]:
+        """lookup() on a worker thread; hashing and verification take a few ms, too long for the event loop"""
+        return await asyncio.to_thread(self.lookup, audience, product_info, context)
+
+    async def aadd(
+        self,
+        audience: str,
+        product_info: str,
+        context: str,
+        keywords: List[str],
+        body: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """add() on a worker thread"""
+        await asyncio.to_thread(self.add, audience, product_info, context, keywords, body)
+
+    def _size(self, entry: _Entry) -> int:
+        payload = len(json.dumps([entry.context, entry.exact, entry.keywords, entry.body]).encode("utf-8"))
+        return payload + 16 * self.num_perm + 8 * self.bands  # two signatures of 8-byte values, one slot per band
+
+    def _insert(self, entry: _Entry) -> None:
+        previous = self._exact.get(entry.exact)
+        if previous is not None:
+            self._remove(previous)
+        entry.size = self._size(entry)
+        if self.max_bytes is not None and entry.size > self.max_bytes and entry.body is not None:
+            entry.body = None  # still worth keeping for its keywords
+            entry.size = self._size(entry)
+        if self.max_bytes is not None and entry.size > self.max_bytes:
+            return
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = entry
+        self._exact[entry.exact] = entry_id
+        self.bytes += entry.size
+        self._dirty = True
+        for key in self._band_keys(entry.audience, entry.product):
+            self._buckets.setdefault(key, []).append(entry_id)
+        while len(self._entries) > self.max_entries or (self.max_bytes is not None and self.bytes > self.max_bytes):
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id)
+        self.bytes -= entry.size
+        self._dirty = True
+        for key in self._band_keys(entry.audience, entry.product):
+            bucket = self._buckets[key]
+            bucket.remove(entry_id)
+            if not bucket:
+                del self._buckets[key]
+        del self._exact[entry.exact]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _params(self) -> Dict[str, int]:
+        return {"version": FORMAT_VERSION, "num_perm": self.num_perm, "bands": self.bands, "ngram": NGRAM}
+
+    def _snapshot(self) -> Dict[str, Any]:
+        # entries are never mutated once stored, so the snapshot can be serialized on another thread
+        with self._lock:
+            entries = list(self._entries.values())
+        return {
+            "params": self._params(),
+            "entries": [
+                {
+                    "audience": base64.b64encode(entry.audience.tobytes()).decode("ascii"),
+                    "product": base64.b64encode(entry.product.tobytes()).decode("ascii"),
+                    "context": entry.context,
+                    "exact": list(entry.exact),
+                    "keywords": entry.keywords,
+                    "body": entry.body,
+                    "stored_at": entry.stored_at,
+                }
+                for entry in entries
+            ]
+        }
+
+    def save(self) -> None:
+        """Write the index to `path` atomically"""
+        if not self.path:
+            return
+        self._dirty = False
+        self._write(self._snapshot())
+
+    async def asave(self) -> None:
+        """save(), with the file written on a worker thread"""
+        if not self.path:
+            return
+        self._dirty = False
+        await asyncio.to_thread(self._write, self._snapshot())
+
+    def _write(self, snapshot: Dict[str, Any]) -> None:
+        tmp = f"{self.path}.{os.getpid()}.tmp"  # workers sharing a path must not write the same temp file
+        with self._write_lock:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f)
+            os.replace(tmp, self.path)
+        logger.info(f"✓ Saved {len(snapshot['entries'])} near-duplicate entries to {self.path}")
+
+    def load(self) -> None:
+        """Load entries saved with the same signature parameters; expired ones are dropped"""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable near-duplicate index {self.path}: {e}")
+            return
+        if snapshot.get("params") != self._params():
+            logger.warning(f"Ignoring near-duplicate index {self.path} built with different parameters")
+            return
+        now = time.time()
+        for raw in snapshot["entries"]:
+            if raw["stored_at"] + self.ttl <= now:
+                continue
+            audience, product = array("Q"), array("Q")
+            audience.frombytes(base64.b64decode(raw["audience"]))
+            product.frombytes(base64.b64decode(raw["product"]))
+            body = raw["body"] if self.returns_enabled else None
+            self._insert(_Entry(
+                audience, product, raw["context"], tuple(raw["exact"]), raw["keywords"], body, raw["stored_at"]
+            ))
+        logger.info(f"✓ Loaded {len(self._entries)} near-duplicate entries from {self.path}")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = sorted(self.recent_lookups)
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "buckets": len(self._buckets),
+            "lookups": self.lookups,
+            "returned": self.returned,
+            "seeded": self.seeded,
+            "hit_rate": round((self.returned + self.seeded) / self.lookups, 3) if self.lookups else 0.0,
+            "lookup_p50_ms": round(lookups[len(lookups) // 2] * 1000, 3) if lookups else 0.0,
+            "lookup_p95_ms": round(lookups[int(len(lookups) * 0.95)] * 1000, 3) if lookups else 0.0,
+        }
+
+    def start(self) -> None:
+        """Save periodically, so a crash loses at most one interval of entries"""
+        if self.path and self.save_interval > 0:
+            self._saver = asyncio.ensure_future(self._save_loop())
+
+    async def _save_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.save_interval)
+            if self._dirty:
+                try:
+                    await self.asave()
+                except OSError as e:
+                    logger.error(f"Near-duplicate index save failed: {str(e)}")
+
+    async def aclose(self) -> None:
+        if self._saver is not None:
+            self._saver.cancel()
+            self._saver = None
+        await self.asave()
+
+
+def build_near_duplicate_index(settings: Settings) -> Optional[NearDuplicateIndex]:
+    """Build the opt-in near-duplicate index, or None when it is disabled"""
+    if not settings.NEAR_DUPLICATE_ENABLED:
+        return None
+    return NearDuplicateIndex(
+        path=settings.NEAR_DUPLICATE_PATH,
+        max_entries=settings.NEAR_DUPLICATE_MAX_ENTRIES,
+        max_bytes=settings.NEAR_DUPLICATE_MAX_BYTES,
+        ttl=settings.NEAR_DUPLICATE_TTL,
+        save_interval=settings.NEAR_DUPLICATE_SAVE_INTERVAL,
+        seed_threshold=settings.NEAR_DUPLICATE_SEED_THRESHOLD,
+        return_threshold=settings.NEAR_DUPLICATE_RETURN_THRESHOLD,
+    )
@@ -0,0 +1,388 @@
+import asyncio
+import time
+import uuid
+from typing import Any, Awaitable, Dict, List, Optional, Tuple
+from .cache import KeywordCache, ResponseCache, hash_key
+from .ledger import CostLedger
+from .llm import CopywritingLLM, SingleShotUnparsed
+from .config import get_settings
+from .keywords import extract_keywords
+from .logger import logger
+from .content_types import classify_content_type
+from .near_duplicates import NearDuplicateIndex, NearMatch
+from .metrics import cancelled_generations, cancelled_tokens_saved, content_type_label, span
+from .ranking import rank_variants
+from .schemas import CopyRequest
+from .usage import UsageRecord, collect_usage, prompt_cache_summary, summarize_usage
+from .utils import estimate_tokens, calculate_cost
+from .repair import repair_copy
+from .validation import max_copy_length
+
+# upstream calls that produce the copy itself; what cancelling before they finish saves
+COPY_CALLS = {"copy", "variant", "keywords_and_copy"}
+SINGLE_SHOT_FAILED = "single_shot_failed"  # timing key of a single-shot call whose reply could not be parsed
+# metadata describing the generation that produced a body; a reused body reports them under cached_from
+REUSED_FIELDS = ("tokens_used", "estimated_cost", "usage", "prompt_cache", "timings_ms")
+
+
+def local_keywords(payload: CopyRequest) -> Optional[List[str]]:
+    """Keywords from the local extractor when it is selected and confident enough, else None"""
+    if (payload.keyword_source or get_settings().KEYWORD_SOURCE) != "local":
+        return None
+    extraction = extract_keywords(payload.audience, payload.product_info)
+    if extraction.confidence < get_settings().KEYWORD_LOCAL_MIN_CONFIDENCE:
+        logger.info(f"Local keywords not confident enough ({extraction.confidence}), asking the LLM")
+        return None
+    return list(extraction.keywords)
+
+
+async def resolve_keywords(
+    payload: CopyRequest,
+    llm: CopywritingLLM,
+    cache: Optional[KeywordCache] = None
+) -> List[str]:
+    """Use the caller's keywords, else extract them locally or generate them (through the cache)"""
+    keywords = payload.keywords or local_keywords(payload)
+    if not keywords:
+        generate = lambda: llm.generate_keywords(payload.audience, payload.product_info)
+        if cache:
+            keywords = await cache.get_or_generate(payload.audience, payload.product_info, llm.keyword_model, generate)
+        else:
+            keywords = await generate()
+        logger.info(f"Generated keywords: {', '.join(keywords[:5])}")
+    return keywords
+
+
+def estimate_input_tokens(payload: CopyRequest) -> int:
+    input_text = f"{payload.content_type} {payload.audience} {payload.product_info}"
+    if payload.brand_sample:
+        input_text += payload.brand_sample
+    return estimate_tokens(input_text)
+
+
+async def _timed(awaitable: Awaitable[Any], stage: str, content_type: str) -> Tuple[Any, float]:
+    """Await a pipeline stage, recording it in the stage metrics; returns (result, ms)"""
+    started = time.perf_counter()
+    with span(stage, content_type):
+        result = await awaitable
+    return result, round((time.perf_counter() - started) * 1000, 1)
+
+
+async def produce_copy(
+    payload: CopyRequest,
+    llm: CopywritingLLM,
+    keyword_cache: Optional[KeywordCache] = None,
+    keywords: Optional[List[str]] = None
+) -> Tuple[List[str], str, Dict[str, float]]:
+    """Run the keyword and copy calls for the requested generation mode.
+
+    Returns (keywords, copy, timings in ms). Caller-supplied (or confident
+    local) keywords make every mode equivalent to "standard", since there is
+    nothing to overlap. A single-shot reply that cannot be parsed falls back
+    to the standard two calls; the failed call's time is kept under
+    timings[SINGLE_SHOT_FAILED].
+    `keywords` passes in keywords the caller has already resolved.
+    """
+    timings = {}
+    mode = payload.generation_mode
+    if keywords is None and not payload.keywords and mode != "standard":
+        # local keywords are free, so there is no keyword call to fold in or overlap
+        keywords = local_keywords(payload)
+
+    if keywords is not None:
+        text, timings["copy"] = await _timed(llm.generate_copy(payload, keywords), "copy", payload.content_type)
+
+    elif mode == "single_shot" and not payload.keywords:
+        attempted = time.perf_counter()
+        try:
+            (keywords, text), timings["copy"] = await _timed(llm.generate_keywords_and_copy(payload), "copy", payload.content_type)
+        except SingleShotUnparsed as e:
+            logger.warning(f"{e}; falling back to separate keyword and copy calls")
+            timings[SINGLE_SHOT_FAILED] = round((time.perf_counter() - attempted) * 1000, 1)
+            standard = payload.model_copy(update={"generation_mode": "standard"})
+            keywords, text, standard_timings = await produce_copy(standard, llm, keyword_cache)
+            timings.update(standard_timings)
+
+    elif mode == "speculative" and not payload.keywords:
+        # keywords are reported but do not steer this copy
+        keyword_task = asyncio.ensure_future(_timed(resolve_keywords(payload, llm, keyword_cache), "keywords", payload.content_type))
+        try:
+            text, timings["copy"] = await _timed(llm.generate_copy(payload, []), "copy", payload.content_type)
+            keywords, timings["keywords"] = await keyword_task
+        finally:
+            keyword_task.cancel()
+
+    else:
+        keywords, timings["keywords"] = await _timed(resolve_keywords(payload, llm, keyword_cache), "keywords", payload.content_type)
+        text, timings["copy"] = await _timed(llm.generate_copy(payload, keywords), "copy", payload.content_type)
+
+    return keywords, text, timings
+
+
+async def produce_variants(
+    payload: CopyRequest,
+    llm: CopywritingLLM,
+    keyword_cache: Optional[KeywordCache] = None,
+    keywords: Optional[List[str]] = None
+) -> Tuple[List[str], List[Dict[str, Any]], List[Dict[str, Any]], Dict[str, float]]:
+    """Resolve keywords once, then generate payload.variants versions in parallel.
+
+    Every variant shares the keywords and the cached prompt prefix. Returns
+    (keywords, ranked valid variants, rejected variants, timings in ms);
+    raises the first failure when no variant is usable.
+    """
+    timings = {}
+    if keywords is None:
+        keywords, timings["keywords"] = await _timed(resolve_keywords(payload, llm, keyword_cache), "keywords", payload.content_type)
+
+    calls = [llm.generate_variant(payload, keywords, i, payload.variants) for i in range(payload.variants)]
+    results, timings["copy"] = await _timed(asyncio.gather(*calls, return_exceptions=True), "variants", payload.content_type)
+
+    failures = {i: r for i, r in enumerate(results) if isinstance(r, BaseException)}
+    texts = ["" if i in failures else r for i, r in enumerate(results)]
+    ranked, rejected = rank_variants(texts, keywords, payload.content_type, payload.cta)
+    rejected = [r for r in rejected if r["index"] not in failures] + [
+        {"index": i, "detail": str(e) or type(e).__name__} for i, e in failures.items()
+    ]
+    if not ranked:
+        if len(failures) == len(results):
+            raise next(iter(failures.values()))
+        raise ValueError(min(rejected, key=lambda r: r["index"])["detail"])
+    return keywords, ranked, sorted(rejected, key=lambda r: r["index"]), timings
+
+
+def estimate_output_tokens(content_type: str) -> int:
+    """Expected length of one piece of copy in tokens, from the content type's length bounds"""
+    chars = max_copy_length(content_type)
+    max_words = classify_content_type(content_type).max_words
+    if max_words:
+        chars = min(chars, max_words * 6)  # ~6 chars per word with its space
+    return chars // 4  # same ~4 chars per token as estimate_tokens
+
+
+def record_cancellation(payload: CopyRequest, usage: List[UsageRecord], streamed_chars: int = 0) -> int:
+    """Count an abandoned generation and the copy tokens it did not pay for; returns that estimate.
+
+    `streamed_chars` is how much of a streamed reply had already arrived.
+    """
+    if streamed_chars:
+        saved = max(0, estimate_output_tokens(payload.content_type) - streamed_chars // 4)
+    else:
+        finished = sum(r.call in COPY_CALLS for r in usage)
+        saved = max(0, payload.variants - finished) * estimate_output_tokens(payload.content_type)
+    label = content_type_label(payload.content_type)
+    cancelled_generations.inc(content_type=label)
+    cancelled_tokens_saved.inc(saved, content_type=label)
+    logger.info(f"Generation cancelled, ~{saved} output tokens saved")
+    return saved
+
+
+def _cache_key(payload: CopyRequest, keywords: Optional[List[str]], llm: CopywritingLLM) -> str:
+    request = payload.model_dump(exclude={"force_refresh"})
+    return ResponseCache.key(request, keywords, llm.model, llm.prompt_version)
+
+
+def _near_context(payload: CopyRequest, llm: CopywritingLLM) -> str:
+    """Everything but the fuzzy-matched fields; a near-duplicate response is only reused when this matches"""
+    request = payload.model_dump(exclude={"audience", "product_info", "force_refresh"})
+    return hash_key("near", llm.model, llm.prompt_version, request)
+
+
+def _cache_metadata(status: str, entry: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    if entry is None:
+        return {"status": status}
+    return {"status": status, "etag": entry["etag"], "age": int(time.time() - entry["stored_at"])}
+
+
+def _near_metadata(status: str, near: Optional[NearMatch] = None) -> Dict[str, Any]:
+    if near is None:
+        return {"status": status}
+    return {"status": status, "similarity": near.similarity, "age": near.age, "lookup_ms": near.lookup_ms}
+
+
+def usage_metadata(usage: List[UsageRecord]) -> Dict[str, Any]:
+    """Token and cost fields for the upstream calls a request actually made; all zero when it made none"""
+    if not usage:
+        return {"tokens_used": 0, "estimated_cost": 0.0, "usage": None, "prompt_cache": None}
+    summary = summarize_usage(usage)
+    tokens_used = (
+        summary["input_tokens"] + summary["output_tokens"]
+        + summary["cache_creation_input_tokens"] + summary["cache_read_input_tokens"]
+    )
+    return {
+        "tokens_used": tokens_used,
+        "estimated_cost": summary["cost"],
+        "usage": summary,
+        "prompt_cache": prompt_cache_summary(usage)
+    }
+
+
+def _reused_metadata(metadata: Dict[str, Any], usage: List[UsageRecord], timings: Dict[str, float], started: float) -> None:
+    """Report a reused response's cost as this request's own spend; the original generation's goes under cached_from"""
+    metadata["cached_from"] = {field: metadata.pop(field, None) for field in REUSED_FIELDS}
+    # e.g. the keyword call a standard-mode cache key needs; usually nothing
+    metadata.update(usage_metadata(usage))
+    timings["total"] = round((time.perf_counter() - started) * 1000, 1)
+    metadata["timings_ms"] = timings
+
+
+def cost_metadata(payload: CopyRequest, text: str, usage: List[UsageRecord]) -> Dict[str, Any]:
+    """Token and cost fields for a response: real usage when the provider reported it, else the chars/4 estimate"""
+    if usage:
+        return usage_metadata(usage)
+
+    input_tokens = estimate_input_tokens(payload)
+    output_tokens = estimate_tokens(text)
+    return {
+        "tokens_used": input_tokens + output_tokens,
+        "estimated_cost": calculate_cost(input_tokens, output_tokens),
+        "usage": None,
+        "prompt_cache": None
+    }
+
+
+async def run_generation(
+    payload: CopyRequest,
+    llm: CopywritingLLM,
+    keyword_cache: Optional[KeywordCache] = None,
+    response_cache: Optional[ResponseCache] = None,
+    force_refresh: bool = False,
+    ledger: Optional[CostLedger] = None,
+    request_id: Optional[str] = None,
+    near_duplicates: Optional[NearDuplicateIndex] = None
+) -> Dict[str, Any]:
+    """Generate, validate and cost one piece of copy; returns the /generate response body.
+
+    Upstream usage is collected for every call made on behalf of this
+    request and appended to the cost ledger, including for copy that then
+    fails validation or a generation cancelled part way through.
+    """
+    request_id = request_id or uuid.uuid4().hex
+    with collect_usage() as usage:
+        try:
+            body = await _generate(payload, llm, keyword_cache, response_cache, force_refresh, usage, near_duplicates)
+        except asyncio.CancelledError:
+            record_cancellation(payload, usage)
+            raise
+        finally:
+            if ledger and usage:
+                ledger.record(request_id, payload.content_type, usage)
+    body["metadata"]["request_id"] = request_id
+    return body
+
+
+async def _generate(
+    payload: CopyRequest,
+    llm: CopywritingLLM,
+    keyword_cache: Optional[KeywordCache],
+    response_cache: Optional[ResponseCache],
+    force_refresh: bool,
+    usage: List[UsageRecord],
+    near_duplicates: Optional[NearDuplicateIndex] = None
+) -> Dict[str, Any]:
+    """With a response cache, identical requests are served from it and the
+    outcome is reported in metadata.cache. In standard mode keywords are
+    resolved first because they are part of the cache key; in the other
+    modes they are an output of generation, so the request alone is the key.
+
+    With the near-duplicate index, a reworded earlier request lends its
+    keywords, or its whole response when similar enough; the outcome is
+    reported in metadata.near_duplicate.
+    """
+    started = time.perf_counter()
+    timings = {}
+    keywords = None
+    cache_key = None
+    force_refresh = force_refresh or payload.force_refresh
+
+    near = None
+    near_context = None
+    if near_duplicates is not None:
+        near_context = _near_context(payload, llm)
+        if not force_refresh:
+            near = await near_duplicates.alookup(payload.audience, payload.product_info, near_context)
+        # an exact repeat is left to the response cache, which also serves ETags
+        if near and near.body is not None and not (near.exact and response_cache):
+            logger.info(f"✓ Served {payload.content_type} from a near-duplicate request ({near.similarity})")
+            body = near.body
+            _reused_metadata(body["metadata"], usage, timings, started)
+            body["metadata"]["cache"] = _cache_metadata("near_hit")
+            body["metadata"]["near_duplicate"] = _near_metadata("returned", near)
+            return body
+        if near and not payload.keywords:
+            keywords = near.keywords
+
+    if response_cache:
+        if keywords is None and (payload.generation_mode == "standard" or payload.keywords or payload.variants > 1):
+            keywords, timings["keywords"] = await _timed(resolve_keywords(payload, llm, keyword_cache), "keywords", payload.content_type)
+        cache_key = _cache_key(payload, keywords, llm)
+        if not force_refresh:
+            entry = await response_cache.get(cache_key)
+            if entry is not None:
+                logger.info(f"✓ Served {payload.content_type} from response cache")
+                body = entry["body"]
+                _reused_metadata(body["metadata"], usage, timings, started)
+                body["metadata"]["cache"] = _cache_metadata("hit", entry)
+                return body
+
+    variants = None
+    if payload.variants > 1:
+        # each variant is validated on its own; invalid ones are dropped rather than repaired
+        keywords, ranked, rejected, copy_timings = await produce_variants(payload, llm, keyword_cache, keywords)
+        timings.update(copy_timings)
+        text, validation = ranked[0]["content"], ranked[0]["validation"]
+        repair = {"attempts": 0, "actions": []}
+        variants = {"ranked": ranked, "rejected": rejected}
+    else:
+        keywords, text, copy_timings = await produce_copy(payload, llm, keyword_cache, keywords)
+        timings.update(copy_timings)
+
+        # Validate, repairing copy that fails within the configured budgets
+        text, report, repair = await repair_copy(payload, llm, keywords, text)
+        validation = report.summary()
+        if repair["attempts"]:
+            timings["repair"] = repair["ms"]
+
+    # Calculate cost
+    costs = cost_metadata(payload, text, usage)
+    timings["total"] = round((time.perf_counter() - started) * 1000, 1)
+
+    # what actually ran, which differs from the requested mode after a single-shot fallback
+    mode_used = "standard" if SINGLE_SHOT_FAILED in timings else payload.generation_mode
+    logger.info(f"✓ Generated {len(text)} chars ({costs['tokens_used']} tokens) - Cost: ${costs['estimated_cost']} - {timings['total']}ms ({mode_used})")
+
+    # Return response matching frontend expectations
+    body = {
+        "content": text,  # Frontend expects this
+        "keywords": keywords,
+        "tone_used": payload.tone_of_voice or "default",
+        "content_type": payload.content_type,
+        "metadata": {
+            "status": "ok",
+            **costs,
+            "generation_mode": payload.generation_mode,
+            "generation_mode_used": mode_used,
+            "timings_ms": timings,
+            "validation": validation,
+            "repair": {"attempts": repair["attempts"], "actions": repair["actions"]}
+        }
+    }
+    if variants is not None:
+        body["variants"] = variants["ranked"]  # best first; body["content"] is the top one
+        body["metadata"]["variants"] = {
+            "requested": payload.variants,
+            "valid": len(variants["ranked"]),
+            "rejected": variants["rejected"]
+        }
+
+    if response_cache:
+        entry = await response_cache.set(cache_key, body)
+        body["metadata"]["cache"] = _cache_metadata("refresh" if force_refresh else "miss", entry)
+    else:
+        body["metadata"]["cache"] = _cache_metadata("disabled")
+
+    if near_duplicates is not None:
+        await near_duplicates.aadd(payload.audience, payload.product_info, near_context, keywords, body)
+        seeded = near is not None and not payload.keywords
+        body["metadata"]["near_duplicate"] = _near_metadata("seeded", near) if seeded else _near_metadata("miss")
+    return body
@@ -0,0 +1,23 @@
+"""Lazy access to the Anthropic SDK.
+
+anthropic (with httpx under it) is the largest import the app has, so no
+module imports it at load time. Clients are built through `sdk()` on first
+use, and error checks go through `is_sdk_error`, which never loads the SDK:
+nothing can have raised one of its errors before it was imported.
+"""
+import importlib
+import sys
+from types import ModuleType
+
+SDK = "anthropic"
+
+
+def sdk() -> ModuleType:
+    """The anthropic module, imported on first call"""
+    return importlib.import_module(SDK)
+
+
+def is_sdk_error(e: BaseException, *names: str) -> bool:
+    """isinstance(e, anthropic.<name>) for any of the given exception names"""
+    module = sys.modules.get(SDK)
+    return module is not None and isinstance(e, tuple(getattr(module, name) for name in names))
@@ -0,0 +1,85 @@
+from typing import Any, Dict, List, Tuple
+from .content_types import classify_content_type
+from .validation import CTA_INDICATORS, PhraseMatcher, Tokens, ValidationReport, get_engine, keyword_matcher
+
+# weights of the local variant score; each component is in [0, 1]
+SCORE_WEIGHTS = {"keywords": 0.4, "length": 0.35, "cta": 0.25}
+WARNING_PENALTY = 0.05  # per validation warning, capped at 0.2
+
+_CTA_MATCHER = PhraseMatcher((phrase, 0) for phrase in CTA_INDICATORS)
+
+
+def _length_fit(word_count: int, content_type: str) -> float:
+    """1.0 inside the type's word range, falling off in proportion outside it"""
+    rule = classify_content_type(content_type)
+    if rule.min_words and word_count < rule.min_words:
+        return word_count / rule.min_words
+    if rule.max_words and word_count > rule.max_words:
+        return rule.max_words / word_count
+    return 1.0
+
+
+def _cta_placement(text: str, tokens: Tokens, require_cta: bool, content_type: str) -> float:
+    """1.0 for a CTA in the closing quarter of the copy (where the prompt asks for it), 0.5 elsewhere"""
+    if not require_cta or classify_content_type(content_type).skips_cta:
+        return 1.0
+    hits = _CTA_MATCHER.scan(tokens)
+    if not hits:
+        return 0.0
+    return 1.0 if hits[-1].end >= len(text.rstrip()) * 0.75 else 0.5
+
+
+def score_copy(
+    text: str,
+    keywords: List[str],
+    content_type: str,
+    require_cta: bool,
+    report: ValidationReport
+) -> Dict[str, float]:
+    """Cheap local quality score for one piece of copy; no model calls"""
+    tokens = Tokens.of(text)
+    keywords = [k for k in keywords if k.strip()]
+    if keywords:
+        found = {hit.owner for hit in keyword_matcher(tuple(keywords)).scan(tokens)}
+        coverage = len(found) / len(keywords)
+    else:
+        coverage = 1.0
+
+    scores = {
+        "keywords": coverage,
+        "length": _length_fit(len(tokens.words), content_type),
+        "cta": _cta_placement(text, tokens, require_cta, content_type),
+    }
+    total = sum(SCORE_WEIGHTS[name] * value for name, value in scores.items())
+    total -= min(0.2, WARNING_PENALTY * len(report.warnings))
+    return {"total": round(max(0.0, total), 3), **{name: round(value, 3) for name, value in scores.items()}}
+
+
+def rank_variants(
+    texts: List[str],
+    keywords: List[str],
+    content_type: str,
+    require_cta: bool
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Validate each variant on its own and rank the valid ones, best first.
+
+    Returns (ranked, rejected); rejected variants carry their first error.
+    Ties keep generation order.
+    """
+    engine = get_engine()
+    ranked, rejected = [], []
+    for index, text in enumerate(texts):
+        report = engine.validate(text, content_type, require_cta, keywords)
+        if not report.ok:
+            rejected.append({"index": index, "detail": report.errors[0].message})
+            continue
+        scores = score_copy(text, keywords, content_type, require_cta, report)
+        ranked.append({
+            "index": index,
+            "content": text,
+            "score": scores.pop("total"),
+            "scores": scores,
+            "validation": report.summary()
+        })
+    ranked.sort(key=lambda variant: variant["score"], reverse=True)
+    return ranked, rejected
@@ -0,0 +1,113 @@
+import asyncio
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from .config import get_settings
+from .llm import CopywritingLLM
+from .logger import logger
+from .metrics import span
+from .schemas import CopyRequest
+from .validation import ValidationReport, get_engine, max_copy_length
+
+# end of a sentence: terminal punctuation (plus closing quotes/brackets) or a line break
+_SENTENCE_END = re.compile(r"[.!?][\"'’”)\]]*(?=\s|$)|\n")
+
+
+def truncate_at_sentence(text: str, limit: int, min_keep: float = 0.5) -> Optional[str]:
+    """The longest run of whole sentences that fits in `limit` chars.
+
+    None when that would keep less than `min_keep` of the limit, since by then
+    the copy has lost too much to pass as the same piece.
+    """
+    cut = None
+    for match in _SENTENCE_END.finditer(text):
+        if match.end() > limit:
+            break
+        cut = match.end()
+    if cut is None:
+        return None
+    truncated = text[:cut].rstrip()
+    return truncated if len(truncated) >= limit * min_keep else None
+
+
+def repair_instruction(report: ValidationReport, text: str, content_type: str) -> str:
+    """A targeted fix request for the model, one line per failed rule"""
+    fixes = []
+    for violation in report.errors:
+        if violation.rule == "length":
+            limit = max_copy_length(content_type)
+            fixes.append(f"- Shorten it to at most {limit} characters (it is {len(text)}). Keep the strongest points.")
+        elif violation.rule == "cta":
+            fixes.append("- End with ONE clear call-to-action.")
+        else:
+            fixes.append(f"- Fix this: {violation.message}")
+    return (
+        "That copy does not meet the requirements:\n" + "\n".join(fixes)
+        + "\nChange nothing else. Return ONLY the revised copy."
+    )
+
+
+async def repair_copy(
+    payload: CopyRequest,
+    llm: CopywritingLLM,
+    keywords: List[str],
+    text: str,
+    max_attempts: Optional[int] = None,
+    latency_budget: Optional[float] = None
+) -> Tuple[str, ValidationReport, Dict[str, Any]]:
+    """Validate copy, repairing it while errors remain and the budgets allow.
+
+    Copy that is only too long is first truncated locally at a sentence
+    boundary; otherwise the draft goes back to the model with a targeted fix
+    instruction, continuing the original conversation so its prompt prefix
+    is reused. Each repair counts against `max_attempts`, and no repair is
+    started once `latency_budget` seconds have passed. When the budgets run
+    out the last validation error is raised as ValueError.
+
+    Returns (copy, report, repair metadata).
+    """
+    max_attempts = get_settings().REPAIR_MAX_ATTEMPTS if max_attempts is None else max_attempts
+    latency_budget = get_settings().REPAIR_LATENCY_BUDGET if latency_budget is None else latency_budget
+    engine = get_engine()
+    started = time.perf_counter()
+    actions = []
+
+    def validate(candidate: str) -> ValidationReport:
+        with span("validation", payload.content_type):
+            return engine.validate(candidate, payload.content_type, payload.cta, keywords)
+
+    report = validate(text)
+    while not report.ok and len(actions) < max_attempts:
+        remaining = latency_budget - (time.perf_counter() - started)
+        if remaining <= 0:
+            logger.info("Repair latency budget exhausted")
+            break
+
+        if {v.rule for v in report.errors} == {"length"}:
+            truncated = truncate_at_sentence(text, max_copy_length(payload.content_type))
+            if truncated is not None:
+                truncated_report = validate(truncated)
+                if truncated_report.ok:
+                    actions.append("truncate")
+                    text, report = truncated, truncated_report
+                    break
+
+        instruction = repair_instruction(report, text, payload.content_type)
+        actions.append("model")
+        try:
+            with span("repair", payload.content_type):
+                text = await asyncio.wait_for(llm.repair_copy(payload, keywords, text, instruction), remaining)
+        except asyncio.TimeoutError:
+            logger.info("Repair call overran the latency budget")
+            break
+        report = validate(text)
+
+    if actions:
+        outcome = "repaired" if report.ok else "failed"
+        logger.info(f"Copy {outcome} after {len(actions)} repair attempt(s): {', '.join(actions)}")
+    report.raise_for_errors()
+    return text, report, {
+        "attempts": len(actions),
+        "actions": actions,
+        "ms": round((time.perf_counter() - started) * 1000, 1)
+    }
@@ -1,82 +1,251 @@
-from fastapi import APIRouter, HTTPException
-from .schemas import CopyRequest, CopyResponse
-from .llm import get_llm
-from .validation import validate_copy_output
-from .utils import estimate_tokens, calculate_cost
-from .logger import logger
-from anthropic import APIError, RateLimitError, APITimeoutError
+import asyncio
+import json
+import time
+from typing import Any, Awaitable, Literal, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from .schemas import BatchRequest, CopyRequest, CopyResponse
+from .llm import CopywritingLLM
+from .batch import BatchJobStore, run_batch, submit_batch_job, collect_batch_job
+from .config import get_settings
+from .dependencies import (
+    provide_llm, provide_keyword_cache, provide_response_cache, provide_batch_jobs, provide_ledger,
+    provide_near_duplicates
+)
+from .cache import KeywordCache, ResponseCache
+from .ledger import CostLedger
+from .near_duplicates import NearDuplicateIndex
+from .pipeline import resolve_keywords, run_generation, cost_metadata, record_cancellation
+from .usage import collect_usage
+from .validation import StreamingValidator
+from .logger import logger, request_id_var
+from .metrics import span
+from .errors import to_http_error
 
 router = APIRouter(tags=["copy"])
 
+
+# nginx's "client closed request"; never seen by the client, but shows up in logs and metrics
+CLIENT_CLOSED_REQUEST = 499
+
+
+class ClientDisconnected(Exception):
+    """The caller went away before the response was ready"""
+
+
+async def until_disconnected(request: Request, work: Awaitable[Any], poll_interval: Optional[float] = None) -> Any:
+    """Await `work`, cancelling it if the client disconnects first.
+
+    Cancelling closes the in-flight upstream request, so tokens stop being
+    generated (and billed) for a response nobody will read.
+    """
+    poll_interval = get_settings().DISCONNECT_POLL_INTERVAL if poll_interval is None else poll_interval
+    task = asyncio.ensure_future(work)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                logger.info("Client disconnected, cancelling generation")
+                raise ClientDisconnected()
+    finally:
+        if not task.done():
+            task.cancel()
+            # let the cancelled work record its usage and cancellation before returning
+            await asyncio.wait({task})
+
+
 @router.post("/generate")
-async def generate_copy(payload: CopyRequest):
+async def generate_copy(
+    request: Request,
+    payload: CopyRequest,
+    llm: CopywritingLLM = Depends(provide_llm),
+    keyword_cache: Optional[KeywordCache] = Depends(provide_keyword_cache),
+    response_cache: Optional[ResponseCache] = Depends(provide_response_cache),
+    ledger: Optional[CostLedger] = Depends(provide_ledger),
+    near_duplicates: Optional[NearDuplicateIndex] = Depends(provide_near_duplicates),
+    cache_control: Optional[str] = Header(default=None),
+    if_none_match: Optional[str] = Header(default=None)
+):
     try:
         logger.info(f"Generating {payload.content_type} for: {payload.audience[:50]}...")
-        
-        llm = get_llm()
-        
-        # Generate keywords if not provided
-        keywords = payload.keywords
-        if not keywords:
-            keywords = await llm.generate_keywords(payload.audience, payload.product_info)
-            logger.info(f"Generated keywords: {', '.join(keywords[:5])}")
-        
-        # Estimate input cost
-        input_text = f"{payload.content_type} {payload.audience} {payload.product_info}"
-        if payload.brand_sample:
-            input_text += payload.brand_sample
-        input_tokens = estimate_tokens(input_text)
-        
-        # Generate copy
-        text = await llm.generate_copy(payload, keywords)
-        
-       # Validate (now passing content_type)
-        validate_copy_output(text, require_cta=payload.cta, content_type=payload.content_type)
-        
-        # Calculate cost
-        output_tokens = estimate_tokens(text)
-        cost = calculate_cost(input_tokens, output_tokens)
-        
-        logger.info(f"✓ Generated {len(text)} chars (~{output_tokens} tokens) - Cost: ${cost}")
-        
-        # Return response matching frontend expectations
-        return {
-            "content": text,  # Frontend expects this
+        force_refresh = "no-cache" in (cache_control or "").lower()
+        body = await until_disconnected(request, run_generation(
+            payload, llm, keyword_cache, response_cache, force_refresh, ledger, request_id_var.get(), near_duplicates
+        ))
+    except ClientDisconnected:
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+    except Exception as e:
+        raise to_http_error(e)
+
+    cache = body["metadata"]["cache"]
+    if "etag" not in cache:
+        return body
+
+    headers = {"ETag": cache["etag"], "Cache-Control": f"private, max-age={int(get_settings().RESPONSE_CACHE_TTL)}"}
+    if cache["status"] == "hit" and if_none_match == cache["etag"]:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(body, headers=headers)
+
+
+def _ndjson(event: dict) -> str:
+    return json.dumps(event) + "\n"
+
+
+@router.post("/generate/stream")
+async def generate_copy_stream(
+    payload: CopyRequest,
+    llm: CopywritingLLM = Depends(provide_llm),
+    keyword_cache: Optional[KeywordCache] = Depends(provide_keyword_cache),
+    ledger: Optional[CostLedger] = Depends(provide_ledger)
+):
+    """Stream copy as NDJSON events: keywords, delta*, then done or error.
+
+    Keyword generation happens before the response starts, so its failures
+    still surface as normal HTTP errors. Once streaming, errors arrive as an
+    `error` event carrying the status code /generate would have returned.
+    generation_mode is ignored here: streamed copy always uses the standard path.
+    Variants need every version before they can be ranked, so they are only
+    available from /generate.
+    """
+    if payload.variants > 1:
+        raise HTTPException(status_code=400, detail="variants are not supported when streaming; use /generate")
+    started = time.perf_counter()
+    request_id = request_id_var.get()
+    try:
+        logger.info(f"Streaming {payload.content_type} for: {payload.audience[:50]}...")
+        with collect_usage() as keyword_usage, span("keywords", payload.content_type):
+            keywords = await resolve_keywords(payload, llm, keyword_cache)
+    except Exception as e:
+        raise to_http_error(e)
+
+    async def events():
+        with collect_usage() as usage:
+            usage.extend(keyword_usage)
+            try:
+                async for event in stream_events(usage):
+                    yield event
+            finally:
+                if ledger and usage:
+                    ledger.record(request_id, payload.content_type, usage)
+
+    async def stream_events(usage):
+        yield _ndjson({"type": "keywords", "keywords": keywords})
+
+        validator = StreamingValidator(require_cta=payload.cta, content_type=payload.content_type, keywords=keywords)
+        ttfb_ms = None
+        chunks = llm.stream_copy(payload, keywords)
+        try:
+            with span("copy", payload.content_type):
+                async for chunk in chunks:
+                    if ttfb_ms is None:
+                        ttfb_ms = round((time.perf_counter() - started) * 1000, 1)
+                        logger.info(f"First token after {ttfb_ms}ms")
+                    validator.feed(chunk)
+                    yield _ndjson({"type": "delta", "text": chunk})
+                text = validator.finish()
+        except (asyncio.CancelledError, GeneratorExit):
+            # the client went away mid-stream; closing `chunks` below stops the upstream stream
+            record_cancellation(payload, usage, validator.length)
+            raise
+        except Exception as e:
+            error = to_http_error(e)
+            yield _ndjson({"type": "error", "status": error.status_code, "detail": error.detail})
+            return
+        finally:
+            # stops the upstream stream early if validation aborted it
+            await chunks.aclose()
+
+        costs = cost_metadata(payload, text, usage)
+        logger.info(f"✓ Streamed {len(text)} chars ({costs['tokens_used']} tokens) - Cost: ${costs['estimated_cost']}")
+
+        yield _ndjson({
+            "type": "done",
+            "content": text,
             "keywords": keywords,
             "tone_used": payload.tone_of_voice or "default",
             "content_type": payload.content_type,
             "metadata": {
                 "status": "ok",
-                "tokens_used": input_tokens + output_tokens,
-                "estimated_cost": cost
+                **costs,
+                "ttfb_ms": ttfb_ms,
+                "validation": validator.report.summary(),
+                "request_id": request_id
             }
-        }
-    
-    except ValueError as e:
-        logger.error(f"Validation failed: {str(e)}")
-        raise HTTPException(status_code=400, detail=str(e))
-    
-    except RateLimitError:
-        logger.error("Hit Anthropic rate limit!")
-        raise HTTPException(
-            status_code=429,
-            detail="Claude API rate limit reached. Wait a moment and try again."
-        )
-    
-    except APITimeoutError:
-        logger.error("Claude API timeout")
-        raise HTTPException(
-            status_code=504,
-            detail="Request timed out. Try again."
-        )
-    
-    except APIError as e:
-        logger.error(f"Claude API error: {str(e)}")
-        raise HTTPException(
-            status_code=502,
-            detail=f"Claude API error: {str(e)}"
-        )
-    
+        })
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+@router.post("/generate/batch")
+async def generate_batch(
+    payload: BatchRequest,
+    llm: CopywritingLLM = Depends(provide_llm),
+    keyword_cache: Optional[KeywordCache] = Depends(provide_keyword_cache),
+    ledger: Optional[CostLedger] = Depends(provide_ledger)
+):
+    """Generate many items with bounded concurrency, streaming NDJSON results as each completes"""
+    logger.info(f"Batch generating {len(payload.items)} items...")
+    concurrency = payload.concurrency or get_settings().BATCH_CONCURRENCY
+
+    async def events():
+        async for event in run_batch(payload.items, llm, keyword_cache, concurrency, ledger):
+            yield _ndjson(event)
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+@router.post("/generate/batch/jobs", status_code=202)
+async def create_batch_job(
+    payload: BatchRequest,
+    llm: CopywritingLLM = Depends(provide_llm),
+    keyword_cache: Optional[KeywordCache] = Depends(provide_keyword_cache),
+    jobs: BatchJobStore = Depends(provide_batch_jobs)
+):
+    """Submit a large offline run to the provider's message-batch API; poll the returned job_id"""
+    try:
+        concurrency = payload.concurrency or get_settings().BATCH_CONCURRENCY
+        return await submit_batch_job(payload.items, llm, keyword_cache, concurrency, jobs)
     except Exception as e:
-        logger.error(f"Unexpected error: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
\ No newline at end of file
+        raise to_http_error(e)
+
+
+@router.get("/generate/batch/jobs/{job_id}")
+async def get_batch_job(
+    job_id: str,
+    llm: CopywritingLLM = Depends(provide_llm),
+    jobs: BatchJobStore = Depends(provide_batch_jobs),
+    ledger: Optional[CostLedger] = Depends(provide_ledger)
+):
+    job = await jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown batch job")
+    try:
+        return await collect_batch_job(job, llm, jobs, ledger)
+    except Exception as e:
+        raise to_http_error(e)
+
+
+def _require_ledger(ledger: Optional[CostLedger]) -> CostLedger:
+    if ledger is None:
+        raise HTTPException(status_code=404, detail="Cost ledger is disabled")
+    return ledger
+
+
+@router.get("/ledger/summary", tags=["ledger"])
+async def ledger_summary(
+    group_by: Literal["day", "content_type"] = "day",
+    ledger: Optional[CostLedger] = Depends(provide_ledger)
+):
+    ledger = _require_ledger(ledger)
+    rows = await (ledger.by_day() if group_by == "day" else ledger.by_content_type())
+    return {"group_by": group_by, "rows": rows}
+
+
+@router.get("/ledger/requests/{request_id}", tags=["ledger"])
+async def ledger_request(request_id: str, ledger: Optional[CostLedger] = Depends(provide_ledger)):
+    calls = await _require_ledger(ledger).for_request(request_id)
+    if not calls:
+        raise HTTPException(status_code=404, detail="No ledger entries for this request")
+    return {"request_id": request_id, "calls": calls, "cost": round(sum(c["cost"] for c in calls), 6)}
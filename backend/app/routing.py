@@ -0,0 +1,100 @@
+import hashlib
+import json
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+from .config import Settings
+from .content_types import ContentTypeRule, classify_content_type
+
+ROUTES = ("keywords", "copy:short", "copy:medium", "copy:long")
+
+
+def length_class(rule: ContentTypeRule) -> str:
+    """"short", "medium" or "long", from the bounds in the content-type table"""
+    if (rule.max_words and rule.max_words <= 50) or (not rule.max_words and rule.max_chars and rule.max_chars <= 300):
+        return "short"
+    if rule.min_words and rule.min_words >= 500:
+        return "long"
+    return "medium"
+
+
+def route_for(call: str, content_type: str = "") -> str:
+    """Routing key for an upstream call: "keywords", or "copy:<length class>" of the content type"""
+    if call == "keywords":
+        return "keywords"
+    return f"copy:{length_class(classify_content_type(content_type))}"
+
+
+class RouteStats:
+    """Calls, errors, latency and cost for one (route, model) pair"""
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.cost = 0.0
+        self.latencies: Deque[float] = deque(maxlen=500)
+
+    def snapshot(self) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "cost": round(self.cost, 6),
+            "avg_cost": round(self.cost / self.calls, 6) if self.calls else 0.0,
+            "latency_p50_ms": round(latencies[len(latencies) // 2] * 1000, 1) if latencies else 0.0,
+            "latency_p95_ms": round(latencies[int(len(latencies) * 0.95)] * 1000, 1) if latencies else 0.0,
+        }
+
+
+class ModelRouter:
+    """Chooses the model for each upstream call and tracks how each route performs.
+
+    Routes missing from `routes` use `default_model`. A route served by
+    another model falls back to `default_model` for repairs once its copy
+    fails validation; `fallbacks` overrides that per route, and an empty
+    string disables it.
+    """
+    def __init__(
+        self,
+        default_model: str,
+        routes: Optional[Dict[str, str]] = None,
+        fallbacks: Optional[Dict[str, str]] = None
+    ):
+        self.default_model = default_model
+        self.routes = dict(routes or {})
+        self.fallbacks = dict(fallbacks or {})
+        self._stats: Dict[str, Dict[str, RouteStats]] = {}
+        self.fingerprint = hashlib.sha256(
+            json.dumps([default_model, self.routes, self.fallbacks], sort_keys=True).encode("utf-8")
+        ).hexdigest()[:12]
+
+    def model_for(self, route: str) -> str:
+        return self.routes.get(route) or self.default_model
+
+    def fallback_for(self, route: str) -> Optional[str]:
+        """Model to escalate to when this route's copy fails validation, if any"""
+        fallback = self.fallbacks.get(route)
+        if fallback is None:
+            fallback = self.default_model
+        return fallback if fallback and fallback != self.model_for(route) else None
+
+    def observe(self, route: str, model: str, seconds: float, cost: float = 0.0, failed: bool = False) -> None:
+        stats = self._stats.setdefault(route, {}).setdefault(model, RouteStats())
+        stats.calls += 1
+        stats.errors += failed
+        stats.cost += cost
+        stats.latencies.append(seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            route: {
+                "model": self.model_for(route),
+                "fallback": self.fallback_for(route),
+                "by_model": {model: s.snapshot() for model, s in self._stats.get(route, {}).items()},
+            }
+            for route in ROUTES
+        }
+
+
+def build_router(settings: Settings) -> ModelRouter:
+    if not settings.MODEL_ROUTING_ENABLED:
+        return ModelRouter(settings.ANTHROPIC_MODEL)
+    return ModelRouter(settings.ANTHROPIC_MODEL, settings.MODEL_ROUTES, settings.MODEL_FALLBACKS)
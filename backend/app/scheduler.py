@@ -0,0 +1,377 @@
+import asyncio
+import random
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Set, TypeVar
+from .config import Settings
+from .logger import logger
+from .metrics import registry
+from .provider import is_sdk_error
+
+T = TypeVar("T")
+
+# transient upstream failures worth retrying (anthropic exception names); timeouts are not, the caller
+# already waited long enough
+RETRYABLE_ERRORS = ("RateLimitError", "InternalServerError", "APIConnectionError")
+
+queued_calls = registry.gauge("scheduler_queued_calls", "Upstream calls waiting for a scheduler slot")
+active_calls = registry.gauge("scheduler_active_calls", "Upstream calls holding a scheduler slot")
+queue_wait = registry.histogram(
+    "scheduler_queue_wait_seconds", "Time upstream calls waited for a scheduler slot; 0 when one was free",
+    buckets=(0.0, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+pause_ends_at = registry.gauge(
+    "scheduler_paused_until_seconds",
+    "Unix time until which dispatch is paused for the upstream rate limit; paused while it is ahead of time()"
+)
+shed_calls = registry.counter("scheduler_shed_calls_total", "Upstream calls refused because the queue wait was too long")
+
+
+class SchedulerOverloaded(Exception):
+    """Raised instead of queueing when the estimated wait is past the configured limit"""
+    def __init__(self, estimated_wait: float):
+        super().__init__(f"Upstream queue is full (estimated wait {estimated_wait:.1f}s)")
+        self.estimated_wait = estimated_wait
+
+
+def _parse_reset(value: Optional[str]) -> Optional[float]:
+    """Epoch seconds from an RFC 3339 ratelimit reset header"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def _parse_int(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Delay requested by the upstream response, if any"""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    for name, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        try:
+            return float(headers[name]) * scale
+        except (KeyError, ValueError):
+            continue
+    return None
+
+
+class RateLimitState:
+    """Upstream quota as last reported by the anthropic-ratelimit-* response headers"""
+    def __init__(self):
+        self.requests_remaining: Optional[int] = None
+        self.requests_reset: Optional[float] = None
+        self.tokens_remaining: Optional[int] = None
+        self.tokens_reset: Optional[float] = None
+
+    def observe(self, headers) -> None:
+        requests_remaining = _parse_int(headers.get("anthropic-ratelimit-requests-remaining"))
+        if requests_remaining is not None:
+            self.requests_remaining = requests_remaining
+            self.requests_reset = _parse_reset(headers.get("anthropic-ratelimit-requests-reset"))
+
+        # prefer the combined token budget, fall back to the input-token one
+        for prefix in ("anthropic-ratelimit-tokens", "anthropic-ratelimit-input-tokens"):
+            tokens_remaining = _parse_int(headers.get(f"{prefix}-remaining"))
+            if tokens_remaining is not None:
+                self.tokens_remaining = tokens_remaining
+                self.tokens_reset = _parse_reset(headers.get(f"{prefix}-reset"))
+                break
+
+    def blocked_until(self, min_tokens: int) -> float:
+        """Epoch time before which no new request should start (0 when unblocked)"""
+        until = 0.0
+        if self.requests_remaining == 0 and self.requests_reset:
+            until = max(until, self.requests_reset)
+        if self.tokens_remaining is not None and self.tokens_remaining < min_tokens and self.tokens_reset:
+            until = max(until, self.tokens_reset)
+        return until
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "requests_remaining": self.requests_remaining,
+            "tokens_remaining": self.tokens_remaining,
+        }
+
+
+class UpstreamScheduler:
+    """Admission control in front of the LLM.
+
+    At most `max_concurrency` upstream calls run at once. Waiting calls are
+    queued per client and released round-robin, so one busy client cannot
+    starve the rest. Dispatch pauses while the upstream quota is exhausted,
+    transient failures are retried with jittered exponential backoff
+    (honouring retry-after), and calls are shed with SchedulerOverloaded
+    when the estimated queue wait exceeds `max_queue_wait`.
+    """
+    def __init__(
+        self,
+        max_concurrency: int = 16,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 20.0,
+        max_queue_wait: float = 30.0,
+        min_tokens_remaining: int = 2000,
+        shared=None
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_queue_wait = max_queue_wait
+        self.min_tokens_remaining = min_tokens_remaining
+        # SharedRateLimits when several workers share one upstream quota
+        self.shared = shared
+
+        self.limits = RateLimitState()
+        self.active = 0
+        self.paused_until = 0.0
+        self._queues: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        self._wake_handle: Optional[asyncio.TimerHandle] = None
+        self._publishing: Set[asyncio.Task] = set()
+
+        # metrics
+        self.service_time: Optional[float] = None  # EWMA of call duration, seconds
+        self.recent_waits: Deque[float] = deque(maxlen=500)
+        self.completed = 0
+        self.retries = 0
+        self.shed = 0
+
+    @property
+    def queued(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def observe_headers(self, headers) -> None:
+        """Feed ratelimit headers from every upstream response"""
+        self.limits.observe(headers)
+        self._pause_until(self.limits.blocked_until(self.min_tokens_remaining))
+
+    def _pause_until(self, until: float) -> None:
+        self.paused_until = max(self.paused_until, until)
+        pause_ends_at.set(self.paused_until)
+        if self.shared and until > time.time():
+            # published in the background; the local pause already holds this worker off
+            task = asyncio.get_running_loop().create_task(self.shared.publish_pause(until))
+            self._publishing.add(task)
+            task.add_done_callback(self._publishing.discard)
+
+    async def _sync_pause(self) -> None:
+        """Adopt a pause another worker has seen"""
+        if self.shared:
+            self.paused_until = max(self.paused_until, await self.shared.paused_until())
+            pause_ends_at.set(self.paused_until)
+
+    def estimated_wait(self) -> float:
+        pause = max(0.0, self.paused_until - time.time())
+        if self.active < self.max_concurrency and not self.queued:
+            return pause
+        per_call = self.service_time or 0.0
+        return pause + (self.queued + 1) / self.max_concurrency * per_call
+
+    async def _acquire(self, client_id: str, max_wait: float) -> None:
+        await self._sync_pause()
+        if self.active < self.max_concurrency and not self.queued and self.paused_until <= time.time():
+            self.active += 1
+            self._observe_wait(0.0)
+            self._report()
+            return
+
+        estimate = self.estimated_wait()
+        if estimate > max_wait:
+            self.shed += 1
+            shed_calls.inc()
+            raise SchedulerOverloaded(estimate)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(client_id, deque()).append(waiter)
+        queued_at = time.perf_counter()
+        self._dispatch()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release()  # slot was granted just as we were cancelled
+            else:
+                self._discard(client_id, waiter)
+            raise
+        self._observe_wait(time.perf_counter() - queued_at)
+
+    def _observe_wait(self, seconds: float) -> None:
+        self.recent_waits.append(seconds)
+        queue_wait.observe(seconds)
+
+    def _report(self) -> None:
+        queued_calls.set(self.queued)
+        active_calls.set(self.active)
+
+    def _discard(self, client_id: str, waiter: asyncio.Future) -> None:
+        queue = self._queues.get(client_id)
+        if queue and waiter in queue:
+            queue.remove(waiter)
+            if not queue:
+                del self._queues[client_id]
+        self._report()
+
+    def _release(self) -> None:
+        self.active -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Hand free slots to queued callers, one client at a time"""
+        pause = self.paused_until - time.time()
+        if pause > 0:
+            if self._queues and self._wake_handle is None:
+                self._wake_handle = asyncio.get_running_loop().call_later(pause, self._wake)
+            self._report()
+            return
+
+        while self.active < self.max_concurrency and self._queues:
+            client_id, queue = next(iter(self._queues.items()))
+            waiter = queue.popleft()
+            if queue:
+                self._queues.move_to_end(client_id)
+            else:
+                del self._queues[client_id]
+            if waiter.cancelled():
+                continue
+            self.active += 1
+            waiter.set_result(None)
+        self._report()
+
+    def _wake(self) -> None:
+        self._wake_handle = None
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, client_id: str) -> AsyncIterator[None]:
+        """Hold one upstream slot for the duration of the block (no retries)"""
+        # the shared per-minute budget is taken first, so nobody holds a slot while waiting for it,
+        # and the time spent waiting counts against max_queue_wait
+        throttled = 0.0
+        if self.shared:
+            try:
+                throttled = await self.shared.take(self.max_queue_wait)
+            except SchedulerOverloaded:
+                self.shed += 1
+                shed_calls.inc()
+                raise
+        await self._acquire(client_id, self.max_queue_wait - throttled)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record(time.perf_counter() - started)
+            self._release()
+
+    async def run(self, client_id: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run one upstream call through the queue, retrying transient failures"""
+        attempt = 0
+        while True:
+            async with self.slot(client_id):
+                try:
+                    return await fn()
+                except Exception as e:
+                    retryable = is_sdk_error(e, *RETRYABLE_ERRORS) and not is_sdk_error(e, "APITimeoutError")
+                    if not retryable or attempt >= self.max_retries:
+                        raise
+                    delay = self._backoff(attempt, e)
+                    reason = type(e).__name__
+            attempt += 1
+            self.retries += 1
+            logger.info(f"Retrying upstream call in {delay:.2f}s after {reason} (attempt {attempt})")
+            await asyncio.sleep(delay)
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            if is_sdk_error(error, "RateLimitError"):
+                # everyone else should hold off too
+                self._pause_until(time.time() + retry_after)
+            return retry_after
+        # full jitter
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _record(self, duration: float) -> None:
+        self.completed += 1
+        if self.service_time is None:
+            self.service_time = duration
+        else:
+            self.service_time = 0.8 * self.service_time + 0.2 * duration
+
+    def stats(self) -> Dict[str, Any]:
+        waits = sorted(self.recent_waits)
+        return {
+            "active": self.active,
+            "queued": self.queued,
+            "queued_by_client": {client: len(q) for client, q in self._queues.items()},
+            "estimated_wait_s": round(self.estimated_wait(), 3),
+            "wait_p50_ms": round(waits[len(waits) // 2] * 1000, 1) if waits else 0.0,
+            "wait_p95_ms": round(waits[int(len(waits) * 0.95)] * 1000, 1) if waits else 0.0,
+            "completed": self.completed,
+            "retries": self.retries,
+            "shed": self.shed,
+            "paused_for_s": round(max(0.0, self.paused_until - time.time()), 3),
+            "throttled": self.shared.throttled if self.shared else 0,
+            "rate_limits": self.limits.snapshot(),
+        }
+
+
+class ScheduledLLM:
+    """Routes every upstream call of a CopywritingLLM through the scheduler for one client"""
+    def __init__(self, llm, scheduler: UpstreamScheduler, client_id: str):
+        self.llm = llm
+        self.scheduler = scheduler
+        self.client_id = client_id
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.llm, name)
+
+    async def generate_keywords(self, audience: str, product_info: str) -> List[str]:
+        return await self.scheduler.run(self.client_id, lambda: self.llm.generate_keywords(audience, product_info))
+
+    async def generate_copy(self, request, keywords: List[str]) -> str:
+        return await self.scheduler.run(self.client_id, lambda: self.llm.generate_copy(request, keywords))
+
+    async def generate_variant(self, request, keywords: List[str], index: int, total: int) -> str:
+        return await self.scheduler.run(
+            self.client_id, lambda: self.llm.generate_variant(request, keywords, index, total)
+        )
+
+    async def generate_keywords_and_copy(self, request):
+        return await self.scheduler.run(self.client_id, lambda: self.llm.generate_keywords_and_copy(request))
+
+    async def repair_copy(self, request, keywords: List[str], draft: str, instruction: str) -> str:
+        return await self.scheduler.run(
+            self.client_id, lambda: self.llm.repair_copy(request, keywords, draft, instruction)
+        )
+
+    async def stream_copy(self, request, keywords: List[str]) -> AsyncIterator[str]:
+        # a partially streamed reply cannot be retried, so only queueing applies
+        async with self.scheduler.slot(self.client_id):
+            async for chunk in self.llm.stream_copy(request, keywords):
+                yield chunk
+
+
+def build_scheduler(settings: Settings, shared=None) -> Optional[UpstreamScheduler]:
+    if not settings.SCHEDULER_ENABLED:
+        return None
+    return UpstreamScheduler(
+        max_concurrency=settings.SCHEDULER_MAX_CONCURRENCY,
+        max_retries=settings.SCHEDULER_MAX_RETRIES,
+        backoff_base=settings.SCHEDULER_BACKOFF_BASE,
+        backoff_max=settings.SCHEDULER_BACKOFF_MAX,
+        max_queue_wait=settings.SCHEDULER_MAX_QUEUE_WAIT,
+        min_tokens_remaining=settings.SCHEDULER_MIN_TOKENS_REMAINING,
+        shared=shared,
+    )
@@ -1,4 +1,4 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Literal
 from pydantic import BaseModel, Field, field_validator
 
 class CopyRequest(BaseModel):
@@ -12,6 +12,21 @@ class CopyRequest(BaseModel):
     brand_sample: Optional[str] = Field(default=None, max_length=3000)
     keywords: Optional[List[str]] = None
     
+    # "standard": keywords call, then copy call
+    # "single_shot": keywords and copy from one structured call
+    # "speculative": copy starts immediately, keywords fetched in parallel for metadata only
+    generation_mode: Literal["standard", "single_shot", "speculative"] = "standard"
+    
+    # where generated keywords come from; None uses settings.KEYWORD_SOURCE
+    keyword_source: Optional[Literal["llm", "local"]] = None
+    
+    # bypass the response cache and store a fresh result
+    force_refresh: bool = False
+    
+    # alternative versions to generate and rank; above 1, keywords are always
+    # resolved first and shared, whatever the generation_mode
+    variants: int = Field(default=1, ge=1, le=5)
+    
     @field_validator("content_type", "audience", "product_info")
     @classmethod
     def required_non_empty(cls, v: str) -> str:
@@ -28,6 +43,10 @@ class CopyRequest(BaseModel):
         v = v.strip()
         return v or None
 
+class BatchRequest(BaseModel):
+    items: List[CopyRequest] = Field(min_length=1, max_length=500)
+    concurrency: Optional[int] = Field(default=None, ge=1, le=32)
+
 class CopyResponse(BaseModel):
     generated_copy: str
     keywords: List[str]
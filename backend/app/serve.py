@@ -0,0 +1,35 @@
+"""Run the API with one or more worker processes.
+
+    python -m app.serve
+
+Workers, host and port come from Settings (WEB_CONCURRENCY, HOST, PORT).
+With more than one worker, set SHARED_STATE_BACKEND so caches, coalescing
+and upstream rate limits are shared rather than kept per process. For
+gunicorn, use gunicorn.conf.py instead.
+
+Metrics and /stats are per worker: a scrape or /stats call sees only the
+worker that answered it. With more than one worker every series carries a
+worker="<pid>" label, so scrape each worker (or aggregate by that label).
+"""
+from typing import Any, Dict
+from .config import Settings, get_settings
+
+
+def uvicorn_options(settings: Settings) -> Dict[str, Any]:
+    return {
+        "host": settings.HOST,
+        "port": settings.PORT,
+        "workers": max(1, settings.WEB_CONCURRENCY),
+        "timeout_keep_alive": 5,
+        "proxy_headers": True,
+    }
+
+
+def main() -> None:
+    import uvicorn
+    # a factory import string, so each worker process builds its own app and lifespan
+    uvicorn.run("app.main:create_app", factory=True, **uvicorn_options(get_settings()))
+
+
+if __name__ == "__main__":
+    main()
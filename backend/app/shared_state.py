@@ -0,0 +1,305 @@
+import asyncio
+import inspect
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, List, Optional, Tuple, Union
+from .config import Settings
+from .logger import logger
+from .scheduler import SchedulerOverloaded
+
+Value = Union[str, bytes, int, float]
+
+
+def _to_bytes(value: Value) -> bytes:
+    if isinstance(value, bytes):
+        return value
+    return str(value).encode("utf-8")
+
+
+async def maybe_await(value: Any) -> Any:
+    """MemoryBackend is synchronous; SQLiteBackend and SharedBackend return coroutines"""
+    return await value if inspect.isawaitable(value) else value
+
+
+class SQLiteStore:
+    """Local stand-in for Redis: the subset of redis.asyncio's client API the shared state needs.
+
+    Backed by one SQLite file in WAL mode, so every worker process on the
+    host sees the same keys. Values come back as bytes and keys expire like
+    Redis keys (px = milliseconds). Queries run in a worker thread, so a
+    write waiting on another process's lock never stalls the event loop. A
+    redis.asyncio.Redis client can be used in its place for multi-host
+    deployments.
+    """
+    def __init__(self, path: str, purge_every: int = 1000):
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5.0)
+        self._lock = threading.Lock()  # one connection, used from to_thread workers one at a time
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")  # shared state is rebuildable, durability is not needed
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL)"
+        )
+        self.purge_every = purge_every
+        self._writes = 0
+
+    @staticmethod
+    def _expires_at(px: Optional[int]) -> Optional[float]:
+        return time.time() + px / 1000 if px is not None else None
+
+    def _wrote(self) -> None:
+        self._writes += 1
+        if self._writes % self.purge_every == 0:
+            self.conn.execute("DELETE FROM kv WHERE expires_at <= ?", (time.time(),))
+
+    def _get(self, key: str) -> Optional[bytes]:
+        row = self.conn.execute(
+            "SELECT value FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)", (key, time.time())
+        ).fetchone()
+        return bytes(row[0]) if row else None
+
+    def _set(self, key: str, value: Value, px: Optional[int] = None, nx: bool = False) -> bool:
+        """SET key value [PX ms] [NX]; with nx, only when the key is missing or expired"""
+        now = time.time()
+        if nx:
+            cursor = self.conn.execute(
+                "INSERT INTO kv (key, value, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at "
+                "WHERE kv.expires_at IS NOT NULL AND kv.expires_at <= ?",
+                (key, _to_bytes(value), self._expires_at(px), now)
+            )
+            self._wrote()
+            return cursor.rowcount > 0
+        self.conn.execute(
+            "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, _to_bytes(value), self._expires_at(px))
+        )
+        self._wrote()
+        return True
+
+    def _delete(self, *keys: str) -> int:
+        cursor = self.conn.execute(f"DELETE FROM kv WHERE key IN ({','.join('?' * len(keys))})", keys)
+        return cursor.rowcount
+
+    def _incrby(self, key: str, amount: int = 1) -> int:
+        """INCRBY; an expired counter starts again from zero"""
+        # counters are stored as text blobs like any other value, as Redis does
+        row = self.conn.execute(
+            "INSERT INTO kv (key, value, expires_at) VALUES (?1, CAST(CAST(?3 AS TEXT) AS BLOB), NULL) "
+            "ON CONFLICT(key) DO UPDATE SET "
+            "value = CAST(CAST(CASE WHEN kv.expires_at <= ?2 THEN ?3 "
+            "ELSE CAST(CAST(kv.value AS TEXT) AS INTEGER) + ?3 END AS TEXT) AS BLOB), "
+            "expires_at = CASE WHEN kv.expires_at <= ?2 THEN NULL ELSE kv.expires_at END "
+            "RETURNING CAST(value AS TEXT)",
+            (key, time.time(), amount)
+        ).fetchone()
+        self._wrote()
+        return int(row[0])
+
+    def _pexpire(self, key: str, px: int) -> bool:
+        cursor = self.conn.execute(
+            "UPDATE kv SET expires_at = ? WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (self._expires_at(px), key, time.time())
+        )
+        return cursor.rowcount > 0
+
+    def _delete_if_equal(self, key: str, value: Value) -> bool:
+        cursor = self.conn.execute(
+            "DELETE FROM kv WHERE key = ? AND value = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, _to_bytes(value), time.time())
+        )
+        return cursor.rowcount > 0
+
+    def _keys(self, pattern: str = "*") -> List[bytes]:
+        """KEYS pattern (glob); for stats only, it scans the table"""
+        rows = self.conn.execute(
+            "SELECT key FROM kv WHERE key GLOB ? AND (expires_at IS NULL OR expires_at > ?)", (pattern, time.time())
+        ).fetchall()
+        return [row[0].encode("utf-8") for row in rows]
+
+    async def _run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        def locked() -> Any:
+            with self._lock:
+                return fn(*args, **kwargs)
+        return await asyncio.to_thread(locked)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._run(self._get, key)
+
+    async def set(self, key: str, value: Value, px: Optional[int] = None, nx: bool = False) -> bool:
+        return await self._run(self._set, key, value, px=px, nx=nx)
+
+    async def delete(self, *keys: str) -> int:
+        return await self._run(self._delete, *keys)
+
+    async def incrby(self, key: str, amount: int = 1) -> int:
+        return await self._run(self._incrby, key, amount)
+
+    async def pexpire(self, key: str, px: int) -> bool:
+        return await self._run(self._pexpire, key, px)
+
+    async def delete_if_equal(self, key: str, value: Value) -> bool:
+        """Delete key only while it holds value; stands in for the Lua compare-and-delete run on Redis"""
+        return await self._run(self._delete_if_equal, key, value)
+
+    async def keys(self, pattern: str = "*") -> List[bytes]:
+        return await self._run(self._keys, pattern)
+
+    async def aclose(self) -> None:
+        await self._run(self.conn.close)
+
+
+class SharedBackend:
+    """Cache backend (as used by KeywordCache and ResponseCache) over a shared store.
+
+    Entries expire through the store's TTLs rather than an LRU bound; on Redis,
+    size is bounded by its maxmemory policy. Its methods are coroutines, and
+    it has no cheap size, so it has no len().
+    """
+    def __init__(self, store, prefix: str):
+        self.store = store
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        raw = await self.store.get(self.prefix + key)
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        return entry["value"], entry["expires_at"]
+
+    async def set(self, key: str, value: Any, expires_at: float) -> None:
+        px = int((expires_at - time.time()) * 1000)
+        if px > 0:
+            await self.store.set(self.prefix + key, json.dumps({"value": value, "expires_at": expires_at}), px=px)
+
+    async def delete(self, key: str) -> None:
+        await self.store.delete(self.prefix + key)
+
+    def close(self) -> None:
+        pass  # the store belongs to the app
+
+
+class SharedFlight:
+    """Single-flight across worker processes.
+
+    The first process to take the lock runs the call and publishes its
+    JSON-serialisable result under a key derived from the call's key; the
+    others poll for it. The lock is a lease kept alive while the call runs,
+    so a crashed worker only delays its followers by one lease. A call that
+    fails or is cancelled publishes nothing, and a waiting process then
+    makes its own attempt. A process that found the lock taken accepts a
+    result published up to `result_ttl` ago.
+    """
+    # compare-and-delete, so a leader whose lease lapsed never releases its successor's lock
+    RELEASE_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+    def __init__(self, store, lease: float = 10.0, poll_interval: float = 0.05, result_ttl: float = 30.0):
+        self.store = store
+        self.lease_ms = int(lease * 1000)
+        self.poll_interval = poll_interval
+        self.result_ttl_ms = int(result_ttl * 1000)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Returns (result, whether another process produced it)"""
+        lock, result_key = f"flight:{key}", f"flight:result:{key}"
+        token = uuid.uuid4().hex
+        contended = False
+        while True:
+            if contended:
+                # checked before retrying the lock, so a leader that finished in between is not repeated
+                raw = await self.store.get(result_key)
+                if raw is not None:
+                    return json.loads(raw), True
+            if await self.store.set(lock, token, px=self.lease_ms, nx=True):
+                break
+            contended = True
+            await asyncio.sleep(self.poll_interval)
+
+        heartbeat = asyncio.ensure_future(self._keep_lease(lock))
+        try:
+            result = await fn()
+            await self.store.set(result_key, json.dumps(result), px=self.result_ttl_ms)
+            return result, False
+        finally:
+            heartbeat.cancel()
+            await self._release(lock, token)
+
+    async def _release(self, lock: str, token: str) -> None:
+        if isinstance(self.store, SQLiteStore):
+            await self.store.delete_if_equal(lock, token)
+        else:
+            await self.store.eval(self.RELEASE_SCRIPT, 1, lock, token)
+
+    async def _keep_lease(self, lock: str) -> None:
+        while True:
+            await asyncio.sleep(self.lease_ms / 3000)
+            await self.store.pexpire(lock, self.lease_ms)
+
+
+class SharedRateLimits:
+    """Upstream rate-limit state every worker agrees on.
+
+    A pause (from ratelimit headers or a 429's retry-after) seen by one
+    worker holds off all of them. With `requests_per_minute`, upstream calls
+    also draw from a shared token bucket refilled at the start of each
+    minute (a fixed window, which needs nothing beyond INCRBY and PEXPIRE).
+    """
+    PAUSE_KEY = "ratelimit:paused_until"
+
+    def __init__(self, store, requests_per_minute: int = 0):
+        self.store = store
+        self.requests_per_minute = requests_per_minute
+        self.throttled = 0
+
+    async def paused_until(self) -> float:
+        raw = await self.store.get(self.PAUSE_KEY)
+        return float(raw) if raw is not None else 0.0
+
+    async def publish_pause(self, until: float) -> None:
+        remaining = until - time.time()
+        if remaining > 0 and until > await self.paused_until():
+            await self.store.set(self.PAUSE_KEY, repr(until), px=int(remaining * 1000) + 1)
+
+    async def take(self, max_wait: Optional[float] = None) -> float:
+        """Wait for a token from this minute's bucket; returns the seconds waited.
+
+        Raises SchedulerOverloaded instead when the bucket is empty and the
+        next window starts more than `max_wait` seconds from now.
+        """
+        if not self.requests_per_minute:
+            return 0.0
+        waited = 0.0
+        while True:
+            window = int(time.time() // 60)
+            key = f"ratelimit:bucket:{window}"
+            used = await self.store.incrby(key, 1)
+            if used == 1:
+                await self.store.pexpire(key, 120_000)
+            if used <= self.requests_per_minute:
+                return waited
+            self.throttled += 1
+            delay = max(0.0, (window + 1) * 60 - time.time())
+            if max_wait is not None and waited + delay > max_wait:
+                raise SchedulerOverloaded(waited + delay)
+            await asyncio.sleep(delay)
+            waited += delay
+
+
+def build_shared_store(settings: Settings):
+    """The store shared by all workers, or None to keep state per process"""
+    backend = settings.SHARED_STATE_BACKEND.lower()
+    if backend == "none":
+        if settings.WEB_CONCURRENCY > 1:
+            logger.warning("Running several workers without shared state: caches and rate limits are per worker")
+        return None
+    if backend == "sqlite":
+        return SQLiteStore(settings.SHARED_STATE_PATH)
+    if backend == "redis":
+        try:
+            import redis.asyncio
+        except ImportError as e:
+            raise ImportError("SHARED_STATE_BACKEND=redis needs the redis package (pip install redis)") from e
+        return redis.asyncio.Redis.from_url(settings.SHARED_STATE_URL)
+    raise ValueError(f"Unknown SHARED_STATE_BACKEND: {settings.SHARED_STATE_BACKEND}")
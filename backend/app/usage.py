@@ -0,0 +1,111 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, Iterator, List, Optional
+from .utils import calculate_cost, model_pricing
+
+
+@dataclass
+class UsageRecord:
+    """Token usage reported by one upstream call"""
+    call: str  # "keywords", "copy", ...
+    model: str
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_creation_input_tokens: int = 0
+    cache_read_input_tokens: int = 0
+    shared: bool = False  # answered by a call another request made and paid for; always zero tokens
+    batch: bool = False  # made through the message-batch API, at the batch discount
+
+    @property
+    def cost(self) -> float:
+        return calculate_cost(
+            self.input_tokens,
+            self.output_tokens,
+            self.model,
+            self.cache_creation_input_tokens,
+            self.cache_read_input_tokens,
+            self.batch
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**asdict(self), "cost": self.cost}
+
+
+# collects usage for the generation running in the current task; tasks spawned
+# from it (e.g. the speculative keyword call) share the same list
+_current_usage: ContextVar[Optional[List[UsageRecord]]] = ContextVar("current_usage", default=None)
+
+
+@contextmanager
+def collect_usage() -> Iterator[List[UsageRecord]]:
+    records: List[UsageRecord] = []
+    token = _current_usage.set(records)
+    try:
+        yield records
+    finally:
+        _current_usage.reset(token)
+
+
+def record_usage(call: str, model: str, usage: Any, batch: bool = False) -> Optional[UsageRecord]:
+    """Record an Anthropic `usage` object against the current generation, if one is collecting.
+
+    Returns the record either way, or None when the provider reported no usage.
+    """
+    if usage is None:
+        return None
+    record = UsageRecord(
+        call=call,
+        model=model,
+        input_tokens=getattr(usage, "input_tokens", 0) or 0,
+        output_tokens=getattr(usage, "output_tokens", 0) or 0,
+        # only present once prompt caching is in use
+        cache_creation_input_tokens=getattr(usage, "cache_creation_input_tokens", 0) or 0,
+        cache_read_input_tokens=getattr(usage, "cache_read_input_tokens", 0) or 0,
+        batch=batch,
+    )
+    records = _current_usage.get()
+    if records is not None:
+        records.append(record)
+    return record
+
+
+def add_usage(records: List[UsageRecord]) -> None:
+    """Attribute records collected elsewhere (e.g. by a shared call) to the current generation"""
+    current = _current_usage.get()
+    if current is not None:
+        current.extend(records)
+
+
+def summarize_usage(records: List[UsageRecord]) -> Dict[str, Any]:
+    return {
+        "calls": sum(not r.shared for r in records),
+        "shared_calls": sum(r.shared for r in records),
+        "input_tokens": sum(r.input_tokens for r in records),
+        "output_tokens": sum(r.output_tokens for r in records),
+        "cache_creation_input_tokens": sum(r.cache_creation_input_tokens for r in records),
+        "cache_read_input_tokens": sum(r.cache_read_input_tokens for r in records),
+        "cost": round(sum(r.cost for r in records), 6),
+    }
+
+
+def prompt_cache_summary(records: List[UsageRecord]) -> Dict[str, Any]:
+    """How much of the input was served from the provider's prompt cache, and what that saved.
+
+    cost_saved compares against sending every input token uncached; it is
+    negative on the request that first writes a prefix to the cache.
+    """
+    read = sum(r.cache_read_input_tokens for r in records)
+    written = sum(r.cache_creation_input_tokens for r in records)
+    total_input = read + written + sum(r.input_tokens for r in records)
+    saved = 0.0
+    for r in records:
+        pricing = model_pricing(r.model)
+        saved += r.cache_read_input_tokens * (pricing["input"] - pricing["cache_read"])
+        saved -= r.cache_creation_input_tokens * (pricing["cache_write"] - pricing["input"])
+    return {
+        "cache_read_input_tokens": read,
+        "cache_creation_input_tokens": written,
+        "hit_rate": round(read / total_input, 3) if total_input else 0.0,
+        "cost_saved": round(saved / 1_000_000, 6),
+    }
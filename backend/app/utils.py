@@ -1,13 +1,54 @@
+from typing import Dict, Optional
+
+# USD per million tokens: input, output, cache write (5 minute), cache read
+MODEL_PRICING: Dict[str, Dict[str, float]] = {
+    "claude-opus-4-5": {"input": 5.0, "output": 25.0, "cache_write": 6.25, "cache_read": 0.5},
+    "claude-opus-4": {"input": 15.0, "output": 75.0, "cache_write": 18.75, "cache_read": 1.5},
+    "claude-sonnet-4": {"input": 3.0, "output": 15.0, "cache_write": 3.75, "cache_read": 0.3},
+    "claude-3-7-sonnet": {"input": 3.0, "output": 15.0, "cache_write": 3.75, "cache_read": 0.3},
+    "claude-3-5-sonnet": {"input": 3.0, "output": 15.0, "cache_write": 3.75, "cache_read": 0.3},
+    "claude-haiku-4": {"input": 1.0, "output": 5.0, "cache_write": 1.25, "cache_read": 0.1},
+    "claude-3-5-haiku": {"input": 0.8, "output": 4.0, "cache_write": 1.0, "cache_read": 0.08},
+    "claude-3-haiku": {"input": 0.25, "output": 1.25, "cache_write": 0.3, "cache_read": 0.03},
+}
+DEFAULT_PRICING = MODEL_PRICING["claude-sonnet-4"]
+# message-batch requests are billed at half the standard price
+BATCH_DISCOUNT = 0.5
+
 def estimate_tokens(text: str) -> int:
     """Rough token estimation (Claude uses ~4 chars per token)"""
     return len(text) // 4
 
-def calculate_cost(input_tokens: int, output_tokens: int) -> float:
+def model_pricing(model: Optional[str]) -> Dict[str, float]:
+    """Pricing for a model id such as claude-sonnet-4-5-20250929 (longest matching prefix wins)"""
+    if model:
+        matches = [prefix for prefix in MODEL_PRICING if model.startswith(prefix)]
+        if matches:
+            return MODEL_PRICING[max(matches, key=len)]
+    return DEFAULT_PRICING
+
+def calculate_cost(
+    input_tokens: int,
+    output_tokens: int,
+    model: Optional[str] = None,
+    cache_creation_tokens: int = 0,
+    cache_read_tokens: int = 0,
+    batch: bool = False
+) -> float:
     """
-    Calculate cost for Claude Sonnet 4.5:
+    Calculate cost in USD from token counts. Without a model this uses
+    Claude Sonnet 4.5 pricing:
     - Input: $3 per million tokens
     - Output: $15 per million tokens
+    Batch requests get BATCH_DISCOUNT off every rate.
     """
-    input_cost = (input_tokens / 1_000_000) * 3.0
-    output_cost = (output_tokens / 1_000_000) * 15.0
-    return round(input_cost + output_cost, 6)
\ No newline at end of file
+    pricing = model_pricing(model)
+    cost = (
+        input_tokens * pricing["input"]
+        + output_tokens * pricing["output"]
+        + cache_creation_tokens * pricing["cache_write"]
+        + cache_read_tokens * pricing["cache_read"]
+    ) / 1_000_000
+    if batch:
+        cost *= BATCH_DISCOUNT
+    return round(cost, 6)
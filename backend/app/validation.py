@@ -1,41 +1,404 @@
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+from .config import get_settings
+from .content_types import ContentTypeRule, classify_content_type
+
 MAX_COPY_LENGTH = 4000
 
-def validate_copy_output(text: str, require_cta: bool, content_type: str = "") -> None:
-    """Validate generated copy meets requirements"""
-    if len(text) > MAX_COPY_LENGTH:
-        raise ValueError(f"Generated copy too long ({len(text)} chars, max {MAX_COPY_LENGTH})")
-    
-    # Skip CTA check for content types that typically don't need CTAs
-    content_lower = content_type.lower()
-    skip_cta_types = [
-        "subject line",
-        "headline", 
-        "tweet"
-    ]
-    
-    if any(skip_type in content_lower for skip_type in skip_cta_types):
-        return  # Skip CTA validation for these types
-    
-    if require_cta:
-        # Check for common CTA patterns - be more lenient
-        text_lower = text.lower()
-        cta_indicators = [
-            "click", "sign up", "try", "get started", "buy now", "learn more", 
-            "contact us", "shop now", "order now", "download", "subscribe",
-            "join", "register", "book", "schedule", "visit", "discover",
-            "explore", "start", "begin", "claim", "grab", "unlock", "see",
-            "find out", "check out", "apply", "reserve", "call now", "today"
+CTA_INDICATORS = [
+    "click", "sign up", "try", "get started", "buy now", "learn more",
+    "contact us", "shop now", "order now", "download", "subscribe",
+    "join", "register", "book", "schedule", "visit", "discover",
+    "explore", "start", "begin", "claim", "grab", "unlock", "see",
+    "find out", "check out", "apply", "reserve", "call now", "today"
+]
+
+# US spellings flagged by the UK English rule, with their UK form
+US_TO_UK_SPELLINGS = {
+    "color": "colour", "colors": "colours", "colorful": "colourful",
+    "favorite": "favourite", "favorites": "favourites",
+    "behavior": "behaviour", "behaviors": "behaviours",
+    "flavor": "flavour", "flavors": "flavours",
+    "honor": "honour", "labor": "labour", "humor": "humour",
+    "neighbor": "neighbour", "neighborhood": "neighbourhood",
+    "center": "centre", "centers": "centres", "centered": "centred",
+    "catalog": "catalogue", "catalogs": "catalogues",
+    "analyze": "analyse", "analyzes": "analyses", "analyzed": "analysed", "analyzing": "analysing",
+    "defense": "defence", "gray": "grey", "jewelry": "jewellery",
+    "fulfill": "fulfil", "fulfillment": "fulfilment", "enrollment": "enrolment",
+    "canceled": "cancelled", "canceling": "cancelling",
+    "traveled": "travelled", "traveling": "travelling", "traveler": "traveller",
+    "modeling": "modelling", "labeled": "labelled", "labeling": "labelling",
+}
+
+# -ize stems whose UK form is -ise; listed explicitly so "size" or "prize" are never flagged
+_IZE_STEMS = [
+    "optim", "organ", "real", "custom", "maxim", "minim", "priorit", "personal",
+    "recogn", "util", "central", "standard", "special", "visual", "monet",
+    "synchron", "summar", "categor", "emphas", "apolog", "author", "character",
+    "final", "modern", "normal", "revolution", "digit", "energ",
+]
+for _stem in _IZE_STEMS:
+    for _us, _uk in (("ize", "ise"), ("izes", "ises"), ("ized", "ised"), ("izing", "ising"), ("ization", "isation")):
+        US_TO_UK_SPELLINGS[_stem + _us] = _stem + _uk
+
+
+def max_copy_length(content_type: str = "") -> int:
+    """Per-type character limit from the content-type table; MAX_COPY_LENGTH for types without one"""
+    return classify_content_type(content_type).max_chars or MAX_COPY_LENGTH
+
+
+_WORD = re.compile(r"\w+(?:['’]\w+)*")
+_JOINER = re.compile(r"[\s\-]+")  # what may separate the words of a phrase ("sign up", "sign-up")
+
+
+class Hit(NamedTuple):
+    owner: int  # index of the rule (or keyword) that listed the phrase
+    phrase: str  # the phrase as listed, lowercased
+    start: int
+    end: int
+
+
+class Tokens(NamedTuple):
+    """Words of a text, found once and shared by every matcher that runs over it"""
+    source: str  # the lowercased text, or the original when lowercasing would shift offsets
+    matches: List["re.Match"]
+    words: List[str]  # lowercased
+
+    @classmethod
+    def of(cls, text: str) -> "Tokens":
+        lowered = text.lower()
+        if len(lowered) != len(text):
+            # rare case mappings change length and would shift offsets; lower per word instead
+            matches = list(_WORD.finditer(text))
+            return cls(text, matches, [m.group().lower() for m in matches])
+        matches = list(_WORD.finditer(lowered))
+        return cls(lowered, matches, [m.group() for m in matches])
+
+
+class PhraseMatcher:
+    """Whole-word, case-insensitive matching of many phrases in one pass.
+
+    A word-level automaton: phrases are indexed by their first word, the text
+    is tokenized once and each word costs one dict lookup, so "see" never
+    matches "seems" and the cost does not grow with the number of phrases.
+    Matches do not overlap; at each position the longest phrase wins and an
+    identical phrase belongs to whichever owner listed it first.
+    """
+    def __init__(self, phrases: Iterable[Tuple[str, int]]):
+        self._index: Dict[str, List[Tuple[Tuple[str, ...], str, int]]] = {}
+        seen = set()
+        for phrase, owner in phrases:
+            words = tuple(w.lower() for w in _WORD.findall(phrase))
+            if not words or words in seen:
+                continue
+            seen.add(words)
+            self._index.setdefault(words[0], []).append((words[1:], phrase.lower(), owner))
+        for candidates in self._index.values():
+            candidates.sort(key=lambda c: len(c[0]), reverse=True)
+
+    def scan(self, tokens: Tokens) -> List[Hit]:
+        index = self._index
+        words, matches = tokens.words, tokens.matches
+        hits = []
+        i, count = 0, len(words)
+        while i < count:
+            candidates = index.get(words[i])
+            i += 1
+            if candidates:
+                for rest, phrase, owner in candidates:
+                    if rest and not self._follows(tokens, i, rest):
+                        continue
+                    hits.append(Hit(owner, phrase, matches[i - 1].start(), matches[i - 1 + len(rest)].end()))
+                    i += len(rest)
+                    break
+        return hits
+
+    @staticmethod
+    def _follows(tokens: Tokens, i: int, rest: Tuple[str, ...]) -> bool:
+        """Whether the words from index i on continue the phrase, joined only by spaces or hyphens"""
+        if tokens.words[i:i + len(rest)] != list(rest):
+            return False
+        matches = tokens.matches
+        return all(
+            _JOINER.fullmatch(tokens.source, matches[j - 1].end(), matches[j].start())
+            for j in range(i, i + len(rest))
+        )
+
+
+@dataclass
+class Violation:
+    rule: str
+    message: str
+    severity: str = "error"  # "error" fails validation, "warning" is only reported
+    span: Optional[Tuple[int, int]] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"rule": self.rule, "message": self.message, "severity": self.severity, "span": self.span}
+
+
+@dataclass
+class CheckContext:
+    """Everything a rule may look at for one piece of copy"""
+    text: str
+    content_type: str
+    require_cta: bool
+    keywords: List[str]
+    type_rule: ContentTypeRule
+    tokens: Tokens
+
+    @property
+    def word_count(self) -> int:
+        return len(self.tokens.words)
+
+
+@dataclass
+class ValidationReport:
+    violations: List[Violation] = field(default_factory=list)
+
+    @property
+    def errors(self) -> List[Violation]:
+        return [v for v in self.violations if v.severity == "error"]
+
+    @property
+    def warnings(self) -> List[Violation]:
+        return [v for v in self.violations if v.severity != "error"]
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def summary(self) -> Dict[str, Any]:
+        """Non-fatal findings, as reported in response metadata"""
+        return {"warnings": [v.to_dict() for v in self.warnings]}
+
+    def raise_for_errors(self) -> None:
+        """Raise ValueError with the first error, for callers that treat any error as fatal"""
+        errors = self.errors
+        if errors:
+            raise ValueError(errors[0].message)
+
+
+class Rule:
+    """One validation check.
+
+    Rules listing `phrases` get every whole-word match of those phrases from
+    the engine's shared scan, so adding a rule never adds another pass over
+    the text; rules without phrases receive an empty list.
+    """
+    name = "rule"
+    phrases: Sequence[str] = ()
+
+    def check(self, ctx: CheckContext, hits: List[Hit]) -> List[Violation]:
+        raise NotImplementedError
+
+
+class LengthRule(Rule):
+    """Hard per-type character limit, plus a warning when the word count is far outside the type's guidance"""
+    name = "length"
+
+    def __init__(self, word_tolerance: float = 0.5):
+        self.word_tolerance = word_tolerance
+
+    def check(self, ctx: CheckContext, hits: List[Hit]) -> List[Violation]:
+        length = len(ctx.text)
+        limit = max_copy_length(ctx.content_type)
+        if length > limit:
+            return [Violation(self.name, f"Generated copy too long ({length} chars, max {limit})")]
+
+        words = ctx.word_count
+        low, high = ctx.type_rule.min_words, ctx.type_rule.max_words
+        if low and words < low * (1 - self.word_tolerance):
+            return [Violation(self.name, f"Copy is {words} words, guidance is at least {low}", "warning")]
+        if high and words > high * (1 + self.word_tolerance):
+            return [Violation(self.name, f"Copy is {words} words, guidance is at most {high}", "warning")]
+        return []
+
+
+class CTARule(Rule):
+    """Requires a recognisable call-to-action when the request asks for one and the type does not skip it"""
+    name = "cta"
+
+    def __init__(self, indicators: Sequence[str] = CTA_INDICATORS):
+        self.phrases = list(indicators)
+
+    def check(self, ctx: CheckContext, hits: List[Hit]) -> List[Violation]:
+        if not ctx.require_cta or ctx.type_rule.skips_cta or hits:
+            return []
+        return [Violation(self.name, "CTA required but missing from generated copy")]
+
+
+class BannedPhraseRule(Rule):
+    name = "banned_phrase"
+
+    def __init__(self, phrases: Sequence[str], severity: str = "warning"):
+        self.phrases = list(phrases)
+        self.severity = severity
+
+    def check(self, ctx: CheckContext, hits: List[Hit]) -> List[Violation]:
+        return [
+            Violation(self.name, f"Banned phrase \"{ctx.text[h.start:h.end]}\"", self.severity, (h.start, h.end))
+            for h in hits
+        ]
+
+
+class UKSpellingRule(Rule):
+    """Flags US spellings, since the copy prompt asks for UK English"""
+    name = "uk_spelling"
+
+    def __init__(self, spellings: Dict[str, str] = US_TO_UK_SPELLINGS, severity: str = "warning"):
+        self.spellings = spellings
+        self.phrases = list(spellings)
+        self.severity = severity
+
+    def check(self, ctx: CheckContext, hits: List[Hit]) -> List[Violation]:
+        return [
+            Violation(self.name, f"US spelling \"{ctx.text[h.start:h.end]}\", use \"{self.spellings[h.phrase]}\"",
+                      self.severity, (h.start, h.end))
+            for h in hits
         ]
-        
-        # Also check for imperative verbs at the start of sentences (common in CTAs)
-        sentences = text.split('.')
-        for sentence in sentences[-3:]:  # Check last 3 sentences
-            sentence = sentence.strip().lower()
-            if sentence and any(sentence.startswith(word) for word in cta_indicators):
-                return  # Found a CTA
-        
-        # Check if any CTA indicator appears in the text
-        has_cta = any(indicator in text_lower for indicator in cta_indicators)
-        
-        if not has_cta:
-            raise ValueError("CTA required but missing from generated copy")
\ No newline at end of file
+
+
+@lru_cache(maxsize=256)
+def keyword_matcher(keywords: Tuple[str, ...]) -> PhraseMatcher:
+    return PhraseMatcher((k, i) for i, k in enumerate(keywords))
+
+
+class KeywordDensityRule(Rule):
+    """Warns when a keyword is stuffed: too many mentions, or too large a share of the words.
+
+    Keywords differ per request, so they get their own matcher (cached per
+    keyword set), run over the words the engine already tokenized.
+    """
+    name = "keyword_density"
+
+    def __init__(self, max_mentions: int = 2, max_density: float = 0.05, severity: str = "warning"):
+        self.max_mentions = max_mentions
+        self.max_density = max_density
+        self.severity = severity
+
+    def check(self, ctx: CheckContext, hits: List[Hit]) -> List[Violation]:
+        keywords = tuple(k for k in ctx.keywords if k.strip())
+        if not keywords:
+            return []
+        counts = [0] * len(keywords)
+        for hit in keyword_matcher(keywords).scan(ctx.tokens):
+            counts[hit.owner] += 1
+
+        words = max(1, ctx.word_count)
+        violations = []
+        for keyword, count in zip(keywords, counts):
+            density = count * len(keyword.split()) / words
+            if count > self.max_mentions or (count > 1 and density > self.max_density):
+                violations.append(Violation(
+                    self.name, f"Keyword \"{keyword}\" used {count} times ({density:.0%} of words)", self.severity
+                ))
+        return violations
+
+
+class ValidationEngine:
+    """Runs a set of rules over copy with one scan of the text.
+
+    The phrases of every rule share one PhraseMatcher; a single pass buckets
+    each whole-word match to the rule that listed it, then each rule judges
+    its own hits. Where rules list the same phrase, the earlier rule claims it.
+    """
+    def __init__(self, rules: List[Rule]):
+        self.rules = rules
+        self._matcher = PhraseMatcher((p, i) for i, rule in enumerate(rules) for p in rule.phrases)
+
+    def scan(self, tokens: Tokens) -> Dict[int, List[Hit]]:
+        hits: Dict[int, List[Hit]] = {}
+        for hit in self._matcher.scan(tokens):
+            hits.setdefault(hit.owner, []).append(hit)
+        return hits
+
+    def validate(
+        self,
+        text: str,
+        content_type: str = "",
+        require_cta: bool = False,
+        keywords: Optional[List[str]] = None
+    ) -> ValidationReport:
+        tokens = Tokens.of(text)
+        hits = self.scan(tokens)
+        ctx = CheckContext(
+            text, content_type, require_cta, list(keywords or []), classify_content_type(content_type), tokens
+        )
+        report = ValidationReport()
+        for i, rule in enumerate(self.rules):
+            report.violations.extend(rule.check(ctx, hits.get(i, [])))
+        return report
+
+
+def build_engine(
+    banned_phrases: Sequence[str] = (),
+    keyword_max_mentions: int = 2,
+    keyword_max_density: float = 0.05
+) -> ValidationEngine:
+    rules = [LengthRule(), CTARule(), UKSpellingRule(), KeywordDensityRule(keyword_max_mentions, keyword_max_density)]
+    if banned_phrases:
+        rules.append(BannedPhraseRule(banned_phrases))
+    return ValidationEngine(rules)
+
+
+@lru_cache(maxsize=1)
+def get_engine() -> ValidationEngine:
+    """The process-wide engine, configured from settings on first use"""
+    settings = get_settings()
+    return build_engine(settings.BANNED_PHRASES, settings.KEYWORD_MAX_MENTIONS, settings.KEYWORD_MAX_DENSITY)
+
+
+def check_length(length: int, content_type: str = "") -> None:
+    limit = max_copy_length(content_type)
+    if length > limit:
+        raise ValueError(f"Generated copy too long ({length} chars, max {limit})")
+
+
+def validate_copy_output(
+    text: str,
+    require_cta: bool,
+    content_type: str = "",
+    keywords: Optional[List[str]] = None
+) -> ValidationReport:
+    """Validate generated copy meets requirements.
+
+    Raises ValueError on the first error; warnings are returned in the report.
+    """
+    report = get_engine().validate(text, content_type, require_cta, keywords)
+    report.raise_for_errors()
+    return report
+
+
+class StreamingValidator:
+    """Incremental version of validate_copy_output for streamed copy.
+
+    feed() raises as soon as the running length passes the type's limit so the
+    caller can abort the upstream stream; finish() runs the full rule set once
+    the complete text is known.
+    """
+    def __init__(self, require_cta: bool, content_type: str = "", keywords: Optional[List[str]] = None):
+        self.require_cta = require_cta
+        self.content_type = content_type
+        self.keywords = keywords
+        self.chunks = []
+        self.length = 0
+        self.max_length = max_copy_length(content_type)
+        self.report: Optional[ValidationReport] = None
+
+    def feed(self, chunk: str) -> None:
+        self.length += len(chunk)
+        if self.length > self.max_length:
+            check_length(self.length, self.content_type)
+        self.chunks.append(chunk)
+
+    @property
+    def text(self) -> str:
+        return "".join(self.chunks)
+
+    def finish(self) -> str:
+        text = self.text
+        self.report = validate_copy_output(text, self.require_cta, self.content_type, self.keywords)
+        return text
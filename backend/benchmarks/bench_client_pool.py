@@ -0,0 +1,47 @@
+"""Per-request overhead of a fresh AsyncAnthropic per call vs the shared pooled client.
+
+Run from backend/:  python -m benchmarks.bench_client_pool [requests]
+"""
+import asyncio
+import statistics
+import sys
+import time
+from anthropic import AsyncAnthropic
+from app.clients import ClientRegistry
+from app.config import Settings
+from app.llm import CopywritingLLM
+from app.schemas import CopyRequest
+from .stub_anthropic import StubServer, create_stub_app
+
+REQUEST = CopyRequest(content_type="Ad", audience="busy freelancers", product_info="AI proposal tool", cta=True)
+
+
+async def _time_calls(make_llm, n: int) -> list:
+    timings = []
+    for _ in range(n):
+        start = time.perf_counter()
+        llm = make_llm()
+        await llm.generate_copy(REQUEST, ["proposals"])
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+async def run(n: int, base_url: str) -> None:
+    settings = Settings(ANTHROPIC_API_KEY="stub", ANTHROPIC_BASE_URL=base_url, ANTHROPIC_MAX_RETRIES=0)
+
+    # before: what get_llm() used to do on every request (the pools are never closed)
+    fresh = await _time_calls(lambda: CopywritingLLM(AsyncAnthropic(api_key="stub", base_url=base_url, max_retries=0)), n)
+
+    registry = ClientRegistry(settings)
+    pooled = await _time_calls(lambda: CopywritingLLM(registry.anthropic), n)
+    await registry.aclose()
+
+    for label, timings in (("fresh client per request", fresh), ("shared pooled client", pooled)):
+        print(f"{label:<26} mean {statistics.mean(timings):7.2f} ms   p50 {statistics.median(timings):7.2f} ms")
+    print(f"overhead saved per request: {statistics.mean(fresh) - statistics.mean(pooled):.2f} ms")
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    with StubServer(create_stub_app()) as stub:
+        asyncio.run(run(n, stub.base_url))
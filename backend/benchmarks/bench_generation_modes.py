@@ -0,0 +1,50 @@
+"""p50/p95 end-to-end latency of each generation mode using the fake LLM with injected delays.
+
+Run from backend/:  python -m benchmarks.bench_generation_modes [runs]
+"""
+import asyncio
+import logging
+import random
+import statistics
+import sys
+from app.llm import FakeCopywritingLLM
+from app.logger import logger
+from app.pipeline import run_generation
+from app.schemas import CopyRequest
+
+# rough shape of real upstream latency, in seconds
+KEYWORD_DELAY = (0.8, 1.6)
+COPY_DELAY = (2.0, 4.0)
+TIME_SCALE = 0.05  # shrink delays so the benchmark runs quickly
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def run(runs: int) -> None:
+    rng = random.Random(7)
+    print(f"{'mode':<12} {'p50 ms':>8} {'p95 ms':>8}")
+    for mode in ("standard", "single_shot", "speculative"):
+        totals = []
+        for _ in range(runs):
+            llm = FakeCopywritingLLM(
+                keyword_delay=rng.uniform(*KEYWORD_DELAY) * TIME_SCALE,
+                copy_delay=rng.uniform(*COPY_DELAY) * TIME_SCALE,
+            )
+            request = CopyRequest(
+                content_type="Landing page hero",
+                audience="busy freelancers",
+                product_info="An AI tool that drafts proposals",
+                cta=True,
+                generation_mode=mode,
+            )
+            result = await run_generation(request, llm)
+            totals.append(result["metadata"]["timings_ms"]["total"])
+        print(f"{mode:<12} {statistics.median(totals):8.1f} {percentile(totals, 95):8.1f}")
+
+
+if __name__ == "__main__":
+    logger.setLevel(logging.WARNING)  # per-request INFO lines would bury the table
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 50))
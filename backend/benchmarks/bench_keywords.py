@@ -0,0 +1,65 @@
+"""Latency and overlap of local keyword extraction against LLM keywords.
+
+The LLM side is the fake LLM with an injected keyword delay, replying with
+the keywords a model returned for each sample. Overlap is the share of
+those keywords that share a word with some local keyword.
+
+Run from backend/:  python -m benchmarks.bench_keywords [runs]
+"""
+import asyncio
+import statistics
+import sys
+import time
+from app.keywords import extract_keywords
+from app.llm import FakeCopywritingLLM
+
+KEYWORD_DELAY = 1.2 * 0.05  # typical keyword call, scaled like bench_generation_modes
+
+SAMPLES = [
+    ("busy freelancers", "An AI tool that drafts proposals",
+     ["ai proposal writer", "freelance proposals", "proposal automation", "freelancer tools", "time saving"]),
+    ("small business owners in the UK",
+     "Cloud accounting software that automates invoicing, expense tracking and VAT returns.",
+     ["cloud accounting", "invoicing software", "expense tracking", "vat returns", "small business accounting"]),
+    ("new parents", "Organic baby food subscription delivered weekly, with recipes by paediatric nutritionists",
+     ["organic baby food", "baby food subscription", "weekly delivery", "nutritionist recipes", "new parents"]),
+    ("developers", "Code editor with instant refactoring and built-in terminal",
+     ["code editor", "refactoring tool", "developer productivity", "built-in terminal", "ide"]),
+    ("marathon runners", "Lightweight carbon-plated running shoes for race day",
+     ["carbon plated shoes", "running shoes", "race day shoes", "marathon shoes", "lightweight trainers"]),
+]
+
+
+class RecordedKeywordsLLM(FakeCopywritingLLM):
+    """Fake that answers with the recorded model keywords for each sample"""
+    async def generate_keywords(self, audience: str, product_info: str):
+        await asyncio.sleep(self.keyword_delay)
+        return next(reference for a, p, reference in SAMPLES if (a, p) == (audience, product_info))
+
+
+def overlap(local, reference) -> float:
+    local_words = {w for k in local for w in k.split()}
+    return sum(any(w in local_words for w in k.split()) for k in reference) / len(reference)
+
+
+async def run(runs: int) -> None:
+    llm = RecordedKeywordsLLM(keyword_delay=KEYWORD_DELAY)
+    print(f"{'sample':<34} {'local us':>9} {'llm ms':>8} {'overlap':>8} {'conf':>5}")
+    for audience, product_info, reference in SAMPLES:
+        local_times = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            extraction = extract_keywords.__wrapped__(audience, product_info)  # bypass the memo
+            local_times.append((time.perf_counter() - started) * 1e6)
+
+        started = time.perf_counter()
+        await llm.generate_keywords(audience, product_info)
+        llm_ms = (time.perf_counter() - started) * 1000
+
+        label = product_info[:32]
+        print(f"{label:<34} {statistics.median(local_times):9.1f} {llm_ms:8.1f} "
+              f"{overlap(extraction.keywords, reference):8.0%} {extraction.confidence:5.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 200))
@@ -0,0 +1,74 @@
+"""Cost of the request instrumentation: request-ID middleware, HTTP metrics and stage spans.
+
+Times a no-op ASGI endpoint with and without RequestContextMiddleware,
+a bare span, and the /metrics render, then checks the per-request total
+(middleware plus the spans a /generate request records) against the budget.
+
+Run from backend/:  python -m benchmarks.bench_metrics [runs]
+"""
+import asyncio
+import sys
+import time
+from app.metrics import registry, span
+from app.middleware import RequestContextMiddleware
+
+BUDGET_US = 100  # instrumentation per request, kept well under 1% of even a cached response
+SPANS_PER_REQUEST = 6  # keywords, prompt, copy, validation, plus repair or variants
+
+SCOPE = {"type": "http", "method": "POST", "path": "/generate", "headers": [(b"content-type", b"application/json")]}
+
+
+async def endpoint(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def receive():
+    return {"type": "http.request"}
+
+
+async def send(message):
+    pass
+
+
+async def _time_us(call, runs: int) -> float:
+    await call()
+    started = time.perf_counter()
+    for _ in range(runs):
+        await call()
+    return (time.perf_counter() - started) / runs * 1e6
+
+
+async def run(runs: int) -> None:
+    middleware = RequestContextMiddleware(endpoint)
+
+    async def bare():
+        await endpoint(dict(SCOPE), receive, send)
+
+    async def wrapped():
+        await middleware(dict(SCOPE), receive, send)
+
+    async def one_span():
+        with span("bench", "Landing page"):
+            pass
+
+    bare_us = await _time_us(bare, runs)
+    wrapped_us = await _time_us(wrapped, runs)
+    span_us = await _time_us(one_span, runs)
+    per_request = wrapped_us - bare_us + SPANS_PER_REQUEST * span_us
+
+    started = time.perf_counter()
+    text = registry.render()
+    render_ms = (time.perf_counter() - started) * 1000
+
+    print(f"endpoint alone        {bare_us:8.2f} us")
+    print(f"with middleware       {wrapped_us:8.2f} us  (+{wrapped_us - bare_us:.2f})")
+    print(f"span                  {span_us:8.2f} us")
+    print(f"per request           {per_request:8.2f} us  (budget {BUDGET_US} us)")
+    print(f"/metrics render       {render_ms:8.2f} ms  ({len(text.splitlines())} lines)")
+    if per_request > BUDGET_US:
+        sys.exit("Instrumentation over budget")
+
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000))
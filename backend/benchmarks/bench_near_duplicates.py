@@ -0,0 +1,95 @@
+"""Lookup latency, memory and accuracy of the near-duplicate index.
+
+Fills an index with synthetic requests, then times lookups for reworded
+ones and measures the index's memory with tracemalloc. Accuracy is checked
+on hand-labelled pairs: rewordings should seed, other audiences or
+products should miss.
+
+Run from backend/:  python -m benchmarks.bench_near_duplicates [entries]
+"""
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from app.near_duplicates import NearDuplicateIndex
+
+AUDIENCES = [
+    "busy freelancers", "small business owners in the UK", "new parents", "software developers",
+    "marathon runners", "retired teachers", "remote workers", "first-time home buyers", "university students",
+]
+PRODUCTS = [
+    "An AI tool that drafts client proposals in minutes",
+    "Cloud accounting software that automates invoicing, expense tracking and VAT returns",
+    "Organic baby food subscription delivered weekly, with recipes by paediatric nutritionists",
+    "Code editor with instant refactoring and a built-in terminal",
+    "Lightweight carbon-plated running shoes for race day",
+    "Noise-cancelling headphones with 40-hour battery life",
+]
+# (stored audience, stored product, query audience, query product, should match)
+PAIRS = [
+    ("busy freelancers", PRODUCTS[0], "busy freelance workers", "AI tool that drafts client proposals in minutes", True),
+    ("small business owners in the UK", PRODUCTS[1], "UK small business owners",
+     "Cloud accounting software automating invoices, expense tracking and VAT returns", True),
+    ("software developers", PRODUCTS[3], "developers", "A code editor with instant refactoring and built-in terminal", False),
+    ("new parents", PRODUCTS[2], "marathon runners", PRODUCTS[2], False),
+    ("busy freelancers", PRODUCTS[0], "busy freelancers", PRODUCTS[5], False),
+    ("remote workers", PRODUCTS[5], "remote team workers", "Noise cancelling headphones with a 40 hour battery", True),
+]
+
+
+def synthetic(rng: random.Random, i: int):
+    return f"{rng.choice(AUDIENCES)} {i}", f"{rng.choice(PRODUCTS)} (edition {i})"
+
+
+def run(entries: int) -> None:
+    rng = random.Random(7)
+    requests = [synthetic(rng, i) for i in range(entries)]
+    index = NearDuplicateIndex(max_entries=entries, return_threshold=2.0)  # keywords only, like a seed-only deployment
+    started = time.perf_counter()
+    for audience, product in requests:
+        index.add(audience, product, "ctx", ["keyword one", "keyword two", "keyword three"])
+    fill_s = time.perf_counter() - started
+
+    # memory of a second copy, with signatures computed beforehand so tracing only sees the index
+    signatures = {text: index.hasher.signature(text) for request in requests for text in request}
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    traced = NearDuplicateIndex(max_entries=entries, return_threshold=2.0)
+    traced.hasher.signature = signatures.__getitem__
+    for audience, product in requests:
+        traced.add(audience, product, "ctx", ["keyword one", "keyword two", "keyword three"])
+    used = sum(s.size_diff for s in tracemalloc.take_snapshot().compare_to(before, "filename"))
+    tracemalloc.stop()
+    del traced, signatures
+
+    index.hasher.signature.cache_clear()  # lookups pay for their own signatures
+    times = []
+    for i in rng.sample(range(entries), min(entries, 1000)):
+        audience, product = synthetic(random.Random(i), i)
+        started = time.perf_counter()
+        index.lookup(audience.replace(" ", "  ") + "s", product.lower(), "ctx")
+        times.append((time.perf_counter() - started) * 1000)
+    times.sort()
+
+    print(f"entries               {entries:>10}")
+    print(f"fill                  {fill_s / entries * 1000:10.3f} ms per add")
+    print(f"memory                {used / 1024 / 1024:10.1f} MiB  ({used / entries / 1024:.1f} KiB per entry)")
+    print(f"lookup p50            {statistics.median(times):10.3f} ms")
+    print(f"lookup p95            {times[int(len(times) * 0.95)]:10.3f} ms")
+    print(f"stats                 {index.stats()}")
+
+    print()
+    correct = 0
+    for stored_audience, stored_product, audience, product, expected in PAIRS:
+        pair_index = NearDuplicateIndex()
+        pair_index.add(stored_audience, stored_product, "ctx", ["k"])
+        match = pair_index.lookup(audience, product, "ctx")
+        correct += (match is not None) == expected
+        score = f"{match.similarity:.2f}" if match else "  - "
+        print(f"{'match' if expected else 'miss ':5} {score}  {stored_audience!r} -> {audience!r}")
+    print(f"{correct}/{len(PAIRS)} pairs classified as labelled")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -0,0 +1,76 @@
+"""Per-text cost of the validation engine against repeated per-phrase scans.
+
+"legacy cta" is the substring scan the engine replaced: fast, but it counts
+"seems" and "country" as CTAs. "per-phrase all" checks the engine's full
+phrase set correctly (whole words) with one precompiled regex per phrase,
+which is what the rules would cost without a shared single pass.
+
+Run from backend/:  python -m benchmarks.bench_validation [iterations]
+"""
+import random
+import sys
+import re
+import time
+from app.validation import CTA_INDICATORS, US_TO_UK_SPELLINGS, CTARule, ValidationEngine, build_engine
+
+WORDS = (
+    "our platform helps busy teams ship faster with fewer meetings and clearer priorities "
+    "every country seems to have its own workflow so we adapt to yours without fuss"
+).split()
+
+
+def legacy_has_cta(text: str) -> bool:
+    """The substring scan the engine replaced, kept here as the baseline"""
+    text_lower = text.lower()
+    for sentence in text.split('.')[-3:]:
+        sentence = sentence.strip().lower()
+        if sentence and any(sentence.startswith(word) for word in CTA_INDICATORS):
+            return True
+    return any(indicator in text_lower for indicator in CTA_INDICATORS)
+
+
+def per_phrase_scanner(phrases):
+    patterns = [re.compile(r"\b" + r"[\s\-]+".join(map(re.escape, p.split())) + r"\b", re.IGNORECASE) for p in phrases]
+    return lambda text: [p.findall(text) for p in patterns]
+
+
+def sample(rng: random.Random, chars: int) -> str:
+    words = []
+    while sum(len(w) + 1 for w in words) < chars:
+        words.append(rng.choice(WORDS))
+        if rng.random() < 0.08:
+            words[-1] += "."
+    return " ".join(words)[:chars]
+
+
+def timed(fn, texts, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for text in texts:
+            fn(text)
+    return (time.perf_counter() - started) / (iterations * len(texts)) * 1e6
+
+
+def run(iterations: int) -> None:
+    rng = random.Random(11)
+    banned = ["world-class", "game-changer", "no-brainer"]
+    cta_engine = ValidationEngine([CTARule()])
+    engine = build_engine(banned_phrases=banned)
+    keywords = ["busy teams", "workflow", "clearer priorities"]
+    per_phrase = per_phrase_scanner(CTA_INDICATORS + list(US_TO_UK_SPELLINGS) + banned + keywords)
+    print(f"{'chars':>6} {'legacy cta us':>14} {'engine cta us':>14} {'per-phrase all us':>18} {'engine all us':>14} "
+          f"{'legacy false +':>15}")
+    for chars in (280, 1000, 4000):
+        texts = [sample(rng, chars) for _ in range(50)]
+        legacy = timed(legacy_has_cta, texts, iterations)
+        cta_only = timed(lambda t: cta_engine.validate(t, require_cta=True), texts, iterations)
+        naive = timed(per_phrase, texts, iterations)
+        full = timed(lambda t: engine.validate(t, require_cta=True, keywords=keywords), texts, iterations)
+        # the samples contain no real CTA, so every legacy pass is a false positive ("seems", "country")
+        false_positives = sum(legacy_has_cta(t) for t in texts)
+        print(f"{chars:>6} {legacy:14.1f} {cta_only:14.1f} {naive:18.1f} {full:14.1f} "
+              f"{false_positives:>12}/{len(texts)}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
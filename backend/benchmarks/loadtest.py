@@ -0,0 +1,245 @@
+"""Load test of the real ASGI app against a simulated Anthropic backend.
+
+Each scenario starts the stub API on its own thread with a latency
+distribution, streaming speed and injected failures, points the app at it,
+then drives the app in-process with N concurrent clients. It reports
+throughput, p50/p95/p99 latency, status counts, event-loop lag and peak RSS.
+
+Run from backend/:
+    python -m benchmarks.loadtest                       # all scenarios
+    python -m benchmarks.loadtest baseline stream -c 64 -n 500
+    python -m benchmarks.loadtest --save                # write baselines
+    python -m benchmarks.loadtest --check               # exit 1 on regression vs baselines
+"""
+import argparse
+import asyncio
+import json
+import logging
+import resource
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import httpx
+from app.config import get_settings
+from app.logger import logger
+from .stub_anthropic import StubBehaviour, StubServer, create_stub_app
+
+BASELINE_PATH = Path(__file__).with_name("baselines") / "loadtest.json"
+
+COPY = (
+    "Stop losing evenings to proposals. This assistant turns a short brief into a polished, persuasive "
+    "proposal in minutes, matched to your voice and the client's brief. It pulls in your past wins, "
+    "prices clearly and flags anything missing before you hit send. Freelancers using it reply to leads "
+    "the same day and spend the time they save on paid work instead of admin. Start your free trial today."
+)
+
+# a regression is a result worse than the baseline by more than these factors
+TOLERANCE = {"throughput_rps": 0.8, "p95_ms": 1.3, "p99_ms": 1.5, "loop_lag_p99_ms": 2.0}
+LOOP_LAG_FLOOR_MS = 5.0  # lag under this is scheduler noise, never a regression
+
+
+@dataclass
+class Scenario:
+    name: str
+    path: str = "/generate"
+    behaviour: StubBehaviour = field(default_factory=StubBehaviour)
+    concurrency: int = 32
+    requests: int = 300
+    unique: bool = True  # vary the audience so caches do not hide upstream latency
+    settings: Dict[str, Any] = field(default_factory=dict)
+
+
+SCENARIOS = {
+    s.name: s for s in [
+        Scenario("baseline", behaviour=StubBehaviour(latency_median=0.15, latency_p95=0.4, seed=1)),
+        Scenario("cached", behaviour=StubBehaviour(latency_median=0.15, latency_p95=0.4, seed=1), unique=False),
+        Scenario(
+            "stream", path="/generate/stream",
+            behaviour=StubBehaviour(latency_median=0.1, latency_p95=0.3, tokens_per_second=400, seed=2)
+        ),
+        Scenario(
+            "rate_limited",
+            behaviour=StubBehaviour(latency_median=0.15, latency_p95=0.4, rate_limit_rate=0.1, retry_after=0.2, seed=3)
+        ),
+        Scenario(
+            "timeouts",
+            behaviour=StubBehaviour(latency_median=0.15, latency_p95=0.4, timeout_rate=0.05, hang_seconds=5, seed=4),
+            settings={"COPY_TIMEOUT": 1.0, "KEYWORDS_TIMEOUT": 1.0}
+        ),
+    ]
+}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+async def _watch_loop(lags: List[float], interval: float = 0.01) -> None:
+    """Samples how late the event loop wakes a sleeping task"""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        lags.append(loop.time() - started - interval)
+
+
+def _payload(scenario: Scenario, i: int) -> dict:
+    audience = f"freelance designers cohort {i}" if scenario.unique else "freelance designers"
+    return {"content_type": "Ad", "audience": audience, "product_info": "An AI tool that drafts proposals", "cta": True}
+
+
+async def _drive(app, scenario: Scenario) -> Dict[str, Any]:
+    latencies: List[float] = []
+    first_bytes: List[float] = []
+    statuses: Counter = Counter()
+    lags: List[float] = []
+    next_request = iter(range(scenario.requests))
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://app", timeout=None) as client:
+        async def worker(worker_id: int) -> None:
+            headers = {"X-Client-ID": f"client-{worker_id % 8}"}
+            for i in next_request:
+                started = time.perf_counter()
+                async with client.stream("POST", scenario.path, json=_payload(scenario, i), headers=headers) as response:
+                    first = None
+                    async for line in response.aiter_lines():
+                        if first is None:
+                            first = time.perf_counter() - started
+                        if scenario.path.endswith("/stream") and line and json.loads(line)["type"] == "error":
+                            statuses[json.loads(line)["status"]] += 1
+                            break
+                    else:
+                        statuses[response.status_code] += 1
+                latencies.append(time.perf_counter() - started)
+                first_bytes.append(first if first is not None else latencies[-1])
+
+        watcher = asyncio.ensure_future(_watch_loop(lags))
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(w) for w in range(scenario.concurrency)))
+        elapsed = time.perf_counter() - started
+        watcher.cancel()
+
+    ms = lambda values, pct: round(percentile(values, pct) * 1000, 1)
+    return {
+        "concurrency": scenario.concurrency,
+        "requests": scenario.requests,
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(scenario.requests / elapsed, 1),
+        "p50_ms": ms(latencies, 50),
+        "p95_ms": ms(latencies, 95),
+        "p99_ms": ms(latencies, 99),
+        "first_byte_p50_ms": ms(first_bytes, 50),
+        "loop_lag_p99_ms": ms(lags, 99),
+        "loop_lag_max_ms": ms(lags, 100),
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+    }
+
+
+async def run_scenario(scenario: Scenario) -> Dict[str, Any]:
+    from app.main import create_app
+
+    stub_app = create_stub_app(text=COPY, behaviour=scenario.behaviour)
+    with StubServer(stub_app) as stub:
+        overrides = {
+            "ANTHROPIC_API_KEY": "stub",
+            "ANTHROPIC_BASE_URL": stub.base_url,
+            "USE_FAKE_LLM": False,
+            "LEDGER_PATH": ":memory:",
+            "KEYWORD_CACHE_BACKEND": "memory",
+            **scenario.settings,
+        }
+        settings = get_settings()
+        previous = {name: getattr(settings, name) for name in overrides}
+        for name, value in overrides.items():
+            setattr(settings, name, value)
+        try:
+            app = create_app()
+            async with app.router.lifespan_context(app):
+                result = await _drive(app, scenario)
+        finally:
+            for name, value in previous.items():
+                setattr(settings, name, value)
+
+        result["upstream"] = {
+            "requests": stub_app.state.requests,
+            "rate_limited": stub_app.state.rate_limited,
+            "hung": stub_app.state.hung,
+        }
+    result["peak_rss_mb"] = round(peak_rss_mb(), 1)
+    return result
+
+
+def regressions(name: str, result: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    found = []
+    if result["throughput_rps"] < baseline["throughput_rps"] * TOLERANCE["throughput_rps"]:
+        found.append(f"{name}: throughput {result['throughput_rps']} rps vs baseline {baseline['throughput_rps']}")
+    for metric in ("p95_ms", "p99_ms", "loop_lag_p99_ms"):
+        limit = baseline[metric] * TOLERANCE[metric]
+        if metric.startswith("loop_lag"):
+            limit = max(limit, LOOP_LAG_FLOOR_MS)
+        if result[metric] > limit:
+            found.append(f"{name}: {metric} {result[metric]} vs baseline {baseline[metric]}")
+    return found
+
+
+def _print(name: str, result: Dict[str, Any]) -> None:
+    statuses = " ".join(f"{code}:{count}" for code, count in result["statuses"].items())
+    print(
+        f"{name:<13} {result['throughput_rps']:>7.1f} rps  p50 {result['p50_ms']:>7.1f}  p95 {result['p95_ms']:>7.1f}  "
+        f"p99 {result['p99_ms']:>7.1f} ms  lag p99 {result['loop_lag_p99_ms']:>5.1f} ms  "
+        f"rss {result['peak_rss_mb']:>6.1f} MB  [{statuses}]"
+    )
+
+
+async def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scenarios", nargs="*", help=f"any of {', '.join(SCENARIOS)} (default: all)")
+    parser.add_argument("-c", "--concurrency", type=int, help="concurrent clients (overrides the scenario)")
+    parser.add_argument("-n", "--requests", type=int, help="total requests (overrides the scenario)")
+    parser.add_argument("--save", action="store_true", help=f"write results to {BASELINE_PATH.name}")
+    parser.add_argument("--check", action="store_true", help="exit 1 if any result regressed against the baselines")
+    parser.add_argument("--verbose", action="store_true", help="keep the app's per-request INFO logs")
+    args = parser.parse_args(argv)
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario: {', '.join(sorted(unknown))}")
+    if not args.verbose:
+        logger.setLevel(logging.CRITICAL)  # statuses already count the failures
+
+    baselines = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+    results, problems = {}, []
+    for name in args.scenarios or list(SCENARIOS):
+        scenario = SCENARIOS[name]
+        if args.concurrency:
+            scenario.concurrency = args.concurrency
+        if args.requests:
+            scenario.requests = args.requests
+        results[name] = await run_scenario(scenario)
+        _print(name, results[name])
+        if args.check and name in baselines:
+            problems += regressions(name, results[name], baselines[name])
+
+    if args.save:
+        BASELINE_PATH.parent.mkdir(exist_ok=True)
+        BASELINE_PATH.write_text(json.dumps({**baselines, **results}, indent=2, sort_keys=True) + "\n")
+        print(f"Saved baselines to {BASELINE_PATH}")
+    for problem in problems:
+        print(f"REGRESSION {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,152 @@
+"""Local stand-in for the Anthropic Messages API, for benchmarks only"""
+import asyncio
+import json
+import math
+import random
+import socket
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Optional
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+@dataclass
+class StubBehaviour:
+    """How the simulated upstream behaves.
+
+    Latency is log-normal with the given median and p95 (seconds). Streamed
+    replies emit one word per token at `tokens_per_second`. A share of
+    requests can be answered with a 429 (with retry-after) or left hanging
+    for `hang_seconds`, long enough to trip the caller's timeout.
+    """
+    latency_median: float = 0.0
+    latency_p95: float = 0.0
+    tokens_per_second: float = 0.0  # 0 streams as fast as possible
+    rate_limit_rate: float = 0.0
+    retry_after: float = 0.2
+    timeout_rate: float = 0.0
+    hang_seconds: float = 30.0
+    seed: Optional[int] = None
+
+    def latency(self, rng: random.Random) -> float:
+        if self.latency_median <= 0:
+            return 0.0
+        if self.latency_p95 <= self.latency_median:
+            return self.latency_median
+        sigma = math.log(self.latency_p95 / self.latency_median) / 1.645
+        return rng.lognormvariate(math.log(self.latency_median), sigma)
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def create_stub_app(
+    latency: float = 0.0,
+    text: str = "Stub copy. Start your free trial today.",
+    behaviour: Optional[StubBehaviour] = None
+) -> FastAPI:
+    behaviour = behaviour or StubBehaviour(latency_median=latency, latency_p95=latency)
+    rng = random.Random(behaviour.seed)
+    app = FastAPI()
+    app.state.requests = 0
+    app.state.rate_limited = 0
+    app.state.hung = 0
+
+    def usage(output_tokens: int) -> dict:
+        return {"input_tokens": 10, "output_tokens": output_tokens}
+
+    async def stream(model: str, message_id: str):
+        words = text.split(" ")
+        yield _sse("message_start", {"type": "message_start", "message": {
+            "id": message_id, "type": "message", "role": "assistant", "model": model, "content": [],
+            "stop_reason": None, "stop_sequence": None, "usage": usage(1)
+        }})
+        yield _sse("content_block_start", {
+            "type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}
+        })
+        for i, word in enumerate(words):
+            if behaviour.tokens_per_second:
+                await asyncio.sleep(1 / behaviour.tokens_per_second)
+            yield _sse("content_block_delta", {
+                "type": "content_block_delta", "index": 0,
+                "delta": {"type": "text_delta", "text": word if i == 0 else " " + word}
+            })
+        yield _sse("content_block_stop", {"type": "content_block_stop", "index": 0})
+        yield _sse("message_delta", {
+            "type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+            "usage": {"output_tokens": len(words)}
+        })
+        yield _sse("message_stop", {"type": "message_stop"})
+
+    @app.post("/v1/messages")
+    async def messages(request: Request):
+        body = await request.json()
+        app.state.requests += 1
+        roll = rng.random()
+        if roll < behaviour.rate_limit_rate:
+            app.state.rate_limited += 1
+            return JSONResponse(
+                {"type": "error", "error": {"type": "rate_limit_error", "message": "Stub rate limit"}},
+                status_code=429,
+                headers={"retry-after": str(behaviour.retry_after)}
+            )
+        if roll < behaviour.rate_limit_rate + behaviour.timeout_rate:
+            app.state.hung += 1
+            await asyncio.sleep(behaviour.hang_seconds)
+
+        delay = behaviour.latency(rng)
+        if delay:
+            await asyncio.sleep(delay)
+
+        model = body.get("model", "stub")
+        message_id = f"msg_{uuid.uuid4().hex[:24]}"
+        if body.get("stream"):
+            return StreamingResponse(stream(model, message_id), media_type="text/event-stream")
+        return {
+            "id": message_id,
+            "type": "message",
+            "role": "assistant",
+            "model": model,
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": usage(len(text) // 4),
+        }
+
+    return app
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class StubServer:
+    """Runs the stub app on a background thread; use as a context manager"""
+    def __init__(self, app: FastAPI):
+        self.app = app
+        self.port = _free_port()
+        self.server = uvicorn.Server(uvicorn.Config(
+            app, host="127.0.0.1", port=self.port, log_level="critical", timeout_graceful_shutdown=1
+        ))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self) -> "StubServer":
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.server.should_exit = True
+        self.thread.join()
@@ -0,0 +1,19 @@
+"""gunicorn settings built from the app's Settings.
+
+    gunicorn 'app.main:create_app()' -c gunicorn.conf.py
+
+/metrics and /stats report only the worker that answers; series carry a
+worker="<pid>" label when WEB_CONCURRENCY > 1.
+"""
+from app.config import get_settings
+
+settings = get_settings()
+
+bind = f"{settings.HOST}:{settings.PORT}"
+workers = max(1, settings.WEB_CONCURRENCY)
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = settings.WORKER_TIMEOUT
+graceful_timeout = settings.WORKER_TIMEOUT
+keepalive = 5
+# not preloaded: each worker opens its own upstream pool, SQLite connections and lifespan
+preload_app = False
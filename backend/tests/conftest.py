@@ -1,10 +1,77 @@
+import os
+from types import SimpleNamespace
+from typing import List, Optional
 import pytest
+
+# keep test runs from writing a ledger file into the working tree
+os.environ.setdefault("LEDGER_PATH", ":memory:")
+
 from fastapi.testclient import TestClient
+from app.llm import FakeCopywritingLLM
 from app.main import app
+from app.schemas import CopyRequest
+from app.usage import record_usage
+
+
+def make_request(**overrides) -> CopyRequest:
+    """A valid /generate request (an ad for a code editor); tests import it with `from conftest import make_request`"""
+    fields = dict(content_type="Ad", audience="developers", product_info="Code editor", cta=True)
+    fields.update(overrides)
+    return CopyRequest(**fields)
+
+
+
+class CountingLLM(FakeCopywritingLLM):
+    """FakeCopywritingLLM that counts keyword and copy calls and the peak number of concurrent copy calls.
+
+    `keywords` replaces the fake's keyword list; with `metered`, each call
+    reports provider-style usage on a Sonnet model. Import it like make_request.
+    """
+    KEYWORD_USAGE = SimpleNamespace(input_tokens=60, output_tokens=20)
+    COPY_USAGE = SimpleNamespace(input_tokens=400, output_tokens=120, cache_read_input_tokens=1000)
+
+    def __init__(
+        self,
+        mode: str = "compliant",
+        keyword_delay: float = 0.0,
+        copy_delay: float = 0.0,
+        keywords: Optional[List[str]] = None,
+        metered: bool = False
+    ):
+        super().__init__(mode, keyword_delay=keyword_delay, copy_delay=copy_delay)
+        self.keywords = keywords
+        self.metered = metered
+        if metered:
+            self.model = "claude-sonnet-4-5-20250929"
+        self.keyword_calls = 0
+        self.copy_calls = 0
+        self.active = 0
+        self.peak = 0
+
+    async def generate_keywords(self, audience, product_info):
+        self.keyword_calls += 1
+        if self.metered:
+            record_usage("keywords", self.model, self.KEYWORD_USAGE)
+        keywords = await super().generate_keywords(audience, product_info)
+        return list(self.keywords) if self.keywords is not None else keywords
+
+    async def generate_copy(self, request, keywords):
+        self.copy_calls += 1
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            if self.metered:
+                record_usage("copy", self.model, self.COPY_USAGE)
+            return await super().generate_copy(request, keywords)
+        finally:
+            self.active -= 1
+
 
 @pytest.fixture
 def client():
-    return TestClient(app)
+    # entering the context runs the lifespan, which builds the client registry
+    with TestClient(app) as c:
+        yield c
 
 @pytest.fixture
 def mock_llm(monkeypatch):
@@ -21,3 +88,14 @@ def mock_llm(monkeypatch):
     
     monkeypatch.setattr(llm.CopywritingLLM, "generate_keywords", fake_keywords)
     monkeypatch.setattr(llm.CopywritingLLM, "generate_copy", fake_copy)
+
+@pytest.fixture
+def fake_llm(client):
+    """Swap the injected LLM for FakeCopywritingLLM in the given mode"""
+    from app.dependencies import provide_llm
+    from app.llm import FakeCopywritingLLM
+
+    def use(mode="compliant"):
+        client.app.dependency_overrides[provide_llm] = lambda: FakeCopywritingLLM(mode)
+    yield use
+    client.app.dependency_overrides.clear()
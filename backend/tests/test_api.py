@@ -1,4 +1,8 @@
+import asyncio
+import json
+import time
 import pytest
+from app.llm import FakeCopywritingLLM
 
 def test_health_endpoint(client):
     response = client.get("/health")
@@ -40,3 +44,118 @@ def test_generate_copy_with_keywords(client, mock_llm):
     }
     response = client.post("/generate", json=payload)
     assert response.status_code == 200
+
+def _stream_events(client, payload):
+    response = client.post("/generate/stream", json=payload)
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.text.splitlines() if line]
+
+def test_generate_stream_success(client, fake_llm):
+    fake_llm()
+    payload = {
+        "content_type": "Landing page hero",
+        "audience": "busy freelancers",
+        "product_info": "An AI tool that drafts proposals",
+        "cta": True
+    }
+    events = _stream_events(client, payload)
+    assert events[0]["type"] == "keywords"
+    deltas = [e["text"] for e in events if e["type"] == "delta"]
+    assert len(deltas) > 1
+    done = events[-1]
+    assert done["type"] == "done"
+    assert done["content"] == "".join(deltas)
+    assert done["metadata"]["ttfb_ms"] is not None
+
+def test_generate_stream_aborts_when_too_long(client, fake_llm):
+    fake_llm("too_long")
+    payload = {
+        "content_type": "Product announcement",  # no per-type limit, so MAX_COPY_LENGTH applies
+        "audience": "marketers",
+        "product_info": "Analytics tool",
+        "cta": False
+    }
+    events = _stream_events(client, payload)
+    assert events[-1]["type"] == "error"
+    assert events[-1]["status"] == 400
+    streamed = sum(len(e["text"]) for e in events if e["type"] == "delta")
+    assert streamed <= 4000
+
+def test_generate_stream_missing_cta(client, fake_llm):
+    fake_llm("missing_cta")
+    payload = {
+        "content_type": "Email",
+        "audience": "marketers",
+        "product_info": "Analytics tool",
+        "cta": True
+    }
+    events = _stream_events(client, payload)
+    assert events[-1] == {"type": "error", "status": 400, "detail": "CTA required but missing from generated copy"}
+
+def test_generate_variants_ranked(client, fake_llm):
+    fake_llm()
+    payload = {"content_type": "Ad", "audience": "freelancers", "product_info": "AI tool", "cta": True, "variants": 3}
+    data = client.post("/generate", json=payload).json()
+    assert len(data["variants"]) == 3
+    scores = [v["score"] for v in data["variants"]]
+    assert scores == sorted(scores, reverse=True)
+    assert client.post("/generate/stream", json=payload).status_code == 400
+    assert client.post("/generate", json={**payload, "variants": 6}).status_code == 422
+
+class SlowCopyLLM(FakeCopywritingLLM):
+    """Fake whose copy call takes far longer than the client is willing to wait"""
+    def __init__(self):
+        super().__init__(copy_delay=10)
+        self.copy_cancelled = False
+
+    async def generate_copy(self, request, keywords):
+        try:
+            return await super().generate_copy(request, keywords)
+        except asyncio.CancelledError:
+            self.copy_cancelled = True
+            raise
+
+@pytest.mark.asyncio
+async def test_generate_cancels_upstream_call_on_client_disconnect(monkeypatch):
+    from app.config import get_settings
+    from app.dependencies import provide_llm
+    from app.main import create_app
+    from app.metrics import cancelled_generations, cancelled_tokens_saved
+
+    monkeypatch.setattr(get_settings(), "DISCONNECT_POLL_INTERVAL", 0.01)
+    app = create_app()
+    llm = SlowCopyLLM()
+    app.dependency_overrides[provide_llm] = lambda: llm
+
+    body = json.dumps({"content_type": "Ad", "audience": "freelancers", "product_info": "AI tool", "cta": True})
+    messages = [{"type": "http.request", "body": body.encode(), "more_body": False}]
+    disconnected = asyncio.Event()
+    sent = []
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        await disconnected.wait()  # the client closes the tab
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST", "scheme": "http",
+        "path": "/generate", "raw_path": b"/generate", "query_string": b"", "root_path": "",
+        "headers": [(b"content-type", b"application/json")], "client": ("test", 1), "server": ("test", 80)
+    }
+    cancelled_before = cancelled_generations.get(content_type="ad")
+    saved_before = cancelled_tokens_saved.get(content_type="ad")
+
+    async with app.router.lifespan_context(app):
+        asyncio.get_running_loop().call_later(0.1, disconnected.set)
+        started = time.perf_counter()
+        await asyncio.wait_for(app(scope, receive, send), 2)
+
+    assert time.perf_counter() - started < 1
+    assert llm.copy_cancelled
+    assert [m["status"] for m in sent if m["type"] == "http.response.start"] == [499]
+    assert cancelled_generations.get(content_type="ad") == cancelled_before + 1
+    assert cancelled_tokens_saved.get(content_type="ad") > saved_before
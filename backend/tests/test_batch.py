@@ -0,0 +1,84 @@
+import json
+import pytest
+from app.batch import BatchJobStore, run_batch
+from conftest import CountingLLM, make_request
+from app.shared_state import SQLiteStore, SharedBackend
+
+
+class BatchLLM(CountingLLM):
+    """Fails items whose product is 'broken'"""
+    def __init__(self):
+        super().__init__(copy_delay=0.01)
+
+    async def generate_copy(self, request, keywords):
+        if request.product_info == "broken":
+            return "No call to action here."
+        return await super().generate_copy(request, keywords)
+
+    async def repair_copy(self, request, keywords, draft, instruction):
+        return draft  # broken items stay broken
+
+
+async def collect(items, llm, concurrency=2):
+    return [event async for event in run_batch(items, llm, None, concurrency)]
+
+
+@pytest.mark.asyncio
+async def test_batch_isolates_item_failures():
+    llm = BatchLLM()
+    events = await collect([make_request(), make_request(product_info="broken"), make_request()], llm)
+    items = {e["index"]: e for e in events if e["type"] == "item"}
+    assert items[0]["status"] == 200
+    assert items[1]["status"] == 400
+    assert items[2]["status"] == 200
+    assert events[-1]["type"] == "done"
+    assert (events[-1]["succeeded"], events[-1]["failed"]) == (2, 1)
+
+
+@pytest.mark.asyncio
+async def test_batch_respects_concurrency_bound():
+    llm = BatchLLM()
+    await collect([make_request() for _ in range(6)], llm, concurrency=2)
+    assert llm.peak == 2
+
+
+@pytest.mark.asyncio
+async def test_batch_shares_keywords_for_same_audience_and_product():
+    llm = BatchLLM()
+    items = [make_request() for _ in range(4)] + [make_request(audience="designers")]
+    await collect(items, llm, concurrency=5)
+    assert llm.keyword_calls == 2
+
+
+def test_batch_endpoint_streams_results(client, fake_llm):
+    fake_llm()
+    payload = {"items": [make_request().model_dump(), make_request(content_type="Tweet").model_dump()]}
+    response = client.post("/generate/batch", json=payload)
+    assert response.status_code == 200
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(e["index"] for e in events if e["type"] == "item") == [0, 1]
+    assert events[-1]["succeeded"] == 2
+
+
+def test_batch_job_round_trip(client, fake_llm):
+    fake_llm()
+    payload = {"items": [make_request().model_dump() for _ in range(3)]}
+    created = client.post("/generate/batch/jobs", json=payload)
+    assert created.status_code == 202
+    job = client.get(f"/generate/batch/jobs/{created.json()['job_id']}").json()
+    assert job["status"] == "ended"
+    assert [item["status"] for item in job["items"]] == [200, 200, 200]
+
+
+def test_batch_job_unknown_id(client):
+    assert client.get("/generate/batch/jobs/missing").status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_batch_jobs_on_shared_store_are_visible_to_every_worker(tmp_path):
+    path = str(tmp_path / "shared.sqlite3")
+    submitted_on, polled_on = (BatchJobStore(SharedBackend(SQLiteStore(path), "batch_jobs:")) for _ in range(2))
+    await submitted_on.add({"job_id": "j1", "batch_id": "b1", "items": [make_request()], "keywords": [["k"]]})
+    job = await polled_on.get("j1")
+    assert job["batch_id"] == "b1"
+    assert job["items"] == [make_request()]
@@ -0,0 +1,174 @@
+import asyncio
+import pytest
+from app.cache import KeywordCache, MemoryBackend, ResponseCache, SQLiteBackend, build_keyword_cache, build_response_cache
+from app.config import Settings
+
+
+def counting_generator(result=None):
+    calls = []
+
+    async def generate():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return list(result or ["ai tool", "copywriting"])
+    return generate, calls
+
+
+@pytest.mark.asyncio
+async def test_keyword_cache_hit_after_miss():
+    cache = KeywordCache(MemoryBackend())
+    generate, calls = counting_generator()
+    first = await cache.get_or_generate("Busy  Freelancers", "AI tool", "m", generate)
+    second = await cache.get_or_generate("busy freelancers", " ai tool ", "m", generate)
+    assert first == second
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_keyword_cache_keyed_on_model():
+    cache = KeywordCache(MemoryBackend())
+    generate, calls = counting_generator()
+    await cache.get_or_generate("a", "b", "model-1", generate)
+    await cache.get_or_generate("a", "b", "model-2", generate)
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_keyword_cache_expires_entries():
+    cache = KeywordCache(MemoryBackend(), ttl=0)
+    generate, calls = counting_generator()
+    await cache.get_or_generate("a", "b", "m", generate)
+    await cache.get_or_generate("a", "b", "m", generate)
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_keyword_cache_deduplicates_concurrent_misses():
+    cache = KeywordCache(MemoryBackend())
+    generate, calls = counting_generator()
+    results = await asyncio.gather(*[cache.get_or_generate("a", "b", "m", generate) for _ in range(5)])
+    assert len(calls) == 1
+    assert all(r == results[0] for r in results)
+    assert cache.stats()["coalesced"] == 4
+
+
+def test_memory_backend_evicts_least_recently_used():
+    backend = MemoryBackend(max_entries=2)
+    backend.set("a", 1, float("inf"))
+    backend.set("b", 2, float("inf"))
+    backend.get("a")
+    backend.set("c", 3, float("inf"))
+    assert backend.get("b") is None
+    assert backend.get("a") is not None
+    assert len(backend) == 2
+
+
+@pytest.mark.asyncio
+async def test_sqlite_backend_survives_restart(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    backend = SQLiteBackend(path)
+    await backend.set("k", ["one", "two"], float("inf"))
+    backend.close()
+
+    reopened = SQLiteBackend(path)
+    assert await reopened.get("k") == (["one", "two"], float("inf"))
+    reopened.close()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_backend_evicts_least_recently_used(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "cache.sqlite3"), max_entries=2)
+    await backend.set("a", 1, float("inf"))
+    await backend.set("b", 2, float("inf"))
+    await backend.get("a")  # noted in memory, written before the next eviction
+    await backend.set("c", 3, float("inf"))
+    assert await backend.get("b") is None
+    assert await backend.get("a") is not None
+    assert len(backend) == 2
+    backend.close()
+
+
+def test_build_keyword_cache_can_be_disabled():
+    assert build_keyword_cache(Settings(KEYWORD_CACHE_BACKEND="none")) is None
+
+
+def test_generate_reuses_cached_keywords(client, mock_llm):
+    payload = {
+        "content_type": "Landing page hero",
+        "audience": "busy freelancers",
+        "product_info": "An AI tool that drafts proposals",
+        "cta": True
+    }
+    client.post("/generate", json=payload)
+    client.post("/generate", json=payload)
+    stats = client.get("/stats").json()["keyword_cache"]
+    assert stats["misses"] == 1
+    assert stats["hits"] == 1
+
+
+def test_memory_backend_evicts_by_size():
+    backend = MemoryBackend(max_bytes=30)
+    backend.set("a", "x" * 10, float("inf"))
+    backend.set("b", "y" * 10, float("inf"))
+    backend.set("c", "z" * 10, float("inf"))
+    assert backend.get("a") is None
+    assert backend.bytes <= 30
+    backend.set("huge", "x" * 100, float("inf"))
+    assert backend.get("huge") is None
+
+
+def test_response_cache_key_covers_keywords_model_and_prompt_version():
+    request = {"content_type": "Ad", "audience": "a", "product_info": "b", "cta": True}
+    base = ResponseCache.key(request, ["k"], "m", "1")
+    assert base == ResponseCache.key(dict(request), ["k"], "m", "1")
+    assert base != ResponseCache.key(request, ["other"], "m", "1")
+    assert base != ResponseCache.key(request, ["k"], "m2", "1")
+    assert base != ResponseCache.key(request, ["k"], "m", "2")
+
+
+def test_response_cache_is_opt_in():
+    assert build_response_cache(Settings()) is None
+    assert build_response_cache(Settings(RESPONSE_CACHE_ENABLED=True)) is not None
+
+
+@pytest.fixture
+def cached_client(client, mock_llm):
+    client.app.state.response_cache = ResponseCache(MemoryBackend())
+    return client
+
+
+HERO = {
+    "content_type": "Landing page hero",
+    "audience": "busy freelancers",
+    "product_info": "An AI tool that drafts proposals",
+    "cta": True
+}
+
+
+def test_identical_requests_hit_response_cache(cached_client):
+    first = cached_client.post("/generate", json=HERO)
+    second = cached_client.post("/generate", json=HERO)
+    assert first.json()["metadata"]["cache"]["status"] == "miss"
+    assert second.json()["metadata"]["cache"]["status"] == "hit"
+    assert second.json()["content"] == first.json()["content"]
+    # nothing was spent again; the original generation's cost is kept apart
+    assert second.json()["metadata"]["estimated_cost"] == 0.0
+    assert second.json()["metadata"]["cached_from"]["tokens_used"] == first.json()["metadata"]["tokens_used"]
+    assert second.headers["etag"] == first.headers["etag"]
+    assert "max-age" in second.headers["cache-control"]
+
+
+def test_matching_etag_returns_not_modified(cached_client):
+    etag = cached_client.post("/generate", json=HERO).headers["etag"]
+    response = cached_client.post("/generate", json=HERO, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+
+def test_force_refresh_bypasses_response_cache(cached_client):
+    cached_client.post("/generate", json=HERO)
+    refreshed = cached_client.post("/generate", json={**HERO, "force_refresh": True})
+    assert refreshed.json()["metadata"]["cache"]["status"] == "refresh"
+    no_cache = cached_client.post("/generate", json=HERO, headers={"Cache-Control": "no-cache"})
+    assert no_cache.json()["metadata"]["cache"]["status"] == "refresh"
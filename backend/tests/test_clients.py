@@ -0,0 +1,53 @@
+import pytest
+from types import SimpleNamespace
+from app.clients import ClientRegistry
+from app.config import Settings
+from app.dependencies import provide_llm
+from app.main import app
+
+
+@pytest.mark.asyncio
+async def test_registry_reuses_client():
+    registry = ClientRegistry(Settings(ANTHROPIC_API_KEY="test"))
+    first = registry.anthropic
+    assert registry.anthropic is first
+    await registry.aclose()
+    assert first.is_closed()
+
+
+@pytest.mark.asyncio
+async def test_registry_applies_pool_limits():
+    registry = ClientRegistry(Settings(ANTHROPIC_API_KEY="test", ANTHROPIC_MAX_KEEPALIVE=3))
+    pool = registry.anthropic._client._transport._pool
+    assert pool._max_keepalive_connections == 3
+    await registry.aclose()
+
+
+def test_requests_share_one_client(client):
+    request = SimpleNamespace(app=app, headers={}, client=None)
+    assert provide_llm(request).client is provide_llm(request).client
+
+
+@pytest.mark.asyncio
+async def test_generate_copy_passes_per_call_timeout(monkeypatch):
+    from app.llm import CopywritingLLM
+    from app.schemas import CopyRequest
+    from app.config import get_settings
+
+    registry = ClientRegistry(Settings(ANTHROPIC_API_KEY="test"))
+    llm = CopywritingLLM(registry.anthropic)
+    captured = {}
+
+    class _Message:
+        content = []
+        usage = None
+
+    async def fake_create(**kwargs):
+        captured.update(kwargs)
+        return _Message()
+
+    monkeypatch.setattr(llm.client.messages, "create", fake_create)
+    req = CopyRequest(content_type="Ad", audience="users", product_info="Product", cta=False)
+    await llm.generate_copy(req, [])
+    assert captured["timeout"] == get_settings().COPY_TIMEOUT
+    await registry.aclose()
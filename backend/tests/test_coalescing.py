@@ -0,0 +1,50 @@
+import asyncio
+import pytest
+from app.coalescing import CoalescingLLM, coalesced_calls
+from app.pipeline import run_generation
+from conftest import CountingLLM, make_request
+from app.singleflight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_identical_generations_share_upstream_calls_and_bill_once():
+    llm = CountingLLM(keyword_delay=0.05, copy_delay=0.05, metered=True)
+    flights = SingleFlight()
+    followers = coalesced_calls.get(call="copy", role="follower")
+
+    bodies = await asyncio.gather(*[run_generation(make_request(), CoalescingLLM(llm, flights)) for _ in range(3)])
+    assert (llm.keyword_calls, llm.copy_calls) == (1, 1)
+    assert len({b["content"] for b in bodies}) == 1
+    usages = sorted((b["metadata"]["usage"] for b in bodies), key=lambda u: -u["calls"])
+    assert [u["calls"] for u in usages] == [2, 0, 0]
+    assert [u["shared_calls"] for u in usages] == [0, 2, 2]
+    assert sum(b["metadata"]["estimated_cost"] for b in bodies) == usages[0]["cost"]
+    assert coalesced_calls.get(call="copy", role="follower") == followers + 2
+
+
+@pytest.mark.asyncio
+async def test_different_requests_are_not_coalesced():
+    llm = CountingLLM(keyword_delay=0.05, copy_delay=0.05, metered=True)
+    flights = SingleFlight()
+    await asyncio.gather(
+        run_generation(make_request(), CoalescingLLM(llm, flights)),
+        run_generation(make_request(tone_of_voice="playful"), CoalescingLLM(llm, flights))
+    )
+    assert (llm.keyword_calls, llm.copy_calls) == (1, 2)  # keywords only depend on audience and product
+
+
+@pytest.mark.asyncio
+async def test_disconnected_caller_does_not_cancel_shared_generation():
+    llm = CountingLLM(keyword_delay=0.05, copy_delay=0.05, metered=True)
+    flights = SingleFlight()
+    first = asyncio.create_task(run_generation(make_request(), CoalescingLLM(llm, flights)))
+    second = asyncio.create_task(run_generation(make_request(), CoalescingLLM(llm, flights)))
+    await asyncio.sleep(0.07)  # both are waiting on the shared copy call
+    first.cancel()
+
+    body = await second
+    assert (llm.keyword_calls, llm.copy_calls) == (1, 1)
+    # the leader left before the copy call finished, so the survivor is billed for it
+    assert body["metadata"]["usage"]["calls"] == 1
+    with pytest.raises(asyncio.CancelledError):
+        await first
@@ -0,0 +1,59 @@
+import json
+import pytest
+from app.content_types import ContentTypeRegistry, classify_content_type, get_registry
+
+
+@pytest.mark.parametrize("content_type, rule", [
+    ("Email subject line", "headline"),
+    ("Blog headline", "headline"),
+    ("Tweet", "tweet"),
+    ("Social media post", "social_post"),
+    ("Google Ads copy", "google_ad"),
+    ("Facebook ad", "facebook_ad"),
+    ("Display ad", "ad"),
+    ("Email intro", "email_intro"),
+    ("Blog intro", "blog_intro"),
+    ("Product description", "product_description"),
+    ("Landing page hero", "landing_page_hero"),
+    ("Landing page", "landing_page"),
+    ("Blog article", "blog_article"),
+    ("Long-form sales letter", "long_form"),
+    ("Something else entirely", "default"),
+])
+def test_classifies_known_content_types(content_type, rule):
+    assert classify_content_type(content_type).name == rule
+
+
+def test_ad_rule_needs_a_whole_word():
+    # "header" and "download" used to match the bare "ad" substring
+    assert classify_content_type("Landing page header").name == "landing_page"
+    assert classify_content_type("Download page").name == "default"
+
+
+def test_earlier_rules_win_wherever_they_appear():
+    # "ad" comes before "blog" in the table even though "blog" appears first here
+    assert classify_content_type("Blog promo ad").name == "ad"
+
+
+def test_classification_is_memoized():
+    registry = get_registry()
+    registry.classify("Memo test type")
+    hits = registry.classify.cache_info().hits
+    registry.classify("Memo test type")
+    assert registry.classify.cache_info().hits == hits + 1
+
+
+def test_registry_loads_custom_table(tmp_path):
+    table = {
+        "default": {"name": "default", "guidance": "Be brief"},
+        "rules": [{"name": "push", "match": ["push notification"], "guidance": "Under 40 characters",
+                   "max_chars": 40, "cta": "skip"}]
+    }
+    path = tmp_path / "types.json"
+    path.write_text(json.dumps(table))
+    registry = ContentTypeRegistry.from_file(path)
+    rule = registry.classify("Push notifications")
+    assert rule.max_chars == 40
+    assert rule.skips_cta
+    assert registry.classify("Email").guidance == "Be brief"
+    assert registry.fingerprint != get_registry().fingerprint
@@ -0,0 +1,49 @@
+import pytest
+from app.keywords import extract_keywords
+from app.llm import FakeCopywritingLLM
+from app.pipeline import produce_copy, resolve_keywords
+from conftest import CountingLLM, make_request
+
+
+def local_request(**overrides):
+    fields = dict(
+        audience="small business owners",
+        product_info="Cloud accounting software that automates invoicing and VAT returns",
+        keyword_source="local",
+    )
+    return make_request(**{**fields, **overrides})
+
+
+def test_extracts_noun_phrases_without_stopwords():
+    extraction = extract_keywords("busy freelancers", "An AI tool that drafts proposals. Proposals in minutes!")
+    assert set(extraction.keywords[:3]) == {"drafts proposals", "ai tool", "busy freelancers"}
+    assert "proposals" not in extraction.keywords  # already covered by "drafts proposals"
+    assert all(word not in ("an", "that", "in") for k in extraction.keywords for word in k.split())
+
+
+def test_thin_inputs_have_low_confidence():
+    assert extract_keywords("users", "Product").confidence < 0.6
+    assert extract_keywords("small business owners", local_request().product_info).confidence == 1.0
+
+
+@pytest.mark.asyncio
+async def test_local_source_skips_the_keyword_call():
+    llm = CountingLLM()
+    keywords = await resolve_keywords(local_request(), llm)
+    assert "cloud accounting software" in keywords
+    assert llm.keyword_calls == 0
+
+
+@pytest.mark.asyncio
+async def test_low_confidence_falls_back_to_llm():
+    llm = CountingLLM()
+    keywords = await resolve_keywords(local_request(audience="users", product_info="Product"), llm)
+    assert keywords == await FakeCopywritingLLM().generate_keywords("users", "Product")
+    assert llm.keyword_calls == 1
+
+
+@pytest.mark.asyncio
+async def test_local_keywords_turn_single_shot_into_standard():
+    keywords, _, timings = await produce_copy(local_request(generation_mode="single_shot"), CountingLLM())
+    assert "vat returns" in keywords
+    assert set(timings) == {"copy"}
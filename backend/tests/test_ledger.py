@@ -0,0 +1,125 @@
+import asyncio
+import time
+from types import SimpleNamespace
+import pytest
+from app.ledger import CostLedger
+from app.llm import FakeCopywritingLLM
+from app.pipeline import run_generation
+from conftest import CountingLLM, make_request
+from app.usage import UsageRecord, collect_usage, record_usage
+
+
+def test_record_usage_outside_a_generation_is_ignored():
+    record_usage("copy", "m", SimpleNamespace(input_tokens=1, output_tokens=1))
+    with collect_usage() as usage:
+        record_usage("copy", "m", SimpleNamespace(input_tokens=1, output_tokens=2))
+    assert usage == [UsageRecord("copy", "m", 1, 2)]
+
+
+@pytest.mark.asyncio
+async def test_run_generation_reports_real_usage():
+    body = await run_generation(make_request(), CountingLLM(metered=True))
+    usage = body["metadata"]["usage"]
+    assert usage["calls"] == 2
+    assert usage["input_tokens"] == 460
+    assert usage["cache_read_input_tokens"] == 1000
+    assert body["metadata"]["tokens_used"] == 460 + 140 + 1000
+    # (460 * 3 + 140 * 15 + 1000 * 0.3) / 1M
+    assert body["metadata"]["estimated_cost"] == 0.00378
+
+
+@pytest.mark.asyncio
+async def test_ledger_aggregates_requests():
+    ledger = CostLedger(":memory:")
+    ledger.start()
+    first = await run_generation(make_request(), CountingLLM(metered=True), ledger=ledger)
+    await run_generation(make_request(), CountingLLM(metered=True), ledger=ledger)
+    # failed validation is still paid for
+    with pytest.raises(ValueError):
+        await run_generation(make_request(), CountingLLM("missing_cta", metered=True), ledger=ledger)
+
+    while ledger.stats()["pending"]:
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.05)
+
+    calls = await ledger.for_request(first["metadata"]["request_id"])
+    assert [c["call"] for c in calls] == ["keywords", "copy"]
+    days = await ledger.by_day()
+    assert days[0]["requests"] == 3
+    assert days[0]["input_tokens"] == 3 * 460
+    by_type = await ledger.by_content_type()
+    assert by_type[0]["content_type"] == "Ad"
+    await ledger.aclose()
+
+
+@pytest.mark.asyncio
+async def test_ledger_flushes_on_close(tmp_path):
+    path = str(tmp_path / "ledger.sqlite3")
+    ledger = CostLedger(path)
+    ledger.start()
+    ledger.record("req", "Ad", [UsageRecord("copy", "m", 10, 5)])
+    await ledger.aclose()
+
+    reopened = CostLedger(path)
+    assert len(await reopened.for_request("req")) == 1
+    await reopened.aclose()
+
+
+def test_ledger_endpoints(client):
+    from app.dependencies import provide_llm
+    client.app.dependency_overrides[provide_llm] = lambda: CountingLLM(metered=True)
+    payload = make_request().model_dump()
+    request_id = client.post("/generate", json=payload).json()["metadata"]["request_id"]
+    client.app.dependency_overrides.clear()
+
+    # the ledger writes in the background
+    for _ in range(100):
+        detail = client.get(f"/ledger/requests/{request_id}")
+        if detail.status_code == 200:
+            break
+        time.sleep(0.01)
+    assert detail.status_code == 200
+    assert len(detail.json()["calls"]) == 2
+    summary = client.get("/ledger/summary", params={"group_by": "content_type"}).json()
+    assert summary["rows"][0]["content_type"] == "Ad"
+
+
+def test_prompt_cache_summary_reports_savings():
+    from app.usage import prompt_cache_summary
+    records = [
+        UsageRecord("copy", "claude-sonnet-4-5", input_tokens=100, cache_creation_input_tokens=2000),
+        UsageRecord("copy", "claude-sonnet-4-5", input_tokens=100, cache_read_input_tokens=2000),
+    ]
+    summary = prompt_cache_summary(records)
+    assert summary["hit_rate"] == round(2000 / 4200, 3)
+    # read saves 2000 * (3 - 0.3), write costs 2000 * (3.75 - 3), per million
+    assert summary["cost_saved"] == round((2000 * 2.7 - 2000 * 0.75) / 1_000_000, 6)
+
+
+@pytest.mark.asyncio
+async def test_run_generation_reports_prompt_cache_metadata():
+    body = await run_generation(make_request(), CountingLLM(metered=True))
+    assert body["metadata"]["prompt_cache"]["cache_read_input_tokens"] == 1000
+
+
+@pytest.mark.asyncio
+async def test_batch_results_are_billed_once_at_the_batch_discount():
+    from app.batch import BatchJobStore, collect_batch_job
+    from app.llm import BatchItemResult
+
+    class BatchLLM(FakeCopywritingLLM):
+        async def fetch_copy_batch(self, batch_id):
+            usage = UsageRecord("batch_copy", "claude-sonnet-4-5", input_tokens=400, output_tokens=120, batch=True)
+            return {"0": BatchItemResult(self._draft(), usage)}
+
+    ledger = CostLedger(":memory:")
+    ledger.start()
+    jobs = BatchJobStore()
+    await jobs.add({"job_id": "job", "batch_id": "b", "items": [make_request()], "keywords": [["editor"]]})
+    for _ in range(2):
+        result = await collect_batch_job(await jobs.get("job"), BatchLLM(), jobs, ledger)
+    await ledger.aclose()
+
+    # half of (400 * 3 + 120 * 15) / 1M
+    assert result["items"][0]["result"]["metadata"]["estimated_cost"] == 0.0015
+    assert ledger.written == 1  # the second poll found the job already billed
@@ -31,4 +31,100 @@ async def test_fake_llm_too_long_mode():
         cta=False
     )
     copy = await llm.generate_copy(req, [])
-    assert len(copy) > 2000
\ No newline at end of file
+    assert len(copy) > 2000
+
+
+@pytest.mark.asyncio
+async def test_fake_llm_streams_same_copy():
+    llm = FakeCopywritingLLM()
+    req = CopyRequest(
+        content_type="Landing page",
+        audience="developers",
+        product_info="Code editor",
+        cta=True
+    )
+    chunks = [chunk async for chunk in llm.stream_copy(req, ["test"])]
+    assert len(chunks) > 1
+    assert "".join(chunks) == await llm.generate_copy(req, ["test"])
+
+
+def _llm_replying(monkeypatch, text):
+    from anthropic.types import TextBlock
+    from app.llm import CopywritingLLM
+
+    llm = CopywritingLLM()
+
+    class _Message:
+        content = [TextBlock(type="text", text=text)]
+        usage = None
+
+    async def fake_create(**kwargs):
+        return _Message()
+
+    monkeypatch.setattr(llm.client.messages, "create", fake_create)
+    return llm
+
+
+@pytest.mark.asyncio
+async def test_single_shot_parses_structured_reply(monkeypatch):
+    llm = _llm_replying(monkeypatch, '```json\n{"keywords": ["AI Tool", "ai tool", "proposals"], "copy": "Write faster. Start today."}\n```')
+    req = CopyRequest(content_type="Ad", audience="users", product_info="Product", cta=True)
+    keywords, copy = await llm.generate_keywords_and_copy(req)
+    assert keywords == ["ai tool", "proposals"]
+    assert copy == "Write faster. Start today."
+
+
+@pytest.mark.asyncio
+async def test_single_shot_rejects_unstructured_reply(monkeypatch):
+    from app.llm import SingleShotUnparsed
+    llm = _llm_replying(monkeypatch, '{"keywords": ["ai tool"], "cop')
+    req = CopyRequest(content_type="Ad", audience="users", product_info="Product", cta=True)
+    with pytest.raises(SingleShotUnparsed):
+        await llm.generate_keywords_and_copy(req)
+
+
+def test_copy_params_put_stable_prefix_first():
+    from app.llm import CopywritingLLM, SYSTEM_PROMPT
+    req = CopyRequest(
+        content_type="Ad",
+        audience="users",
+        product_info="Product",
+        cta=True,
+        brand_sample="We speak plainly."
+    )
+    # the default Sonnet model caches the system block on its own
+    params = CopywritingLLM()._copy_params(req, ["kw"])
+    system = params["system"][0]
+    assert system["text"].startswith(SYSTEM_PROMPT)
+    assert "UK English spelling" in system["text"]
+    assert system["cache_control"] == {"type": "ephemeral"}
+
+    brand, variable = params["messages"][0]["content"]
+    assert "We speak plainly." in brand["text"]
+    assert brand["cache_control"] == {"type": "ephemeral"}
+    assert "cache_control" not in variable
+    assert "Audience: users" in variable["text"]
+    assert "We speak plainly." not in variable["text"]
+
+
+def test_copy_params_skip_breakpoints_below_cacheable_length():
+    from app.llm import CopywritingLLM, min_cacheable_tokens
+    from app.routing import ModelRouter
+    assert min_cacheable_tokens("claude-sonnet-4-5-20250929") == 1024
+    assert min_cacheable_tokens("claude-haiku-4-5-20251001") == 4096
+    assert min_cacheable_tokens("claude-3-5-haiku-20241022") == 2048
+    # even the longest allowed brand sample stays under Haiku 4.5's minimum
+    req = CopyRequest(content_type="Ad", audience="users", product_info="Product", cta=True, brand_sample="x" * 3000)
+    params = CopywritingLLM(router=ModelRouter("claude-haiku-4-5-20251001"))._copy_params(req, [])
+    assert "cache_control" not in params["system"][0]
+    assert all("cache_control" not in block for block in params["messages"][0]["content"])
+
+
+def test_copy_params_without_caching(monkeypatch):
+    from app.config import get_settings
+    from app.llm import CopywritingLLM
+    monkeypatch.setattr(get_settings(), "PROMPT_CACHING_ENABLED", False)
+    req = CopyRequest(content_type="Ad", audience="users", product_info="Product", cta=True)
+    params = CopywritingLLM()._copy_params(req, [])
+    assert "cache_control" not in params["system"][0]
+    assert len(params["messages"][0]["content"]) == 1
@@ -0,0 +1,108 @@
+import asyncio
+import time
+import pytest
+from app.metrics import MetricsRegistry, errors, span, stage_duration
+from app.middleware import RequestContextMiddleware
+
+# instrumentation a /generate request pays for: the middleware plus a handful of spans
+OVERHEAD_BUDGET_US = 100
+SPANS_PER_REQUEST = 6
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry("test")
+    latency = registry.histogram("latency_seconds", "Latency", ("stage",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        latency.observe(value, stage="copy")
+    calls = registry.counter("calls_total", "Calls", ("status",))
+    calls.inc(status="429")
+
+    text = registry.render()
+    assert '# TYPE test_latency_seconds histogram' in text
+    assert 'test_latency_seconds_bucket{stage="copy",le="0.1"} 1' in text
+    assert 'test_latency_seconds_bucket{stage="copy",le="1"} 3' in text
+    assert 'test_latency_seconds_bucket{stage="copy",le="+Inf"} 4' in text
+    assert 'test_latency_seconds_sum{stage="copy"} 4.05' in text
+    assert 'test_latency_seconds_count{stage="copy"} 4' in text
+    assert 'test_calls_total{status="429"} 1' in text
+    assert text.endswith("\n")
+
+
+def test_span_records_failed_stages_by_content_type_rule():
+    before = stage_duration.count(stage="test", content_type="tweet")
+    with span("test", "Tweet"):
+        pass
+    with pytest.raises(RuntimeError):
+        with span("test", "Launch day tweets"):
+            raise RuntimeError("upstream failed")
+    assert stage_duration.count(stage="test", content_type="tweet") == before + 2
+
+
+def test_metrics_endpoint_and_request_id(client, fake_llm):
+    fake_llm()
+    payload = {"content_type": "Ad", "audience": "freelancers", "product_info": "AI tool", "cta": True}
+    response = client.post("/generate", json=payload, headers={"X-Request-ID": "req-123"})
+    assert response.headers["x-request-id"] == "req-123"
+    assert response.json()["metadata"]["request_id"] == "req-123"
+    generated = client.get("/health").headers["x-request-id"]
+    assert len(generated) == 32 and generated != "req-123"
+    assert client.get("/health", headers={"X-Request-ID": "bad id\r\n"}).headers["x-request-id"] != "bad id"
+
+    failed_before = errors.get(status="400", error="ValueError")
+    fake_llm("missing_cta")
+    assert client.post("/generate", json=payload).status_code == 400
+    assert errors.get(status="400", error="ValueError") == failed_before + 1
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    for line in [
+        'dkcopy_stage_duration_seconds_count{stage="keywords",content_type="ad"}',
+        'dkcopy_stage_duration_seconds_count{stage="copy",content_type="ad"}',
+        'dkcopy_stage_duration_seconds_count{stage="validation",content_type="ad"}',
+        'dkcopy_http_request_duration_seconds_count{method="POST",route="/generate",status="200"}',
+        'dkcopy_errors_total{status="400",error="ValueError"}',
+        'dkcopy_http_requests_in_flight 1',  # the /metrics request itself
+    ]:
+        assert line in response.text
+
+
+def test_instrumentation_overhead_within_budget():
+    async def endpoint(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def receive():
+        return {"type": "http.request"}
+
+    async def send(message):
+        pass
+
+    middleware = RequestContextMiddleware(endpoint)
+    scope = {"type": "http", "method": "POST", "path": "/generate", "headers": [(b"x-request-id", b"abc")]}
+
+    async def request():
+        await middleware(dict(scope), receive, send)
+        for _ in range(SPANS_PER_REQUEST):
+            with span("overhead", "Ad"):
+                pass
+
+    async def per_request_us(runs: int) -> float:
+        await request()  # warm the classifier memo
+        started = time.perf_counter()
+        for _ in range(runs):
+            await request()
+        return (time.perf_counter() - started) / runs * 1e6
+
+    assert asyncio.run(per_request_us(2000)) < OVERHEAD_BUDGET_US
+
+
+def test_const_labels_go_on_every_sample():
+    registry = MetricsRegistry("test")
+    registry.const_labels["worker"] = "42"
+    registry.counter("calls_total", "Calls").inc()
+    registry.histogram("latency_seconds", "Latency", ("stage",), buckets=(1.0,)).observe(0.5, stage="copy")
+    text = registry.render()
+    assert 'test_calls_total{worker="42"} 1' in text
+    assert 'test_latency_seconds_bucket{stage="copy",worker="42",le="1"} 1' in text
+    assert 'test_latency_seconds_count{stage="copy",worker="42"} 1' in text
@@ -0,0 +1,108 @@
+import asyncio
+import os
+import pytest
+from app.near_duplicates import NearDuplicateIndex, MinHasher, shingles, similarity
+from app.pipeline import run_generation
+from conftest import CountingLLM, make_request
+
+PRODUCT = "Cloud accounting software that automates invoicing, expense tracking and VAT returns."
+REWORDED = "Cloud accounting software automating invoices, expense tracking and VAT returns"
+
+
+def test_signatures_estimate_trigram_similarity():
+    hasher = MinHasher()
+    assert shingles("Busy, freelancers!") == shingles("busy   freelancers")
+    assert similarity(hasher.signature("busy freelancers"), hasher.signature("busy freelance workers")) > 0.6
+    assert similarity(hasher.signature("busy freelancers"), hasher.signature("marathon runners")) < 0.2
+
+
+def test_reworded_request_seeds_and_new_audience_misses():
+    index = NearDuplicateIndex()
+    index.add("busy freelancers", PRODUCT, "ctx", ["cloud accounting"], {"content": "copy"})
+
+    match = index.lookup("busy freelance workers", REWORDED, "ctx")
+    assert match is not None and match.keywords == ["cloud accounting"]
+    assert match.body is None  # similar, but below the return threshold
+    assert index.lookup("retired teachers", PRODUCT, "ctx") is None
+    assert index.stats()["seeded"] == 1
+
+
+def test_near_identical_request_returns_only_with_same_context():
+    index = NearDuplicateIndex()
+    index.add("busy freelancers", PRODUCT, "ctx", ["cloud accounting"], {"content": "copy"})
+
+    match = index.lookup("Busy freelancers.", PRODUCT.lower(), "ctx")
+    assert match.body == {"content": "copy"} and not match.exact
+    assert index.lookup("busy  freelancers", PRODUCT, "ctx").exact
+    assert index.lookup("busy freelancers", PRODUCT, "other tone").body is None
+
+
+def test_index_is_bounded_and_cleans_up_buckets():
+    index = NearDuplicateIndex(max_entries=3)
+    for i in range(10):
+        index.add(f"audience number {i}", f"product {i} " * 3, "ctx", [str(i)])
+    index.add("audience number 9", "product 9 " * 3, "ctx", ["again"])  # replaces, does not grow
+    assert len(index) == 3
+    assert index.stats()["buckets"] <= 3 * index.bands
+    assert index.lookup("audience number 0", "product 0 " * 3, "ctx") is None
+    assert index.lookup("audience number 9", "product 9 " * 3, "ctx").keywords == ["again"]
+
+
+def test_index_is_bounded_by_bytes():
+    body = {"content": "x" * 2000}
+    index = NearDuplicateIndex(max_bytes=10_000)
+    for i in range(10):
+        index.add(f"audience number {i}", f"product {i} " * 3, "ctx", [str(i)], body)
+    assert index.bytes <= 10_000 and 0 < len(index) < 10
+    assert index.lookup("audience number 9", "product 9 " * 3, "ctx").body == body
+
+    index.add("huge", "body", "ctx", ["kept"], {"content": "x" * 20_000})
+    match = index.lookup("huge", "body", "ctx")
+    assert match.keywords == ["kept"] and match.body is None  # too big to keep, still seeds keywords
+
+
+def test_index_persists_to_disk(tmp_path):
+    path = str(tmp_path / "near.json")
+    index = NearDuplicateIndex(path=path)
+    index.add("busy freelancers", PRODUCT, "ctx", ["cloud accounting"], {"content": "copy"})
+    index.save()
+    assert os.listdir(tmp_path) == ["near.json"]  # the per-process temp file was renamed into place
+
+    restored = NearDuplicateIndex(path=path)
+    assert len(restored) == 1
+    assert restored.lookup("busy freelance workers", REWORDED, "ctx").keywords == ["cloud accounting"]
+    # signatures built with other parameters are not comparable, so the snapshot is ignored
+    assert len(NearDuplicateIndex(path=path, num_perm=32, bands=16)) == 0
+
+
+@pytest.mark.asyncio
+async def test_index_saves_periodically_while_running(tmp_path):
+    path = str(tmp_path / "near.json")
+    index = NearDuplicateIndex(path=path, save_interval=0.01)
+    index.start()
+    index.add("busy freelancers", PRODUCT, "ctx", ["cloud accounting"])
+    await asyncio.sleep(0.05)
+    assert len(NearDuplicateIndex(path=path)) == 1  # on disk without a clean shutdown
+    await index.aclose()
+
+
+@pytest.mark.asyncio
+async def test_generation_seeds_keywords_then_returns_response():
+    llm = CountingLLM()
+    index = NearDuplicateIndex()
+
+    first = await run_generation(make_request(audience="busy freelancers", product_info=PRODUCT), llm, near_duplicates=index)
+    assert first["metadata"]["near_duplicate"] == {"status": "miss"}
+
+    seeded = await run_generation(make_request(audience="busy freelance workers", product_info=REWORDED), llm, near_duplicates=index)
+    assert seeded["metadata"]["near_duplicate"]["status"] == "seeded"
+    assert seeded["keywords"] == first["keywords"]
+    assert (llm.keyword_calls, llm.copy_calls) == (1, 2)
+
+    returned = await run_generation(make_request(audience="Busy freelancers", product_info=PRODUCT), llm, near_duplicates=index)
+    assert returned["metadata"]["near_duplicate"]["status"] == "returned"
+    assert returned["metadata"]["cache"]["status"] == "near_hit"
+    assert returned["content"] == first["content"]
+    assert returned["metadata"]["tokens_used"] == 0
+    assert returned["metadata"]["cached_from"]["estimated_cost"] == first["metadata"]["estimated_cost"]
+    assert llm.copy_calls == 2
@@ -0,0 +1,106 @@
+import asyncio
+import time
+import pytest
+from app.llm import FakeCopywritingLLM, SingleShotUnparsed
+from app.pipeline import produce_copy, run_generation
+from app.ranking import score_copy
+from conftest import CountingLLM, make_request
+from app.validation import ValidationReport
+
+
+@pytest.mark.asyncio
+async def test_standard_mode_times_both_calls():
+    llm = FakeCopywritingLLM(keyword_delay=0.01, copy_delay=0.01)
+    keywords, text, timings = await produce_copy(make_request(), llm)
+    assert keywords
+    assert set(timings) == {"keywords", "copy"}
+
+
+@pytest.mark.asyncio
+async def test_single_shot_mode_makes_one_call():
+    llm = FakeCopywritingLLM()
+    keywords, text, timings = await produce_copy(make_request(generation_mode="single_shot"), llm)
+    assert keywords
+    assert "CTA" in text
+    assert set(timings) == {"copy"}
+
+
+@pytest.mark.asyncio
+async def test_unparsed_single_shot_falls_back_to_standard_mode():
+    class UnparsedLLM(FakeCopywritingLLM):
+        async def generate_keywords_and_copy(self, request):
+            raise SingleShotUnparsed("not JSON")
+
+    keywords, text, timings = await produce_copy(make_request(generation_mode="single_shot"), UnparsedLLM())
+    assert keywords
+    assert "CTA" in text
+    assert set(timings) == {"single_shot_failed", "keywords", "copy"}
+
+    metadata = (await run_generation(make_request(generation_mode="single_shot"), UnparsedLLM()))["metadata"]
+    assert (metadata["generation_mode"], metadata["generation_mode_used"]) == ("single_shot", "standard")
+    assert "single_shot_failed" in metadata["timings_ms"]
+
+
+@pytest.mark.asyncio
+async def test_speculative_mode_overlaps_calls():
+    llm = FakeCopywritingLLM(keyword_delay=0.1, copy_delay=0.1)
+    result = await run_generation(make_request(generation_mode="speculative"), llm)
+    assert result["keywords"]
+    assert result["metadata"]["generation_mode"] == "speculative"
+    assert result["metadata"]["timings_ms"]["total"] < 190
+
+
+@pytest.mark.asyncio
+async def test_supplied_keywords_skip_keyword_call():
+    llm = FakeCopywritingLLM()
+    keywords, _, _ = await produce_copy(make_request(generation_mode="single_shot", keywords=["mine"]), llm)
+    assert keywords == ["mine"]
+
+
+@pytest.mark.asyncio
+async def test_run_generation_raises_on_invalid_copy():
+    with pytest.raises(ValueError, match="CTA"):
+        await run_generation(make_request(), FakeCopywritingLLM("missing_cta"))
+
+
+class VariantLLM(CountingLLM):
+    """Variant 0 misses the CTA, variant 1 ignores the keywords, variant 2 uses them"""
+    def __init__(self):
+        super().__init__(copy_delay=0.05, keywords=["code editor", "refactoring"])
+
+    async def generate_variant(self, request, keywords, index, total):
+        await asyncio.sleep(self.copy_delay)
+        return [
+            "A code editor built for refactoring.",
+            "Write better software. Start your free trial today.",
+            "The code editor that makes refactoring painless. Start your free trial today.",
+        ][index]
+
+
+@pytest.mark.asyncio
+async def test_variants_share_keywords_and_run_in_parallel():
+    llm = VariantLLM()
+    started = time.perf_counter()
+    body = await run_generation(make_request(variants=3), llm)
+    assert time.perf_counter() - started < 0.12  # three 50ms calls, not 150ms
+    assert llm.keyword_calls == 1
+    assert [v["index"] for v in body["variants"]] == [2, 1]
+    assert body["content"] == body["variants"][0]["content"]
+    assert body["variants"][0]["scores"]["keywords"] == 1.0
+    assert body["metadata"]["variants"]["rejected"] == [
+        {"index": 0, "detail": "CTA required but missing from generated copy"}
+    ]
+
+
+@pytest.mark.asyncio
+async def test_variants_fail_when_none_is_valid():
+    with pytest.raises(ValueError, match="CTA"):
+        await run_generation(make_request(variants=2), FakeCopywritingLLM("missing_cta"))
+
+
+def test_score_prefers_closing_cta():
+    report = ValidationReport()
+    early = score_copy("Start your trial. The editor is fast and calm to use.", [], "Ad", True, report)
+    late = score_copy("The editor is fast and calm to use. Start your trial.", [], "Ad", True, report)
+    assert late["cta"] == 1.0 and early["cta"] == 0.5
+    assert late["total"] > early["total"]
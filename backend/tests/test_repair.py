@@ -0,0 +1,70 @@
+import asyncio
+import pytest
+from app.llm import FakeCopywritingLLM
+from app.pipeline import run_generation
+from app.repair import repair_copy, truncate_at_sentence
+from conftest import CountingLLM, make_request
+
+
+class FixingLLM(CountingLLM):
+    """Writes copy without a CTA, then adds one when asked to repair"""
+    def __init__(self, fix_after=1, copy_delay=0.0):
+        super().__init__("missing_cta", copy_delay=copy_delay)
+        self.fix_after = fix_after
+        self.instructions = []
+
+    async def repair_copy(self, request, keywords, draft, instruction):
+        self.instructions.append(instruction)
+        await asyncio.sleep(self.copy_delay)
+        if len(self.instructions) < self.fix_after:
+            return await super().repair_copy(request, keywords, draft, instruction)
+        return draft + " Start your free trial today."
+
+
+def test_truncate_keeps_whole_sentences():
+    text = "First sentence. Second one! Third goes on for far too long to fit."
+    assert truncate_at_sentence(text, 30) == "First sentence. Second one!"
+    assert truncate_at_sentence(text, 12) is None  # no sentence ends in time
+    assert truncate_at_sentence(text, 60, min_keep=0.9) is None
+
+
+@pytest.mark.asyncio
+async def test_too_long_copy_is_truncated_locally():
+    llm = FixingLLM()
+    text = "Ship faster with fewer meetings. Try it today. " * 10
+    fixed, report, repair = await repair_copy(make_request(content_type="Tweet"), llm, [], text)
+    assert len(fixed) <= 280 and text.startswith(fixed) and fixed.endswith(".")
+    assert report.ok
+    assert repair["actions"] == ["truncate"]
+    assert llm.instructions == []
+
+
+@pytest.mark.asyncio
+async def test_missing_cta_is_repaired_by_the_model():
+    llm = FixingLLM()
+    body = await run_generation(make_request(), llm)
+    assert body["content"].endswith("Start your free trial today.")
+    assert body["metadata"]["repair"] == {"attempts": 1, "actions": ["model"]}
+    assert "call-to-action" in llm.instructions[0]
+
+
+@pytest.mark.asyncio
+async def test_repair_gives_up_after_retry_budget():
+    llm = FixingLLM(fix_after=3)
+    with pytest.raises(ValueError, match="CTA"):
+        await repair_copy(make_request(), llm, [], "No call to action here.", max_attempts=2)
+    assert len(llm.instructions) == 2
+
+
+@pytest.mark.asyncio
+async def test_repair_respects_latency_budget():
+    llm = FixingLLM(copy_delay=0.2)
+    with pytest.raises(ValueError, match="CTA"):
+        await repair_copy(make_request(), llm, [], "No call to action here.", latency_budget=0.05)
+
+
+@pytest.mark.asyncio
+async def test_valid_copy_reports_no_attempts():
+    body = await run_generation(make_request(), FakeCopywritingLLM())
+    assert body["metadata"]["repair"] == {"attempts": 0, "actions": []}
+    assert "repair" not in body["metadata"]["timings_ms"]
@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+import pytest
+from anthropic.types import TextBlock
+from app.content_types import classify_content_type
+from app.llm import CopywritingLLM
+from app.config import Settings
+from app.routing import ModelRouter, build_router, length_class, route_for
+from conftest import make_request
+
+BIG, SMALL = "claude-sonnet-4-5-20250929", "claude-haiku-4-5-20251001"
+
+
+def test_length_class_follows_content_type_table():
+    classes = {ct: length_class(classify_content_type(ct)) for ct in ["Subject line", "Tweet", "Landing page", "Blog article"]}
+    assert classes == {"Subject line": "short", "Tweet": "short", "Landing page": "medium", "Blog article": "long"}
+    assert route_for("keywords", "Tweet") == "keywords"
+    assert route_for("copy", "Tweet") == "copy:short"
+
+
+def test_router_falls_back_to_default_model():
+    router = ModelRouter(BIG, {"keywords": SMALL, "copy:short": SMALL}, {"keywords": ""})
+    assert router.model_for("copy:short") == SMALL
+    assert router.model_for("copy:long") == BIG
+    assert router.fallback_for("copy:short") == BIG
+    assert router.fallback_for("keywords") is None  # disabled
+    assert router.fallback_for("copy:long") is None  # already on the default model
+
+
+def test_routing_is_opt_in():
+    router = build_router(Settings(ANTHROPIC_MODEL=BIG))
+    assert all(router.model_for(route) == BIG for route in ("keywords", "copy:short", "copy:medium", "copy:long"))
+    assert build_router(Settings(ANTHROPIC_MODEL=BIG, MODEL_ROUTES={"keywords": SMALL})).model_for("keywords") == SMALL
+
+
+@pytest.mark.asyncio
+async def test_llm_routes_each_call_and_records_stats():
+    calls = []
+
+    async def create(**params):
+        calls.append(params["model"])
+        return SimpleNamespace(
+            content=[TextBlock(type="text", text='["editor"]')],
+            usage=SimpleNamespace(input_tokens=100, output_tokens=10)
+        )
+
+    router = ModelRouter(BIG, {"keywords": SMALL, "copy:short": SMALL})
+    llm = CopywritingLLM(router=router)
+    llm.client = SimpleNamespace(messages=SimpleNamespace(create=create))
+
+    await llm.generate_keywords("developers", "Code editor")
+    await llm.generate_copy(make_request(content_type="Tweet"), [])
+    await llm.generate_copy(make_request(content_type="Landing page"), [])
+    await llm.repair_copy(make_request(content_type="Tweet"), [], "draft", "Add a CTA")
+    assert calls == [SMALL, SMALL, BIG, BIG]
+
+    stats = router.stats()
+    assert stats["copy:short"]["model"] == SMALL
+    assert stats["copy:short"]["by_model"][SMALL]["calls"] == 1
+    assert stats["copy:short"]["by_model"][BIG]["calls"] == 1  # the escalated repair
+    # 100 * $1 + 10 * $5 per million on Haiku
+    assert stats["keywords"]["by_model"][SMALL]["cost"] == 0.00015
@@ -0,0 +1,157 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+import httpx
+import pytest
+from anthropic import APITimeoutError, RateLimitError
+from app.errors import to_http_error
+from app import scheduler as scheduler_module
+from app.scheduler import SchedulerOverloaded, UpstreamScheduler
+
+
+def rate_limit_error(retry_after="0.01"):
+    response = httpx.Response(429, headers={"retry-after": retry_after}, request=httpx.Request("POST", "http://stub"))
+    return RateLimitError("rate limited", response=response, body=None)
+
+
+@pytest.mark.asyncio
+async def test_scheduler_bounds_concurrency():
+    scheduler = UpstreamScheduler(max_concurrency=2)
+    active, peak = 0, 0
+
+    async def call():
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+
+    await asyncio.gather(*[scheduler.run("c", call) for _ in range(6)])
+    assert peak == 2
+    assert scheduler.stats()["completed"] == 6
+
+
+@pytest.mark.asyncio
+async def test_scheduler_serves_clients_round_robin():
+    scheduler = UpstreamScheduler(max_concurrency=1)
+    order = []
+
+    def call(client):
+        async def fn():
+            order.append(client)
+            await asyncio.sleep(0.001)
+        return fn
+
+    tasks = [asyncio.create_task(scheduler.run("busy", call("busy"))) for _ in range(4)]
+    await asyncio.sleep(0)
+    tasks.append(asyncio.create_task(scheduler.run("quiet", call("quiet"))))
+    await asyncio.gather(*tasks)
+    assert order.index("quiet") <= 2
+
+
+@pytest.mark.asyncio
+async def test_scheduler_retries_rate_limits_with_retry_after():
+    scheduler = UpstreamScheduler(max_retries=2)
+    attempts = []
+
+    async def flaky():
+        attempts.append(time.perf_counter())
+        if len(attempts) < 3:
+            raise rate_limit_error("0.02")
+        return "ok"
+
+    assert await scheduler.run("c", flaky) == "ok"
+    assert scheduler.retries == 2
+    assert attempts[1] - attempts[0] >= 0.02
+
+
+@pytest.mark.asyncio
+async def test_scheduler_gives_up_after_retry_budget():
+    scheduler = UpstreamScheduler(max_retries=1)
+
+    async def always_limited():
+        raise rate_limit_error()
+
+    with pytest.raises(RateLimitError):
+        await scheduler.run("c", always_limited)
+
+
+@pytest.mark.asyncio
+async def test_scheduler_does_not_retry_timeouts():
+    scheduler = UpstreamScheduler(max_retries=3)
+    calls = []
+
+    async def slow():
+        calls.append(1)
+        raise APITimeoutError(request=httpx.Request("POST", "http://stub"))
+
+    with pytest.raises(APITimeoutError):
+        await scheduler.run("c", slow)
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_scheduler_sheds_load_past_wait_threshold():
+    scheduler = UpstreamScheduler(max_concurrency=1, max_queue_wait=1.0)
+    scheduler.service_time = 5.0
+    release = asyncio.Event()
+
+    async def hold():
+        await release.wait()
+
+    running = asyncio.create_task(scheduler.run("a", hold))
+    await asyncio.sleep(0)
+    with pytest.raises(SchedulerOverloaded):
+        await scheduler.run("b", hold)
+    assert scheduler.stats()["shed"] == 1
+    release.set()
+    await running
+
+
+@pytest.mark.asyncio
+async def test_scheduler_pauses_when_quota_exhausted():
+    scheduler = UpstreamScheduler()
+    reset = datetime.now(timezone.utc) + timedelta(milliseconds=100)
+    scheduler.observe_headers({
+        "anthropic-ratelimit-requests-remaining": "0",
+        "anthropic-ratelimit-requests-reset": reset.isoformat(),
+    })
+    assert scheduler.stats()["rate_limits"]["requests_remaining"] == 0
+
+    async def call():
+        return time.time()
+
+    started_at = await scheduler.run("c", call)
+    assert started_at >= reset.timestamp() - 0.01
+
+
+@pytest.mark.asyncio
+async def test_scheduler_exports_queue_metrics():
+    scheduler = UpstreamScheduler(max_concurrency=1)
+    waits = scheduler_module.queue_wait.count()
+    release = asyncio.Event()
+
+    async def hold():
+        await release.wait()
+
+    calls = [asyncio.create_task(scheduler.run("c", hold)) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    assert scheduler_module.queued_calls.get() == 2
+    assert scheduler_module.active_calls.get() == 1
+    release.set()
+    await asyncio.gather(*calls)
+    assert (scheduler_module.queued_calls.get(), scheduler_module.active_calls.get()) == (0, 0)
+    assert scheduler_module.queue_wait.count() == waits + 3
+
+    reset = datetime.now(timezone.utc) + timedelta(seconds=5)
+    scheduler.observe_headers({
+        "anthropic-ratelimit-requests-remaining": "0",
+        "anthropic-ratelimit-requests-reset": reset.isoformat(),
+    })
+    assert scheduler_module.pause_ends_at.get() > time.time()
+
+
+def test_overload_maps_to_503_with_retry_after():
+    error = to_http_error(SchedulerOverloaded(12.5))
+    assert error.status_code == 503
+    assert error.headers["Retry-After"] == "12"
@@ -0,0 +1,173 @@
+import asyncio
+import time
+import pytest
+from app.cache import KeywordCache, build_response_cache
+from app.coalescing import CoalescingLLM
+from app.config import Settings
+from app.scheduler import SchedulerOverloaded, UpstreamScheduler
+from app.shared_state import SQLiteStore, SharedBackend, SharedFlight, SharedRateLimits, build_shared_store
+from app.singleflight import SingleFlight
+from conftest import CountingLLM
+from app.usage import collect_usage
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "shared.sqlite3")
+
+
+@pytest.mark.asyncio
+async def test_store_follows_redis_semantics(path):
+    store = SQLiteStore(path)
+    assert await store.get("missing") is None
+    assert await store.set("a", "1")
+    assert await store.get("a") == b"1"
+    assert not await store.set("a", "2", nx=True)
+    assert await store.incrby("n", 2) == 2
+    assert await store.incrby("n", 3) == 5
+    assert await store.get("n") == b"5"
+
+    await store.set("short", "x", px=20)
+    await asyncio.sleep(0.03)
+    assert await store.get("short") is None
+    assert await store.set("short", "y", px=1000, nx=True)  # expired keys count as missing
+    assert sorted(await store.keys("*")) == [b"a", b"n", b"short"]
+    assert await store.delete("a", "n") == 2
+    await store.aclose()
+
+
+@pytest.mark.asyncio
+async def test_workers_on_one_file_see_the_same_cache(path):
+    first = KeywordCache(SharedBackend(SQLiteStore(path), "keywords:"))
+    second = KeywordCache(SharedBackend(SQLiteStore(path), "keywords:"))
+    await first.set("k", ["fast", "simple"])
+    assert await second.get("k") == ["fast", "simple"]
+    assert second.stats()["size"] is None
+
+
+@pytest.mark.asyncio
+async def test_shared_flight_runs_once_across_processes(path):
+    # two stores on one file stand in for two worker processes
+    flights = [SharedFlight(SQLiteStore(path), poll_interval=0.01) for _ in range(2)]
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"keywords": ["a", "b"]}
+
+    results = await asyncio.gather(*[f.do("k", work) for f in flights])
+    assert calls == 1
+    assert sorted(remote for _, remote in results) == [False, True]
+    assert all(value == {"keywords": ["a", "b"]} for value, _ in results)
+
+
+@pytest.mark.asyncio
+async def test_failed_flight_lets_the_next_process_try(path):
+    leader, follower = (SharedFlight(SQLiteStore(path), poll_interval=0.01) for _ in range(2))
+
+    async def fail():
+        await asyncio.sleep(0.03)
+        raise RuntimeError("upstream down")
+
+    async def succeed():
+        return "ok"
+
+    failing = asyncio.create_task(leader.do("k", fail))
+    await asyncio.sleep(0.01)
+    assert await follower.do("k", succeed) == ("ok", False)
+    with pytest.raises(RuntimeError):
+        await failing
+
+
+@pytest.mark.asyncio
+async def test_follower_takes_a_result_published_while_it_was_polling(path):
+    leader = SharedFlight(SQLiteStore(path), poll_interval=0.01)
+    calls = 0
+
+    class RacingStore(SQLiteStore):
+        async def set(self, key, value, px=None, nx=False):
+            taken = await super().set(key, value, px=px, nx=nx)
+            if nx and not taken:
+                await leading  # the leader publishes and releases its lock before the next attempt
+            return taken
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.02)
+        return "ok"
+
+    leading = asyncio.create_task(leader.do("k", work))
+    await asyncio.sleep(0.005)
+    follower = SharedFlight(RacingStore(path), poll_interval=0.01)
+    assert await follower.do("k", work) == ("ok", True)
+    assert calls == 1
+
+
+@pytest.mark.asyncio
+async def test_leader_does_not_release_a_lock_it_lost(path):
+    store = SQLiteStore(path)
+
+    async def lease_lapses():
+        await store.set("flight:k", "successor")  # another process took over the expired lease
+        return "ok"
+
+    await SharedFlight(store).do("k", lease_lapses)
+    assert await store.get("flight:k") == b"successor"
+
+
+@pytest.mark.asyncio
+async def test_remote_result_is_billed_as_shared(path):
+    upstream = CountingLLM(keyword_delay=0.05, keywords=["fast"], metered=True)
+
+    async def worker():
+        llm = CoalescingLLM(upstream, SingleFlight(), SharedFlight(SQLiteStore(path), poll_interval=0.01))
+        with collect_usage() as usage:
+            keywords = await llm.generate_keywords("devs", "editor")
+        return keywords, usage
+
+    results = await asyncio.gather(worker(), worker())
+    assert upstream.keyword_calls == 1
+    assert [keywords for keywords, _ in results] == [["fast"], ["fast"]]
+    billed = sorted(usage[0].input_tokens for _, usage in results)
+    assert billed == [0, 60]
+
+
+@pytest.mark.asyncio
+async def test_rate_limits_are_shared(path):
+    first = SharedRateLimits(SQLiteStore(path), requests_per_minute=100)
+    second = SharedRateLimits(SQLiteStore(path), requests_per_minute=100)
+    for _ in range(60):
+        await first.take()
+    for _ in range(40):
+        await second.take()
+    window = int(time.time() // 60)
+    assert await first.store.get(f"ratelimit:bucket:{window}") == b"100"
+
+    await first.publish_pause(time.time() + 5)
+    assert await second.paused_until() > time.time() + 4
+
+
+@pytest.mark.asyncio
+async def test_exhausted_shared_budget_sheds_before_taking_a_slot(path):
+    scheduler = UpstreamScheduler(max_concurrency=1, max_queue_wait=0.0,
+                                  shared=SharedRateLimits(SQLiteStore(path), requests_per_minute=1))
+
+    async def call():
+        return "ok"
+
+    assert await scheduler.run("a", call) == "ok"
+    with pytest.raises(SchedulerOverloaded):
+        await scheduler.run("a", call)
+    assert scheduler.active == 0 and scheduler.shed == 1
+
+
+def test_build_shared_store(path):
+    assert build_shared_store(Settings(SHARED_STATE_BACKEND="none")) is None
+    assert isinstance(build_shared_store(Settings(SHARED_STATE_BACKEND="sqlite", SHARED_STATE_PATH=path)), SQLiteStore)
+    with pytest.raises(ValueError):
+        build_shared_store(Settings(SHARED_STATE_BACKEND="memcached"))
+    with pytest.raises(ValueError):
+        build_response_cache(Settings(RESPONSE_CACHE_ENABLED=True, RESPONSE_CACHE_BACKEND="shared"))
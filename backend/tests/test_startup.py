@@ -0,0 +1,81 @@
+import asyncio
+import os
+import subprocess
+import sys
+from pathlib import Path
+import pytest
+from app.clients import ClientRegistry
+from app.config import Settings
+
+BACKEND = Path(__file__).resolve().parent.parent
+# self time of the app's own modules under -X importtime; third-party imports are not ours to budget
+APP_IMPORT_BUDGET_MS = 150
+DEFERRED_MODULES = ("anthropic", "httpx")
+
+
+def _run(code: str, *flags: str) -> subprocess.CompletedProcess:
+    env = {**os.environ, "LEDGER_PATH": ":memory:"}
+    return subprocess.run(
+        [sys.executable, *flags, "-c", code], cwd=BACKEND, env=env, capture_output=True, text=True, check=True
+    )
+
+
+def _import_times(stderr: str) -> dict:
+    """module -> (self us, cumulative us) from -X importtime output"""
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, module = line[len("import time:"):].split("|")
+        times[module.strip()] = (int(own), int(cumulative))
+    return times
+
+
+def test_app_import_stays_within_budget():
+    times = _import_times(_run("import app.main", "-X", "importtime").stderr)
+    assert "app.main" in times
+    for module in DEFERRED_MODULES:
+        assert module not in times, f"{module} is imported at startup"
+    app_ms = sum(own for module, (own, _) in times.items() if module.split(".")[0] == "app") / 1000
+    assert app_ms < APP_IMPORT_BUDGET_MS, f"app modules took {app_ms:.0f} ms to import"
+
+
+def test_importing_the_app_does_not_read_settings():
+    code = "import app.main\nfrom app.config import get_settings\nprint(get_settings.cache_info().currsize)"
+    assert _run(code).stdout.strip() == "0"
+
+
+@pytest.mark.asyncio
+async def test_prewarm_opens_pooled_connections():
+    connections = 0
+
+    async def serve(reader, writer):
+        nonlocal connections
+        connections += 1
+        try:
+            while await reader.readuntil(b"\r\n\r\n"):
+                writer.write(b"HTTP/1.1 200 OK\r\ncontent-length: 0\r\n\r\n")
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass  # the pooled client closed the connection
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(serve, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    registry = ClientRegistry(Settings(ANTHROPIC_API_KEY="test", ANTHROPIC_BASE_URL=f"http://127.0.0.1:{port}"))
+    try:
+        assert await registry.prewarm(3) == 3
+        assert connections == 3
+        await registry.prewarm(3)
+        assert connections == 3  # reused from the pool
+    finally:
+        await registry.aclose()
+        server.close()
+
+
+@pytest.mark.asyncio
+async def test_prewarm_failure_is_not_fatal():
+    registry = ClientRegistry(Settings(ANTHROPIC_API_KEY="test", ANTHROPIC_BASE_URL="http://127.0.0.1:9"))
+    assert await registry.prewarm(2) == 0
+    await registry.aclose()
@@ -1,5 +1,5 @@
 import pytest
-from app.utils import estimate_tokens, calculate_cost
+from app.utils import MODEL_PRICING, estimate_tokens, calculate_cost, model_pricing
 
 def test_estimate_tokens():
     text = "Hello world this is a test"
@@ -15,4 +15,29 @@ def test_calculate_cost():
 
 def test_calculate_cost_zero():
     cost = calculate_cost(0, 0)
-    assert cost == 0.0
\ No newline at end of file
+    assert cost == 0.0
+
+
+def test_calculate_cost_uses_model_pricing():
+    # Haiku 4.5: $1 in / $5 out per million
+    assert calculate_cost(1_000_000, 1_000_000, model="claude-haiku-4-5-20251001") == 6.0
+    # Opus 4.1 is priced separately from Sonnet
+    assert calculate_cost(1000, 0, model="claude-opus-4-1-20250805") == 0.015
+
+
+def test_opus_4_5_resolves_to_its_own_pricing():
+    # the longer claude-opus-4-5 prefix wins over claude-opus-4: $5 in / $25 out per million
+    assert model_pricing("claude-opus-4-5-20251101") == MODEL_PRICING["claude-opus-4-5"]
+    assert calculate_cost(1_000_000, 1_000_000, model="claude-opus-4-5-20251101") == 30.0
+    cost = calculate_cost(0, 0, model="claude-opus-4-5", cache_creation_tokens=1_000_000, cache_read_tokens=1_000_000)
+    assert cost == 6.75
+
+
+def test_calculate_cost_prices_cache_tokens():
+    # Sonnet: cache writes $3.75, cache reads $0.30 per million
+    cost = calculate_cost(0, 0, model="claude-sonnet-4-5", cache_creation_tokens=1_000_000, cache_read_tokens=1_000_000)
+    assert cost == 4.05
+
+
+def test_calculate_cost_unknown_model_defaults_to_sonnet():
+    assert calculate_cost(1000, 500, model="some-future-model") == 0.0105
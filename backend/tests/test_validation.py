@@ -1,5 +1,5 @@
 import pytest
-from app.validation import validate_copy_output
+from app.validation import validate_copy_output, StreamingValidator, build_engine
 
 def test_validation_passes_normal_copy():
     text = "Great copy here. CTA: Click now!"
@@ -18,3 +18,75 @@ def test_validation_fails_missing_cta():
 def test_validation_passes_no_cta_required():
     text = "Great copy without a CTA"
     validate_copy_output(text, require_cta=False)
+
+def test_streaming_validator_aborts_once_too_long():
+    validator = StreamingValidator(require_cta=False)
+    validator.feed("x" * 4000)
+    with pytest.raises(ValueError, match="too long"):
+        validator.feed("x")
+
+def test_streaming_validator_checks_cta_on_finish():
+    validator = StreamingValidator(require_cta=True)
+    for chunk in ["Great copy ", "without a call to action."]:
+        validator.feed(chunk)
+    with pytest.raises(ValueError, match="CTA"):
+        validator.finish()
+
+def test_streaming_validator_returns_full_text():
+    validator = StreamingValidator(require_cta=True)
+    for chunk in ["Great copy. ", "Click now!"]:
+        validator.feed(chunk)
+    assert validator.finish() == "Great copy. Click now!"
+
+def test_validation_enforces_per_type_limit():
+    text = "Short and sweet, start today. " * 12  # ~360 chars
+    validate_copy_output(text, require_cta=True, content_type="Email")
+    with pytest.raises(ValueError, match="max 280"):
+        validate_copy_output(text, require_cta=False, content_type="Tweet")
+
+def test_long_form_limits_fit_their_word_guidance():
+    article = "Our tool helps busy teams write. " * 200 + "Start today."  # 1200 words, ~6600 chars
+    validate_copy_output(article, require_cta=True, content_type="Blog article")
+    with pytest.raises(ValueError, match="too long"):
+        validate_copy_output(article, require_cta=True, content_type="Ad")
+
+def test_validation_skips_cta_for_headlines():
+    validate_copy_output("Win back your week", require_cta=True, content_type="Headline")
+
+def test_streaming_validator_uses_per_type_limit():
+    validator = StreamingValidator(require_cta=False, content_type="Tweet")
+    validator.feed("x" * 280)
+    with pytest.raises(ValueError, match="too long"):
+        validator.feed("x")
+
+def test_cta_matching_is_whole_word():
+    # "seems" and "country" used to pass as "see" and "try"
+    with pytest.raises(ValueError, match="CTA"):
+        validate_copy_output("It seems every country loves it.", require_cta=True)
+    validate_copy_output("Sign-up takes a minute.", require_cta=True)
+
+def test_engine_reports_all_violations():
+    engine = build_engine(banned_phrases=["world-class"])
+    report = engine.validate(
+        "Our world-class color tools organize your favorite palettes.",
+        require_cta=True
+    )
+    rules = sorted(v.rule for v in report.violations)
+    assert rules == ["banned_phrase", "cta", "uk_spelling", "uk_spelling", "uk_spelling"]
+    assert [v.rule for v in report.errors] == ["cta"]
+    assert report.violations[0].message == "CTA required but missing from generated copy"
+
+def test_uk_spelling_suggests_replacement():
+    report = build_engine().validate("Optimized for every size and prize.")
+    assert [v.message for v in report.violations] == ['US spelling "Optimized", use "optimised"']
+    assert report.ok
+
+def test_keyword_density_warns_on_stuffing():
+    text = "Cheap flights here. Cheap flights there. Cheap flights everywhere. Book today."
+    report = validate_copy_output(text, require_cta=True, keywords=["cheap flights", "holidays"])
+    assert [v.rule for v in report.warnings] == ["keyword_density"]
+    assert "used 3 times" in report.warnings[0].message
+
+def test_validation_summary_lists_warnings():
+    report = validate_copy_output("Book a colourful tour today.", require_cta=True)
+    assert report.summary() == {"warnings": []}